@@ -19,9 +19,10 @@ const FileUpload = React.forwardRef(({ onUploadSuccess, onUploadComplete }, ref)
     const files = Array.from(event.target.files);
     if (files.length === 0) return;
 
-    const invalidFiles = files.filter(file => file.type !== 'application/pdf');
+    const isAccepted = (file) => /\.(pdf|zip)$/i.test(file.name);
+    const invalidFiles = files.filter(file => !isAccepted(file));
     if (invalidFiles.length > 0) {
-      setError('Please upload PDF files only');
+      setError('Please upload PDF files or ZIP archives of PDFs only');
       return;
     }
 
@@ -30,34 +31,34 @@ const FileUpload = React.forwardRef(({ onUploadSuccess, onUploadComplete }, ref)
     setError(null);
 
     try {
-      const results = [];
-      for (const file of files) {
-        const formData = new FormData();
-        formData.append('file', file);
-        
-        const response = await axios.post('http://localhost:5000/upload-pdf', formData, {
-          headers: {
-            'Content-Type': 'multipart/form-data',
-          },
-          onUploadProgress: (progressEvent) => {
-            const progress = Math.round(
-              (progressEvent.loaded * 100) / progressEvent.total
-            );
-            setUploadProgress(progress);
-          },
-        });
+      // All selected files go in one request and are indexed together
+      const formData = new FormData();
+      files.forEach(file => formData.append('files', file));
 
-        if (response.data) {
-          results.push({
-            filename: file.name,
-            success: true,
-            message: response.data.message
-          });
-        }
+      const response = await axios.post('http://localhost:5000/upload-pdfs', formData, {
+        headers: {
+          'Content-Type': 'multipart/form-data',
+        },
+        onUploadProgress: (progressEvent) => {
+          const progress = Math.round(
+            (progressEvent.loaded * 100) / progressEvent.total
+          );
+          setUploadProgress(progress);
+        },
+      });
+
+      const results = (response.data?.files || []).map(entry => ({
+        filename: entry.filename,
+        success: entry.status === 'indexed',
+        message: entry.status === 'indexed' ? 'File uploaded and processed successfully' : entry.error
+      }));
+      const failed = results.filter(result => !result.success);
+      if (failed.length > 0) {
+        setError(`${failed.length} file(s) could not be processed: ${failed.map(result => result.filename).join(', ')}`);
       }
       
       setUploading(false);
-      onUploadSuccess && onUploadSuccess(results);
+      onUploadSuccess && onUploadSuccess(results.filter(result => result.success));
       onUploadComplete && onUploadComplete(); // Trigger stats refresh
     } catch (error) {
       setError(error.response?.data?.error || 'Failed to upload file');
@@ -73,7 +74,7 @@ const FileUpload = React.forwardRef(({ onUploadSuccess, onUploadComplete }, ref)
       <input
         ref={fileInputRef}
         type="file"
-        accept=".pdf"
+        accept=".pdf,.zip"
         multiple
         onChange={handleFileUpload}
         style={{ display: 'none' }}
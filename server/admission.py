@@ -0,0 +1,293 @@
+"""
+Admission Control Module
+
+This module decides whether an expensive request (a screening chat, a PDF upload) may
+start now, wait, or be turned away. Without it every request starts immediately, so a
+burst of OCR uploads or job descriptions competes for the same CPU, memory and LLM
+quota until all of them time out. With it, at most a configured number of pipelines
+run at once, a bounded number wait in line, and everything beyond that is rejected
+right away with a status code and ``Retry-After`` the client can act on.
+
+One controller can be shared by the threaded Flask handlers and the asyncio ASGI
+handlers of the same process: waiting threads block on an event, waiting coroutines
+await a future, and both queue in the same FIFO line. All state lives in the process:
+under a multi-process server (``gunicorn -w 4``) every worker enforces the limits on
+its own, so the server as a whole admits up to the worker count times each limit.
+
+Key components:
+- AdmissionRejected: Raised with the HTTP status and ``retry_after`` of a rejection
+- TokenBucket: Per-user request rate limit with bursts
+- AdmissionController: Per-process and per-user concurrency limits with a bounded FIFO wait queue
+"""
+
+import math
+import time
+import asyncio
+import threading
+from collections import OrderedDict, deque
+from contextlib import contextmanager, asynccontextmanager
+
+# Users whose token buckets are remembered; the least recently seen are forgotten first
+MAX_TRACKED_USERS = 10000
+
+
+class AdmissionRejected(Exception):
+    """
+    Raised when a request is not admitted.
+
+    Args:
+        message (str): Explanation for the client.
+        status (int): 429 when the user exceeded their own limits, 503 when the
+                      server is saturated.
+        reason (str): Short machine-readable cause, used for counters.
+        retry_after (float): Seconds after which a retry is likely to be admitted.
+    """
+
+    def __init__(self, message, status, reason, retry_after):
+        super().__init__(message)
+        self.status = status
+        self.reason = reason
+        self.retry_after = retry_after
+
+
+class TokenBucket:
+    """
+    Token bucket refilled at ``rate`` tokens per second up to ``burst`` tokens.
+
+    Args:
+        rate (float): Sustained requests per second.
+        burst (int): Requests allowed back to back after a quiet period.
+    """
+
+    def __init__(self, rate, burst):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = float(burst)
+        self.updated = time.monotonic()
+
+    def take(self):
+        """
+        Take one token if available.
+
+        Returns:
+            float: 0 if a token was taken, otherwise seconds until one is available
+        """
+        now = time.monotonic()
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return 0.0
+        return (1 - self.tokens) / self.rate
+
+
+class _Waiter:
+    __slots__ = ('user', 'admitted', 'event', 'loop', 'future')
+
+    def __init__(self, user, loop=None):
+        self.user = user
+        self.admitted = False
+        self.loop = loop
+        if loop is None:
+            self.event = threading.Event()
+            self.future = None
+        else:
+            self.event = None
+            self.future = loop.create_future()
+
+    def wake(self):
+        if self.loop is None:
+            self.event.set()
+        else:
+            self.loop.call_soon_threadsafe(_resolve, self.future)
+
+
+def _resolve(future):
+    if not future.done():
+        future.set_result(None)
+
+
+class AdmissionController:
+    """
+    Limit how many requests of one kind run at once in this process, overall and per user.
+
+    A request is first charged against its user's token bucket and concurrency
+    limit; exceeding either is the user's own doing and answered with 429. It then
+    runs if a slot is free and nobody is queued ahead of it, or waits in a
+    FIFO queue. A full queue, or a wait longer than ``queue_timeout``, means the
+    server is saturated and is answered with 503.
+
+    Args:
+        name (str): Label used in log lines and errors.
+        max_concurrent (int): Requests running at once across all users of this process.
+        max_per_user (int): Requests a single user may have running or queued;
+                            0 disables the limit.
+        max_queue (int): Requests allowed to wait for a slot.
+        queue_timeout (float): Seconds a request waits before it is rejected.
+        rate_per_minute (float): Sustained requests per user per minute;
+                                 0 disables rate limiting.
+        burst (int): Requests a user may send back to back.
+    """
+
+    def __init__(self, name, max_concurrent, max_per_user=0, max_queue=0, queue_timeout=30,
+                 rate_per_minute=0, burst=1):
+        self.name = name
+        self.max_concurrent = max_concurrent
+        self.max_per_user = max_per_user
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self.rate = rate_per_minute / 60.0
+        self.burst = max(1, burst)
+        self._lock = threading.Lock()
+        self._waiters = deque()
+        self._held_by_user = {}
+        self._buckets = OrderedDict()
+        self.active = 0
+        self.admitted = 0
+        self.queued = 0
+        self.rejected = {}
+        self._hold_seconds = 0.0
+        self._completed = 0
+
+    def _reject(self, status, reason, retry_after, message):
+        self.rejected[reason] = self.rejected.get(reason, 0) + 1
+        raise AdmissionRejected(message, status, reason, max(1, math.ceil(retry_after)))
+
+    def _average_hold(self):
+        return self._hold_seconds / self._completed if self._completed else 1.0
+
+    def _saturated_retry_after(self):
+        """Time for the running requests and the queue ahead to drain"""
+        return self._average_hold() * (len(self._waiters) + 1) / self.max_concurrent
+
+    def _enter(self, user, loop=None):
+        """Charge the user and take a slot, or return a waiter to block on"""
+        if self.rate:
+            bucket = self._buckets.get(user)
+            if bucket is None:
+                bucket = self._buckets[user] = TokenBucket(self.rate, self.burst)
+                if len(self._buckets) > MAX_TRACKED_USERS:
+                    self._buckets.popitem(last=False)
+            else:
+                self._buckets.move_to_end(user)
+            wait = bucket.take()
+            if wait:
+                self._reject(429, 'rate_limited', wait,
+                             f"Too many {self.name} requests; please slow down")
+
+        held = self._held_by_user.get(user, 0)
+        if self.max_per_user and held >= self.max_per_user:
+            self._reject(429, 'user_concurrency', self._average_hold(),
+                         f"You already have {held} {self.name} requests in progress")
+
+        if self.active < self.max_concurrent and not self._waiters:
+            self._held_by_user[user] = held + 1
+            self.active += 1
+            self.admitted += 1
+            return None
+
+        if len(self._waiters) >= self.max_queue:
+            self._reject(503, 'queue_full', self._saturated_retry_after(),
+                         f"The server is busy with other {self.name} requests")
+
+        self._held_by_user[user] = held + 1
+        waiter = _Waiter(user, loop)
+        self._waiters.append(waiter)
+        self.queued += 1
+        return waiter
+
+    def _abandon(self, waiter):
+        """Give up on a waiter that timed out; False if it was admitted meanwhile"""
+        if waiter.admitted:
+            return False
+        self._waiters.remove(waiter)
+        self._release_user(waiter.user)
+        self._reject(503, 'queue_timeout', self._saturated_retry_after(),
+                     f"Timed out waiting for a free {self.name} slot")
+
+    def _release_user(self, user):
+        held = self._held_by_user.get(user, 0) - 1
+        if held > 0:
+            self._held_by_user[user] = held
+        else:
+            self._held_by_user.pop(user, None)
+
+    def _exit(self, user, started):
+        with self._lock:
+            self.active -= 1
+            self._release_user(user)
+            self._hold_seconds += time.monotonic() - started
+            self._completed += 1
+            while self._waiters and self.active < self.max_concurrent:
+                waiter = self._waiters.popleft()
+                waiter.admitted = True
+                self.active += 1
+                self.admitted += 1
+                waiter.wake()
+
+    @contextmanager
+    def admit(self, user):
+        """
+        Run the body once the request is admitted, for threaded handlers.
+
+        Args:
+            user: Key of the requesting user (user id or client address).
+
+        Raises:
+            AdmissionRejected: If the request is rate limited, over the user's
+                               limit, or the server is saturated.
+        """
+        with self._lock:
+            waiter = self._enter(user)
+        if waiter is not None and not waiter.event.wait(self.queue_timeout):
+            with self._lock:
+                self._abandon(waiter)
+        started = time.monotonic()
+        try:
+            yield
+        finally:
+            self._exit(user, started)
+
+    @asynccontextmanager
+    async def admit_async(self, user):
+        """Same as ``admit``, waiting on the event loop instead of blocking a thread"""
+        with self._lock:
+            waiter = self._enter(user, asyncio.get_running_loop())
+        if waiter is not None:
+            try:
+                await asyncio.wait_for(asyncio.shield(waiter.future), self.queue_timeout)
+            except asyncio.TimeoutError:
+                with self._lock:
+                    self._abandon(waiter)
+            except asyncio.CancelledError:
+                # A disconnected client frees its place in line, or the slot it was just given
+                with self._lock:
+                    if waiter.admitted:
+                        admitted = True
+                    else:
+                        admitted = False
+                        self._waiters.remove(waiter)
+                        self._release_user(waiter.user)
+                if admitted:
+                    self._exit(user, time.monotonic())
+                raise
+        started = time.monotonic()
+        try:
+            yield
+        finally:
+            self._exit(user, started)
+
+    def stats(self):
+        """Snapshot of the admission counters for monitoring"""
+        with self._lock:
+            return {
+                'active': self.active,
+                'waiting': len(self._waiters),
+                'max_concurrent': self.max_concurrent,
+                'max_per_user': self.max_per_user,
+                'max_queue': self.max_queue,
+                'admitted': self.admitted,
+                'queued': self.queued,
+                'rejected': dict(self.rejected),
+                'avg_hold_ms': round(self._average_hold() * 1000, 1) if self._completed else 0.0
+            }
@@ -0,0 +1,287 @@
+"""
+ASGI Application
+
+This module serves the chat pipeline on an asyncio event loop so that waiting on the LLM
+does not pin a worker thread. ``/chat`` is handled natively: LLM calls are awaited
+through the async gateway, while CPU-bound work (embedding and vector search, PDF
+rasterization) runs on a bounded executor. Every other route is served unchanged by the
+Flask application through the WSGI adapter.
+
+Run with:
+    uvicorn asgi:app --host 0.0.0.0 --port 5000
+
+Key components:
+- chat: Async /chat handler sharing authentication, admission control, prompts, coalescing
+  and history persistence with the Flask application
+- screen_job_description_async: Async version of the screening pipeline
+"""
+
+import os
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from starlette.applications import Starlette
+from starlette.middleware.wsgi import WSGIMiddleware
+from starlette.responses import JSONResponse
+from starlette.routing import Mount, Route
+from flask_login import current_user
+
+import main
+from main import (
+    app as flask_app, history_writer, search_matched_cvs, convert_pdf_to_base64_images,
+    is_job_description_message, chat_coalescing_key, lookup_similar_analysis, remember_analysis,
+    split_profiled_candidates, chat_admission, analyzed_cv_versions, chat_record
+)
+from prompts import (
+    build_analysis_messages, build_candidate_messages, build_ranking_messages,
+    build_suggestion_messages, build_advice_messages, dedupe_candidates,
+    format_candidate_sections, combine_fanout_report, RANKING_FALLBACK,
+    build_profile_analysis_messages
+)
+from llm_gateway import AsyncLLMGateway, LLMUnavailableError
+from singleflight import AsyncSingleFlight
+from admission import AdmissionRejected
+
+# Embedding, vector search and rasterization are CPU-bound and run off the event loop
+cpu_executor = ThreadPoolExecutor(
+    max_workers=int(os.getenv('ASYNC_CPU_WORKERS', str(os.cpu_count() or 4))),
+    thread_name_prefix='chat-cpu'
+)
+
+async_llm = AsyncLLMGateway(
+    **main.LLM_SETTINGS,
+    max_concurrency=int(os.getenv('ASYNC_LLM_MAX_CONCURRENCY', '64')),
+    max_connections=int(os.getenv('ASYNC_LLM_POOL_SIZE', '64')),
+    breaker=main.llm_breaker
+)
+
+async_coalescer = AsyncSingleFlight()
+
+
+async def run_cpu(fn, *args):
+    """Run a blocking, CPU-heavy function on the CPU executor"""
+    return await asyncio.get_running_loop().run_in_executor(cpu_executor, fn, *args)
+
+
+async def run_io(fn, *args):
+    """Run a short blocking I/O call (file or SQLite access) on the default executor"""
+    return await asyncio.get_running_loop().run_in_executor(None, fn, *args)
+
+
+def resolve_user_id(headers):
+    """Authenticate a request through the Flask session and login machinery"""
+    with flask_app.test_request_context('/chat', method='POST', headers=headers):
+        if current_user.is_authenticated:
+            return current_user.id
+    return None
+
+
+async def render_cv(cv):
+    """Rasterize a matched CV to base64 page images, or return None if it cannot be rendered"""
+    pdf_path = os.path.join(flask_app.config['UPLOAD_FOLDER'], cv['filename'])
+    if not await run_io(os.path.exists, pdf_path):
+        print(f"Warning: PDF file not found at {pdf_path}")
+        return None
+    return await run_cpu(convert_pdf_to_base64_images, pdf_path)
+
+
+async def analyze_candidate_async(job_description, cv, index, limiter):
+    async with limiter:
+        base64_images = await render_cv(cv)
+        if not base64_images:
+            raise ValueError(f"No images generated from {cv['filename']}")
+        print(f"Analyzing candidate {index}: {cv['filename']} ({len(base64_images)} pages)")
+        return await async_llm.complete(
+            messages=build_candidate_messages(job_description, cv, index, base64_images),
+            temperature=0.7,
+            max_tokens=flask_app.config['CHAT_FANOUT_MAX_TOKENS'],
+            timeout=flask_app.config['CHAT_FANOUT_TIMEOUT']
+        )
+
+
+async def analyze_matched_cvs_async(job_description, matched_cvs):
+    """Async counterpart of main.analyze_matched_cvs"""
+    if flask_app.config['CHAT_ANALYSIS_MODE'] == 'fanout':
+        candidates = dedupe_candidates(matched_cvs)
+        limiter = asyncio.Semaphore(flask_app.config['CHAT_FANOUT_CONCURRENCY'])
+        results = await asyncio.gather(
+            *[analyze_candidate_async(job_description, cv, i + 1, limiter) for i, cv in enumerate(candidates)],
+            return_exceptions=True
+        )
+
+        analyses = []
+        unavailable = []
+        for cv, result in zip(candidates, results):
+            if isinstance(result, LLMUnavailableError):
+                unavailable.append(result)
+            if isinstance(result, Exception):
+                print(f"Analysis failed for {cv['filename']}: {str(result)}")
+                result = f"Analysis unavailable: {str(result)}"
+            analyses.append((cv, result))
+        if len(unavailable) == len(candidates):
+            raise unavailable[0]
+
+        sections = format_candidate_sections(analyses)
+        try:
+            ranking = await async_llm.complete(
+                messages=build_ranking_messages(job_description, sections),
+                temperature=0.3,
+                max_tokens=600,
+                timeout=flask_app.config['CHAT_FANOUT_TIMEOUT']
+            )
+        except Exception as e:
+            print(f"Ranking call failed: {str(e)}")
+            ranking = RANKING_FALLBACK
+        return combine_fanout_report(sections, ranking)
+
+    if flask_app.config['CHAT_ANALYSIS_MODE'] == 'profile':
+        # Stored profiles are sent as text; only CVs without one are rasterized
+        profiled, missing = await run_io(split_profiled_candidates, matched_cvs)
+        images = await asyncio.gather(*[render_cv(cv) for _, cv in missing], return_exceptions=True)
+        rendered_cvs = []
+        for (index, cv), base64_images in zip(missing, images):
+            if isinstance(base64_images, Exception) or not base64_images:
+                print(f"Warning: No images generated for {cv['filename']}")
+                continue
+            rendered_cvs.append((index, cv, base64_images))
+        return await async_llm.complete(
+            messages=build_profile_analysis_messages(job_description, profiled, rendered_cvs),
+            temperature=0.7,
+            max_tokens=2000
+        )
+
+    # All matched CVs are rasterized concurrently, then sent in one request
+    images = await asyncio.gather(*[render_cv(cv) for cv in matched_cvs], return_exceptions=True)
+    rendered_cvs = []
+    for i, (cv, base64_images) in enumerate(zip(matched_cvs, images)):
+        if isinstance(base64_images, Exception) or not base64_images:
+            print(f"Warning: No images generated for {cv['filename']}")
+            continue
+        rendered_cvs.append((i + 1, cv, base64_images))
+
+    return await async_llm.complete(
+        messages=build_analysis_messages(job_description, rendered_cvs),
+        temperature=0.7,
+        max_tokens=2000
+    )
+
+
+async def screen_job_description_async(job_description, user_id):
+    """Async counterpart of main.screen_job_description"""
+    matched_cvs = await run_cpu(search_matched_cvs, job_description)
+    cv_filenames = [cv['filename'] for cv in matched_cvs]
+    cv_versions = analyzed_cv_versions(matched_cvs)
+    embedding = None
+    if matched_cvs:
+        cached, embedding = await run_cpu(lookup_similar_analysis, user_id, job_description, cv_versions)
+        if cached:
+            return {'response': cached['response'], 'cv_filenames': cv_filenames,
+                    'cv_versions': cv_versions, 'cache_hit': True, 'coalesced': False}
+
+    async def analyze():
+        if not matched_cvs:
+            return {'response': await async_llm.complete(
+                messages=build_suggestion_messages(job_description),
+                temperature=0.7,
+                max_tokens=1000
+            )}
+        return {'response': await analyze_matched_cvs_async(job_description, matched_cvs)}
+
+    # The user's cache is checked above; the analysis itself is shared by all users
+    key = await run_io(chat_coalescing_key, job_description)
+    result, coalesced = await async_coalescer.do(key, analyze)
+    if matched_cvs:
+        await run_cpu(remember_analysis, user_id, job_description, cv_versions, result['response'], embedding)
+    return {'response': result['response'], 'cv_filenames': cv_filenames,
+            'cv_versions': cv_versions, 'cache_hit': False, 'coalesced': coalesced}
+
+
+def cors_headers(request):
+    """Mirror the CORS headers the Flask app adds in after_request"""
+    return {
+        'Access-Control-Allow-Origin': request.headers.get('origin', 'http://localhost:3000'),
+        'Access-Control-Allow-Credentials': 'true',
+        'Vary': 'Origin, Cookie'
+    }
+
+
+async def chat(request):
+    headers = cors_headers(request)
+    try:
+        user_id = await run_io(resolve_user_id, dict(request.headers))
+        if not user_id:
+            return JSONResponse({"error": "Authentication required"}, status_code=401, headers=headers)
+
+        try:
+            data = await request.json()
+        except ValueError:
+            data = None
+        if not data:
+            return JSONResponse({"error": "No data provided"}, status_code=400, headers=headers)
+
+        user_message = (data.get('message') or '').strip()
+        if not user_message:
+            return JSONResponse({'error': 'Message is required'}, status_code=400, headers=headers)
+
+        # Shares the limits and the wait queue of the Flask /chat handler in this process
+        async with chat_admission.admit_async(f"user:{user_id}"):
+            if is_job_description_message(user_message):
+                result = await screen_job_description_async(user_message, user_id)
+                response_text = result['response']
+                cache_hit = result['cache_hit']
+                if result['coalesced']:
+                    print("Reused the result of an identical in-flight request")
+
+                if result['cv_filenames']:
+                    try:
+                        await run_io(history_writer.submit, chat_record(
+                            user_id, user_message, result['cv_filenames'],
+                            response_text, result.get('cv_versions', [])
+                        ))
+                    except Exception as e:
+                        print(f"Error saving chat history: {str(e)}")
+            else:
+                cache_hit = False
+                response_text = await async_llm.complete(
+                    messages=build_advice_messages(user_message),
+                    temperature=0.7,
+                    max_tokens=1000
+                )
+
+        return JSONResponse({'response': response_text, 'cache_hit': cache_hit}, headers=headers)
+
+    except AdmissionRejected as e:
+        print(f"Request rejected by admission control ({e.reason}): {str(e)}")
+        headers['Retry-After'] = str(e.retry_after)
+        return JSONResponse({'error': str(e), 'reason': e.reason}, status_code=e.status, headers=headers)
+
+    except LLMUnavailableError as e:
+        print(f"LLM unavailable: {str(e)}")
+        headers['Retry-After'] = str(int(e.retry_after or 30))
+        return JSONResponse({
+            'error': 'The analysis service is temporarily unavailable. Please try again shortly.',
+            'details': str(e)
+        }, status_code=503, headers=headers)
+
+    except Exception as e:
+        print(f"Error in async chat endpoint: {type(e).__name__}: {str(e)}")
+        import traceback
+        traceback.print_exc()
+        return JSONResponse({
+            'error': 'An error occurred processing your request',
+            'details': str(e) if flask_app.debug else None
+        }, status_code=500, headers=headers)
+
+
+async def shutdown():
+    cpu_executor.shutdown(wait=False)
+    history_writer.close()
+
+
+app = Starlette(
+    routes=[
+        # Preflight and every other route fall through to the Flask app
+        Route('/chat', chat, methods=['POST']),
+        Mount('/', app=WSGIMiddleware(flask_app))
+    ],
+    on_shutdown=[shutdown]
+)
@@ -0,0 +1,116 @@
+"""
+Chunking Benchmark
+
+This module compares CV chunking strategies on the PDFs in the uploads folder. For
+every strategy it reports the number and size of chunks, the time spent extracting
+and embedding them and, given a query set with known relevant CVs, the retrieval
+quality at CV level.
+
+Run from the server directory:
+    python benchmark_chunking.py --queries queries.json [--limit 200] [--k 5]
+
+The query set is a JSON list of objects such as
+    {"query": "Senior Python developer with Kubernetes", "relevant": ["jane_doe.pdf"]}
+"""
+
+import os
+import sys
+import json
+import time
+import argparse
+import numpy as np
+
+from document_processor import load_cv, get_embedding_model
+
+STRATEGIES = ['recursive', 'sections']
+
+
+def normalize(vectors):
+    vectors = np.asarray(vectors, dtype=np.float32)
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    return vectors / np.maximum(norms, 1e-12)
+
+
+def evaluate(queries, query_vectors, chunk_vectors, chunk_files, k):
+    """CV-level recall@k and mean reciprocal rank of the first relevant CV"""
+    scores = query_vectors @ chunk_vectors.T
+    recalls, reciprocal_ranks = [], []
+    for query, row in zip(queries, scores):
+        # Rank CVs by their best-matching chunk
+        ranked = []
+        for index in np.argsort(-row):
+            if chunk_files[index] not in ranked:
+                ranked.append(chunk_files[index])
+            if len(ranked) == k:
+                break
+        relevant = set(query['relevant'])
+        recalls.append(len(relevant.intersection(ranked)) / len(relevant))
+        rank = next((i + 1 for i, name in enumerate(ranked) if name in relevant), None)
+        reciprocal_ranks.append(1.0 / rank if rank else 0.0)
+    return float(np.mean(recalls)), float(np.mean(reciprocal_ranks))
+
+
+def run_strategy(strategy, paths, queries, query_vectors, k):
+    started = time.perf_counter()
+    texts, chunk_files = [], []
+    for path in paths:
+        try:
+            documents = load_cv(path, strategy=strategy)
+        except Exception as e:
+            print(f"Skipping {os.path.basename(path)}: {str(e)}")
+            continue
+        for doc in documents:
+            texts.append(doc.page_content)
+            chunk_files.append(os.path.basename(path))
+    extract_seconds = time.perf_counter() - started
+
+    started = time.perf_counter()
+    chunk_vectors = normalize(get_embedding_model().embed_documents(texts)) if texts else None
+    embed_seconds = time.perf_counter() - started
+
+    result = {
+        'strategy': strategy,
+        'chunks': len(texts),
+        'avg_chars': round(sum(len(text) for text in texts) / len(texts), 1) if texts else 0,
+        'extract_s': round(extract_seconds, 2),
+        'embed_s': round(embed_seconds, 2)
+    }
+    if queries and chunk_vectors is not None:
+        result[f'recall@{k}'], result['mrr'] = evaluate(queries, query_vectors, chunk_vectors, chunk_files, k)
+    return result
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Compare CV chunking strategies")
+    parser.add_argument('--uploads', default='uploads', help="Folder holding the CV PDFs")
+    parser.add_argument('--queries', help="JSON query set with relevant CV filenames")
+    parser.add_argument('--limit', type=int, default=0, help="Only use the first N PDFs")
+    parser.add_argument('--k', type=int, default=5, help="Number of CVs retrieved per query")
+    args = parser.parse_args(argv)
+
+    paths = sorted(
+        os.path.join(args.uploads, name) for name in os.listdir(args.uploads)
+        if name.lower().endswith('.pdf') and not name.startswith('.')
+    )
+    if args.limit:
+        paths = paths[:args.limit]
+
+    queries, query_vectors = [], None
+    if args.queries:
+        with open(args.queries) as f:
+            queries = json.load(f)
+        query_vectors = normalize([get_embedding_model().embed_query(q['query']) for q in queries])
+
+    print(f"Benchmarking {len(STRATEGIES)} strategies on {len(paths)} CVs and {len(queries)} queries")
+    results = [run_strategy(strategy, paths, queries, query_vectors, args.k) for strategy in STRATEGIES]
+
+    columns = list(results[0].keys())
+    print('\n' + '  '.join(f"{column:>12}" for column in columns))
+    for result in results:
+        print('  '.join(f"{result[column]:>12.3f}" if isinstance(result[column], float)
+                        else f"{result[column]:>12}" for column in columns))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
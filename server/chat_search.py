@@ -0,0 +1,176 @@
+"""
+Chat History Search Module
+
+This module indexes the chat history with SQLite FTS5 so that a recruiter can find an
+earlier analysis by its words ("kubernetes platform engineer") instead of scrolling
+through every row. The index is an external-content FTS5 table over the job
+description and the AI response of ``chat`` rows: triggers keep it in step with every
+insert, update and delete, so it never needs a rebuild after the initial backfill,
+and the text itself is stored only once, in ``chat``.
+
+Key components:
+- create_chat_fts: Create the FTS5 table and its triggers, backfilling existing rows once
+- build_match_query: Turn free text into a safe FTS5 query
+- search_chats: Ranked, highlighted and paginated matches for one user
+"""
+
+import re
+import html
+from sqlalchemy import text
+
+FTS_TABLE = 'chat_fts'
+# Relative weight of a match in the job description and in the AI response for bm25
+COLUMN_WEIGHTS = (2.0, 1.0)
+# Tokens of context around the matched terms in a snippet
+SNIPPET_TOKENS = 24
+
+# Control characters cannot appear in typed text, so they safely delimit highlights
+# inside SQLite; they become <mark> tags after the rest of the snippet is escaped
+_HIGHLIGHT_START = '\x02'
+_HIGHLIGHT_END = '\x03'
+_TERM_PATTERN = re.compile(r'"([^"]+)"|(\S+)')
+
+_SCHEMA = (
+    f"""CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} USING fts5(
+        job_description, ai_response,
+        content='chat', content_rowid='id',
+        tokenize='porter unicode61 remove_diacritics 2'
+    )""",
+    f"""CREATE TRIGGER IF NOT EXISTS chat_fts_insert AFTER INSERT ON chat BEGIN
+        INSERT INTO {FTS_TABLE}(rowid, job_description, ai_response)
+        VALUES (new.id, new.job_description, coalesce(new.ai_response, ''));
+    END""",
+    f"""CREATE TRIGGER IF NOT EXISTS chat_fts_delete AFTER DELETE ON chat BEGIN
+        INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, job_description, ai_response)
+        VALUES ('delete', old.id, old.job_description, coalesce(old.ai_response, ''));
+    END""",
+    f"""CREATE TRIGGER IF NOT EXISTS chat_fts_update AFTER UPDATE OF job_description, ai_response ON chat BEGIN
+        INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, job_description, ai_response)
+        VALUES ('delete', old.id, old.job_description, coalesce(old.ai_response, ''));
+        INSERT INTO {FTS_TABLE}(rowid, job_description, ai_response)
+        VALUES (new.id, new.job_description, coalesce(new.ai_response, ''));
+    END""",
+)
+
+
+def create_chat_fts(engine):
+    """
+    Create the chat history full-text index if it does not exist yet.
+
+    Existing chats are indexed once, when the table is created; afterwards the
+    triggers index every change as part of the writing transaction.
+
+    Args:
+        engine (Engine): SQLAlchemy engine of the application database.
+
+    Returns:
+        bool: True if the index was created (and backfilled) by this call
+    """
+    with engine.begin() as conn:
+        exists = conn.execute(
+            text("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = :name"),
+            {'name': FTS_TABLE}
+        ).first() is not None
+        # IF NOT EXISTS throughout, since every worker process runs this at startup
+        for statement in _SCHEMA:
+            conn.execute(text(statement))
+        if not exists:
+            conn.execute(text(f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('rebuild')"))
+            count = conn.execute(text("SELECT count(*) FROM chat")).scalar()
+            print(f"Indexed {count} chats for full-text search")
+    return not exists
+
+
+def build_match_query(query):
+    """
+    Turn user input into an FTS5 query that cannot be a syntax error.
+
+    Every word is matched as a quoted term and all of them must appear; text in
+    double quotes is matched as a phrase. The last word also matches as a prefix,
+    so results appear while the user is still typing.
+
+    Args:
+        query (str): Search box text.
+
+    Returns:
+        str: FTS5 MATCH expression, or None if the input has no searchable terms
+    """
+    terms = []
+    for phrase, word in _TERM_PATTERN.findall(query):
+        term = (phrase or word).replace('"', '').strip()
+        if term:
+            terms.append((f'"{term}"', bool(word)))
+    if not terms:
+        return None
+    expression, is_word = terms[-1]
+    if is_word:
+        terms[-1] = (expression + '*', is_word)
+    return ' '.join(expression for expression, _ in terms)
+
+
+def _render_snippet(snippet):
+    """Escape a snippet for HTML and turn the highlight delimiters into <mark> tags"""
+    escaped = html.escape(snippet or '')
+    return escaped.replace(_HIGHLIGHT_START, '<mark>').replace(_HIGHLIGHT_END, '</mark>')
+
+
+def _isoformat(value):
+    """Format a timestamp read through raw SQL like ``datetime.isoformat``"""
+    if isinstance(value, str):
+        return value.replace(' ', 'T', 1)
+    return value.isoformat() if value is not None else None
+
+
+def search_chats(conn, user_id, query, limit=20, offset=0):
+    """
+    Search one user's chat history.
+
+    Args:
+        conn: SQLAlchemy connection or session of the application database.
+        user_id (int): Only this user's chats are searched.
+        query (str): Search box text, see ``build_match_query``.
+        limit (int): Results per page.
+        offset (int): Results to skip.
+
+    Returns:
+        dict: ``total`` matching chats and the ``results`` of the page, best first,
+              each with its id, date, CV filenames, bm25 score and HTML snippets of
+              both columns with the matched terms in ``<mark>`` tags
+    """
+    match = build_match_query(query)
+    if match is None:
+        return {'total': 0, 'results': []}
+
+    params = {'match': match, 'user_id': user_id, 'limit': limit, 'offset': offset}
+    total = conn.execute(text(
+        f"""SELECT count(*) FROM {FTS_TABLE} JOIN chat ON chat.id = {FTS_TABLE}.rowid
+            WHERE {FTS_TABLE} MATCH :match AND chat.user_id = :user_id"""
+    ), params).scalar()
+    if not total or offset >= total:
+        return {'total': total or 0, 'results': []}
+
+    weights = ', '.join(str(weight) for weight in COLUMN_WEIGHTS)
+    markers = f"'{_HIGHLIGHT_START}', '{_HIGHLIGHT_END}', '…', {SNIPPET_TOKENS}"
+    rows = conn.execute(text(
+        f"""SELECT chat.id, chat.cv_filename, chat.created_at,
+                   bm25({FTS_TABLE}, {weights}) AS score,
+                   snippet({FTS_TABLE}, 0, {markers}) AS job_description,
+                   snippet({FTS_TABLE}, 1, {markers}) AS ai_response
+            FROM {FTS_TABLE} JOIN chat ON chat.id = {FTS_TABLE}.rowid
+            WHERE {FTS_TABLE} MATCH :match AND chat.user_id = :user_id
+            ORDER BY score
+            LIMIT :limit OFFSET :offset"""
+    ), params).mappings().all()
+
+    return {
+        'total': total,
+        'results': [{
+            'id': row['id'],
+            'cv_filename': row['cv_filename'].split(',') if row['cv_filename'] else [],
+            'created_at': _isoformat(row['created_at']),
+            # bm25 is lower for better matches; negate it so higher means more relevant
+            'score': round(-row['score'], 4),
+            'job_description': _render_snippet(row['job_description']),
+            'ai_response': _render_snippet(row['ai_response'])
+        } for row in rows]
+    }
@@ -0,0 +1,151 @@
+"""
+CV Section Chunking Module
+
+This module splits resume text along its sections ("Experience", "Skills",
+"Education", ...) instead of at arbitrary character offsets. Each chunk stays within
+one section and carries the section label in its metadata, so a skills list is not
+cut in half and no overlap between chunks is needed.
+
+Key components:
+- detect_section: Recognize a line that is a resume section heading
+- split_cv_sections: Turn per-page text into section-aligned document chunks
+"""
+
+import re
+from langchain.docstore.document import Document
+
+# Heading variants mapped to a canonical section label
+SECTION_HEADINGS = {
+    'summary': ['summary', 'professional summary', 'profile', 'professional profile', 'about me',
+                'objective', 'career objective', 'personal statement'],
+    'experience': ['experience', 'work experience', 'professional experience', 'employment',
+                   'employment history', 'work history', 'career history', 'relevant experience'],
+    'education': ['education', 'academic background', 'academic qualifications', 'qualifications',
+                  'education and training'],
+    'skills': ['skills', 'technical skills', 'key skills', 'core competencies', 'competencies',
+               'core skills', 'skills and abilities', 'technologies', 'tools'],
+    'projects': ['projects', 'personal projects', 'key projects', 'selected projects'],
+    'certifications': ['certifications', 'certificates', 'licenses', 'licenses and certifications',
+                       'courses', 'training'],
+    'languages': ['languages', 'language skills'],
+    'awards': ['awards', 'honors', 'honours', 'achievements', 'accomplishments'],
+    'publications': ['publications', 'research'],
+    'volunteering': ['volunteering', 'volunteer experience', 'volunteer work', 'community involvement'],
+    'interests': ['interests', 'hobbies', 'hobbies and interests'],
+    'references': ['references', 'referees'],
+    'contact': ['contact', 'contact information', 'personal information', 'personal details'],
+}
+
+_HEADING_LOOKUP = {
+    variant: label for label, variants in SECTION_HEADINGS.items() for variant in variants
+}
+_HEADING_CLEANUP = re.compile(r'[^a-z& ]+')
+
+# Label of the text before the first recognized heading (name, contact line, ...)
+HEADER_SECTION = 'header'
+
+
+def detect_section(line):
+    """
+    Return the canonical section label if a line is a section heading.
+
+    Args:
+        line (str): One line of extracted CV text.
+
+    Returns:
+        str: The section label, or None if the line is not a heading
+    """
+    stripped = line.strip()
+    if not stripped or len(stripped) > 40:
+        return None
+    normalized = _HEADING_CLEANUP.sub('', stripped.lower().replace('&', ' and ')).strip()
+    return _HEADING_LOOKUP.get(' '.join(normalized.split()))
+
+
+def _section_size(section):
+    return sum(len(line) + 1 for line in section['lines'])
+
+
+def _split_long_section(lines, max_chars):
+    """Split a section's lines into pieces of at most max_chars, on line boundaries"""
+    pieces, current, size = [], [], 0
+    for line in lines:
+        # A single overlong line (e.g. OCR output without newlines) is cut on words
+        while len(line) > max_chars:
+            cut = line.rfind(' ', 0, max_chars)
+            cut = cut if cut > 0 else max_chars
+            if current:
+                pieces.append(current)
+                current, size = [], 0
+            pieces.append([line[:cut]])
+            line = line[cut:].lstrip()
+        if current and size + len(line) + 1 > max_chars:
+            pieces.append(current)
+            current, size = [], 0
+        current.append(line)
+        size += len(line) + 1
+    if current:
+        pieces.append(current)
+    return pieces
+
+
+def split_cv_sections(pages, metadata=None, max_chars=1500, min_chars=200):
+    """
+    Chunk CV text along its sections.
+
+    Sections shorter than ``min_chars`` are merged with a neighbouring section, and
+    sections longer than ``max_chars`` are split on line boundaries with the section
+    label repeated at the top of every continuation chunk.
+
+    Args:
+        pages (list): ``(page_number, text)`` tuples in reading order.
+        metadata (dict): Metadata copied into every chunk.
+        max_chars (int): Maximum chunk length in characters.
+        min_chars (int): Sections shorter than this are merged with a neighbour.
+
+    Returns:
+        list: Document chunks with ``section``, ``page`` and ``chunk`` metadata
+    """
+    # Group lines into sections, remembering the page each section starts on
+    sections = []
+    current = {'label': HEADER_SECTION, 'page': pages[0][0] if pages else 1, 'lines': []}
+    for page_number, text in pages:
+        for line in text.splitlines():
+            if not line.strip():
+                continue
+            label = detect_section(line)
+            if label:
+                if current['lines']:
+                    sections.append(current)
+                current = {'label': label, 'page': page_number, 'lines': []}
+            current['lines'].append(line.strip())
+    if current['lines']:
+        sections.append(current)
+
+    # Fold tiny sections (a lone heading, a one-line language list) into a neighbour,
+    # as long as the combined text still fits in one chunk
+    merged = []
+    for section in sections:
+        size = _section_size(section)
+        previous = merged[-1] if merged else None
+        if previous is not None:
+            previous_size = _section_size(previous)
+            if min(size, previous_size) < min_chars and size + previous_size <= max_chars:
+                previous['label'] = f"{previous['label']}+{section['label']}"
+                previous['lines'].extend(section['lines'])
+                continue
+        merged.append(section)
+
+    documents = []
+    for section in merged:
+        for i, piece in enumerate(_split_long_section(section['lines'], max_chars)):
+            if i > 0:
+                piece = [f"{section['label'].title()} (continued)"] + piece
+            chunk_metadata = dict(metadata or {})
+            chunk_metadata.update({
+                'section': section['label'],
+                'page': section['page'],
+                'chunk': len(documents) + 1
+            })
+            documents.append(Document(page_content='\n'.join(piece), metadata=chunk_metadata))
+    return documents
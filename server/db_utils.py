@@ -0,0 +1,61 @@
+"""
+Database Utilities Module
+
+This module centralizes SQLite connection tuning so every component that opens the
+application databases (SQLAlchemy engine, session store) uses the same settings.
+
+Key components:
+- SQLITE_PRAGMAS: WAL journaling and pragmas tuned for many readers and short writes
+- configure_sqlite_connection: Applies the pragmas to a raw DB-API connection
+- enable_sqlite_pragmas: Applies the pragmas to every connection of a SQLAlchemy engine
+"""
+
+from sqlalchemy import event
+
+# WAL lets readers proceed while a writer commits; NORMAL sync is durable in WAL mode
+# across application crashes and only risks the last transactions on power loss
+SQLITE_PRAGMAS = (
+    ('journal_mode', 'WAL'),
+    ('synchronous', 'NORMAL'),
+    ('busy_timeout', 5000),
+    ('temp_store', 'MEMORY'),
+    ('cache_size', -16000),  # 16 MB page cache per connection
+    ('mmap_size', 134217728),  # Map up to 128 MB of the database file
+)
+
+
+def configure_sqlite_connection(conn):
+    """
+    Apply the shared SQLite pragmas to a DB-API connection.
+
+    Args:
+        conn: An open ``sqlite3`` connection.
+
+    Returns:
+        The same connection, for chaining.
+    """
+    cursor = conn.cursor()
+    try:
+        for name, value in SQLITE_PRAGMAS:
+            cursor.execute(f"PRAGMA {name}={value}")
+    finally:
+        cursor.close()
+    return conn
+
+
+def enable_sqlite_pragmas(engine):
+    """
+    Register a connect hook that tunes every new connection of a SQLite engine.
+
+    Args:
+        engine (Engine): SQLAlchemy engine. Engines for other dialects are left untouched.
+    """
+    if engine.dialect.name != 'sqlite':
+        return
+
+    @event.listens_for(engine, 'connect')
+    def _on_connect(dbapi_connection, connection_record):
+        configure_sqlite_connection(dbapi_connection)
+
+    # Connections opened before the hook was registered would keep the old settings
+    engine.dispose()
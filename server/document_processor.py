@@ -8,34 +8,79 @@ model for generating high-quality text embeddings and ChromaDB for efficient vec
 Key components:
 - PDF Processing: Uses PyPDFLoader for document loading and splitting
 - Embeddings: Leverages HuggingFace embeddings with the BGE model
-- Vector Storage: Implements ChromaDB for persistent vector storage and retrieval
+- Vector Storage: Implements ChromaDB for persistent vector storage and retrieval, or an
+  exact memory-mapped flat index (flat_store) selected with VECTOR_BACKEND
 """
 
 from langchain_community.document_loaders import PyPDFLoader
 from langchain_community.embeddings import HuggingFaceEmbeddings
 from langchain_community.vectorstores import Chroma
+import chromadb
 import os
-import pdf2image
+import time
+import uuid
+import fcntl
+import threading
+from contextlib import contextmanager
+import numpy as np
 import pytesseract
 from PIL import Image
 import io
 from langchain.text_splitter import RecursiveCharacterTextSplitter
 from langchain.docstore.document import Document
+from cv_chunker import split_cv_sections
+from flat_store import FlatClient, FlatVectorStore
+from embedding_server import RemoteEmbeddings
+from embedding_batcher import EmbeddingBatcher
+from rasterize import iter_pdf_pages
+
+# 'chroma' uses Chroma's HNSW index, 'flat' the exact memory-mapped index of flat_store
+VECTOR_BACKEND = os.getenv('VECTOR_BACKEND', 'chroma')
+# 'sections' chunks CVs along their resume sections, 'recursive' uses generic text splitting
+CHUNKING_STRATEGY = os.getenv('CHUNKING_STRATEGY', 'sections')
+
+# File next to the vector database holding the corpus version counter
+CORPUS_VERSION_FILE = "corpus.version"
+# File next to the vector database naming the collection searches are served from
+ACTIVE_COLLECTION_FILE = "active_collection"
+# LangChain's default collection name, used until a collection is swapped in
+DEFAULT_COLLECTION = "langchain"
+# HNSW index parameters applied when a collection is created (Chroma's defaults unless set).
+# Changing them takes effect for the next collection built by compaction or re-indexing.
+INDEX_SETTINGS = {
+    'hnsw:space': os.getenv('HNSW_SPACE', 'l2'),  # 'l2', 'cosine' or 'ip'
+    'hnsw:M': int(os.getenv('HNSW_M', '16')),
+    'hnsw:construction_ef': int(os.getenv('HNSW_CONSTRUCTION_EF', '100')),
+    'hnsw:search_ef': int(os.getenv('HNSW_SEARCH_EF', '10'))
+}
+# Largest distance still counted as a match, per distance metric. With normalized BGE
+# embeddings, squared L2 is twice the cosine distance, so these thresholds agree.
+MAX_MATCH_DISTANCE = {'l2': 0.8, 'cosine': 0.4, 'ip': 0.4}
+
+# Resolution of pages rendered for OCR; Tesseract works best around 300 dpi
+OCR_DPI = int(os.getenv('OCR_DPI', '300'))
+# Most pages of a scanned PDF passed to OCR
+OCR_MAX_PAGES = int(os.getenv('OCR_MAX_PAGES', '20'))
+
+# Suffix of the collection holding one pooled summary vector per CV
+SUMMARY_COLLECTION_SUFFIX = "_cvs"
+# Lock file serializing writes to the vector database across worker processes
+INDEX_LOCK_FILE = "index.lock"
 
 def extract_text_with_ocr(pdf_path: str) -> list:
     """Extract text from PDF using OCR when needed."""
     try:
-        # First try to convert PDF pages to images
-        images = pdf2image.convert_from_path(pdf_path)
+        # Render one grayscale page at a time instead of the whole document at once
         text_content = []
         
-        for i, image in enumerate(images):
+        for page_number, image in iter_pdf_pages(pdf_path, dpi=OCR_DPI, grayscale=True,
+                                                 max_pages=OCR_MAX_PAGES):
             # Extract text from image using Tesseract OCR
             text = pytesseract.image_to_string(image, lang='eng')
             if text.strip():
                 text_content.append({
                     'content': text,
-                    'page': i + 1
+                    'page': page_number
                 })
         
         return text_content
@@ -43,13 +88,15 @@ def extract_text_with_ocr(pdf_path: str) -> list:
         print(f"OCR processing error: {str(e)}")
         return []
 
-def load_cv(file_path: str) -> list:
+def load_cv(file_path: str, strategy: str = None) -> list:
     """
     Load and split a PDF document into semantically meaningful chunks.
     Attempts regular PDF text extraction first, falls back to OCR if needed.
     
     Args:
         file_path (str): Path to the PDF file to process. Must be a valid PDF file.
+        strategy (str): 'sections' to chunk along CV sections or 'recursive' for
+                        generic character-based splitting. Defaults to CHUNKING_STRATEGY.
         
     Returns:
         list: A list of document chunks with text content and metadata.
@@ -74,12 +121,18 @@ def load_cv(file_path: str) -> list:
         print(f"Error: File not found: {file_path}")
         raise FileNotFoundError(f"PDF file not found at {file_path}")
     
+    strategy = strategy or CHUNKING_STRATEGY
+
     # Try regular PDF text extraction first
     loader = PyPDFLoader(file_path)
     documents = []
     try:
         print("Attempting regular PDF text extraction...")
-        documents = loader.load_and_split()
+        if strategy == 'sections':
+            pages = [(doc.metadata.get('page', 1), doc.page_content) for doc in loader.load()]
+            documents = split_cv_sections(pages, metadata={'extraction_method': 'regular'})
+        else:
+            documents = loader.load_and_split()
         print(f"Regular extraction found {len(documents)} document chunks")
     except Exception as e:
         print(f"Regular PDF extraction failed: {str(e)}")
@@ -104,7 +157,12 @@ def load_cv(file_path: str) -> list:
             ocr_results = extract_text_with_ocr(file_path)
             print(f"OCR extracted {len(ocr_results)} pages of text")
             
-            if ocr_results:
+            if ocr_results and strategy == 'sections':
+                pages = [(result['page'], result['content']) for result in ocr_results]
+                for doc in split_cv_sections(pages, metadata={'filename': filename, 'extraction_method': 'ocr'}):
+                    valid_documents.append(ensure_metadata(doc, filename))
+                print(f"Split OCR text into {len(valid_documents)} section chunks")
+            elif ocr_results:
                 # Create documents from OCR results
                 text_splitter = RecursiveCharacterTextSplitter(
                     chunk_size=1000,
@@ -149,9 +207,55 @@ def load_cv(file_path: str) -> list:
 # BGE (BAAI General Embedding) model is specifically optimized for 
 # semantic similarity tasks and information retrieval
 model_name = "BAAI/bge-large-en-v1.5"
-embedding_model = HuggingFaceEmbeddings(model_name=model_name)
+# Address of a shared embedding server (see embedding_server.py); unset loads the model in-process
+EMBEDDING_SERVER_ADDRESS = os.getenv('EMBEDDING_SERVER_ADDRESS')
+# Concurrent embedding requests are merged into forward passes of up to this many texts,
+# waiting at most EMBED_BATCH_WAIT_MS for the batch to fill
+EMBED_BATCH_MAX_SIZE = int(os.getenv('EMBED_BATCH_MAX_SIZE', '64'))
+EMBED_BATCH_WAIT_MS = float(os.getenv('EMBED_BATCH_WAIT_MS', '5'))
+_embedding_model = None
+_embedding_model_lock = threading.Lock()
+
+def get_embedding_model() -> HuggingFaceEmbeddings:
+    """
+    Get the shared embedding model, loading it on first use.
+    
+    Loading is deferred so that processes which only extract text, such as the
+    workers of the bulk re-indexer, never pay for loading the model. When
+    ``EMBEDDING_SERVER_ADDRESS`` is set, the model is not loaded at all and a client
+    of the shared embedding server is returned instead. A local model is wrapped in
+    an EmbeddingBatcher that runs concurrent requests as shared forward passes.
+    
+    Returns:
+        Embeddings: The batched embedding model, or a RemoteEmbeddings client
+    """
+    global _embedding_model
+    if _embedding_model is None:
+        with _embedding_model_lock:
+            if _embedding_model is None:
+                if EMBEDDING_SERVER_ADDRESS:
+                    _embedding_model = RemoteEmbeddings(EMBEDDING_SERVER_ADDRESS)
+                else:
+                    _embedding_model = EmbeddingBatcher(
+                        HuggingFaceEmbeddings(model_name=model_name),
+                        max_batch_size=EMBED_BATCH_MAX_SIZE,
+                        max_wait_ms=EMBED_BATCH_WAIT_MS
+                    )
+    return _embedding_model
 
-def create_db(documents: list, db_path: str = "chroma_db") -> Chroma:
+def get_embedding_stats() -> dict:
+    """
+    Get the batching counters of the embedding model without loading it.
+    
+    Returns:
+        dict: Counters of the local batcher or of the embedding server, or None
+              while the model is not loaded
+    """
+    if _embedding_model is None:
+        return None
+    return _embedding_model.stats()
+
+def create_db(documents: list, db_path: str = "chroma_db", collection_name: str = None) -> Chroma:
     """
     Create a new Chroma vector database from documents and persist it to disk.
     
@@ -163,6 +267,7 @@ def create_db(documents: list, db_path: str = "chroma_db") -> Chroma:
                          Each document should have page_content and metadata.
         db_path (str): Directory path where the database will be persisted.
                       Defaults to "chroma_db".
+        collection_name (str): Collection to create. Defaults to the active collection.
         
     Returns:
         Chroma: A Chroma vector store instance containing the document embeddings.
@@ -174,14 +279,19 @@ def create_db(documents: list, db_path: str = "chroma_db") -> Chroma:
     """
     if not os.path.exists(db_path):
         os.makedirs(db_path)
-    db = Chroma.from_documents(
-        documents,
-        embedding_model,
-        persist_directory=db_path
+    db = load_db(db_path, collection_name)
+
+    # Group chunks per CV so every CV also gets its summary vector
+    cvs = {}
+    for doc in documents:
+        cvs.setdefault(doc.metadata.get('filename'), []).append(doc)
+    embeddings = get_embedding_model().embed_documents(
+        [doc.page_content for chunks in cvs.values() for doc in chunks]
     )
+    _store_cv_chunks(db, list(cvs.items()), embeddings)
     return db
 
-def load_db(db_path: str = "chroma_db") -> Chroma:
+def load_db(db_path: str = "chroma_db", collection_name: str = None) -> Chroma:
     """
     Load an existing Chroma vector database from disk.
     
@@ -192,20 +302,87 @@ def load_db(db_path: str = "chroma_db") -> Chroma:
     Args:
         db_path (str): Directory path where the database is stored.
                       Defaults to "chroma_db".
+        collection_name (str): Collection to open. Defaults to the active collection.
         
     Returns:
         Chroma: A Chroma vector store instance connected to the existing database.
-                Ready for similarity search and retrieval operations.
+                Ready for similarity search and retrieval operations. With
+                ``VECTOR_BACKEND=flat`` a FlatVectorStore with the same interface.
                 
     Raises:
         FileNotFoundError: If the database directory doesn't exist
         RuntimeError: If the database is corrupted or incompatible
     """
+    client = get_client(db_path)
+    collection_name = collection_name or get_active_collection(db_path)
+    try:
+        client.get_collection(collection_name)
+        # Index parameters of an existing collection cannot be changed
+        collection_metadata = None
+    except ValueError:
+        collection_metadata = get_index_settings()
+    if VECTOR_BACKEND == 'flat':
+        return FlatVectorStore(
+            client,
+            collection_name,
+            get_embedding_model(),
+            collection_metadata=collection_metadata
+        )
     return Chroma(
+        client=client,
+        collection_name=collection_name,
+        collection_metadata=collection_metadata,
         persist_directory=db_path,
-        embedding_function=embedding_model
+        embedding_function=get_embedding_model()
     )
 
+_clients = {}
+_clients_lock = threading.Lock()
+
+def get_client(db_path: str = "chroma_db"):
+    """
+    Get the vector database client of a directory, shared within the process.
+    
+    Args:
+        db_path (str): Directory path where the database is stored.
+        
+    Returns:
+        ClientAPI: A persistent Chroma client, or a FlatClient for the flat backend
+    """
+    with _clients_lock:
+        client = _clients.get(db_path)
+        if client is None:
+            if VECTOR_BACKEND == 'flat':
+                client = FlatClient(db_path)
+            else:
+                client = chromadb.PersistentClient(path=db_path)
+            _clients[db_path] = client
+        return client
+
+def get_index_settings() -> dict:
+    """
+    Get the HNSW parameters new collections are created with.
+    
+    Returns:
+        dict: Chroma collection metadata holding the index parameters
+    """
+    return dict(INDEX_SETTINGS)
+
+def get_match_threshold(db: Chroma) -> float:
+    """
+    Get the largest distance counted as a match for a collection's distance metric.
+    
+    Args:
+        db (Chroma): The vector store being searched.
+        
+    Returns:
+        float: ``MATCH_MAX_DISTANCE`` if set, otherwise the default for the metric
+    """
+    if os.getenv('MATCH_MAX_DISTANCE'):
+        return float(os.getenv('MATCH_MAX_DISTANCE'))
+    space = (db._collection.metadata or {}).get('hnsw:space', 'l2')
+    return MAX_MATCH_DISTANCE.get(space, MAX_MATCH_DISTANCE['l2'])
+
 def get_processed_pdfs_stats(uploads_dir: str = "uploads") -> dict:
     """
     Get statistics about processed PDF files.
@@ -240,3 +417,461 @@ def get_processed_pdfs_stats(uploads_dir: str = "uploads") -> dict:
     # Sort files by name
     stats['files'].sort(key=lambda x: x['name'])
     return stats
+
+def get_corpus_version(db_path: str = "chroma_db") -> int:
+    """
+    Get the current version of the indexed CV corpus.
+    
+    The version is a counter stored next to the vector database and bumped whenever
+    documents are added or removed, so caches keyed on it are invalidated by any
+    change to the searchable corpus.
+    
+    Args:
+        db_path (str): Directory path where the database is stored.
+        
+    Returns:
+        int: The corpus version, 0 if the corpus was never modified
+    """
+    try:
+        with open(os.path.join(db_path, CORPUS_VERSION_FILE)) as f:
+            return int(f.read().strip() or 0)
+    except (FileNotFoundError, ValueError):
+        return 0
+
+def bump_corpus_version(db_path: str = "chroma_db") -> int:
+    """
+    Increment the corpus version after the indexed documents changed.
+    
+    Args:
+        db_path (str): Directory path where the database is stored.
+        
+    Returns:
+        int: The new corpus version
+    """
+    os.makedirs(db_path, exist_ok=True)
+    version_path = os.path.join(db_path, CORPUS_VERSION_FILE)
+    with open(version_path + '.lock', 'a') as lock_file:
+        # Serialize concurrent bumps from several worker processes
+        fcntl.flock(lock_file, fcntl.LOCK_EX)
+        try:
+            version = get_corpus_version(db_path) + 1
+            tmp_path = f"{version_path}.{os.getpid()}.tmp"
+            with open(tmp_path, 'w') as f:
+                f.write(str(version))
+            os.replace(tmp_path, version_path)
+        finally:
+            fcntl.flock(lock_file, fcntl.LOCK_UN)
+    return version
+
+def get_active_collection(db_path: str = "chroma_db") -> str:
+    """
+    Get the name of the collection searches and writes currently go to.
+    
+    Args:
+        db_path (str): Directory path where the database is stored.
+        
+    Returns:
+        str: The active collection name
+    """
+    try:
+        with open(os.path.join(db_path, ACTIVE_COLLECTION_FILE)) as f:
+            return f.read().strip() or DEFAULT_COLLECTION
+    except FileNotFoundError:
+        return DEFAULT_COLLECTION
+
+def set_active_collection(db_path: str, collection_name: str) -> None:
+    """
+    Atomically point the database at another collection.
+    
+    Args:
+        db_path (str): Directory path where the database is stored.
+        collection_name (str): Name of the collection to activate.
+    """
+    pointer_path = os.path.join(db_path, ACTIVE_COLLECTION_FILE)
+    tmp_path = f"{pointer_path}.{os.getpid()}.tmp"
+    with open(tmp_path, 'w') as f:
+        f.write(collection_name)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, pointer_path)
+
+@contextmanager
+def index_write_lock(db_path: str = "chroma_db"):
+    """
+    Hold the exclusive write lock of the vector database.
+    
+    Every operation adding, removing or rebuilding vectors takes this lock, so a
+    compaction never misses documents written while it copies the collection.
+    
+    Args:
+        db_path (str): Directory path where the database is stored.
+    """
+    os.makedirs(db_path, exist_ok=True)
+    with open(os.path.join(db_path, INDEX_LOCK_FILE), 'a') as lock_file:
+        fcntl.flock(lock_file, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+def get_summary_collection(client, chunk_collection):
+    """
+    Get the collection holding one pooled vector per CV next to a chunk collection.
+    
+    Args:
+        client: The Chroma client of the database.
+        chunk_collection (Collection): The collection holding the CV chunks.
+        
+    Returns:
+        Collection: The summary collection, created with the chunk collection's settings
+    """
+    return client.get_or_create_collection(
+        chunk_collection.name + SUMMARY_COLLECTION_SUFFIX, metadata=chunk_collection.metadata
+    )
+
+def pool_embeddings(embeddings: list) -> list:
+    """Mean-pool chunk embeddings into one L2-normalized document vector."""
+    pooled = np.mean(np.asarray(embeddings, dtype=np.float32), axis=0)
+    return (pooled / max(float(np.linalg.norm(pooled)), 1e-12)).tolist()
+
+def rebuild_cv_summaries(client, chunk_collection, batch_size: int = 1000) -> int:
+    """
+    Recompute every CV's summary vector from the chunk embeddings already stored.
+    
+    Args:
+        client: The Chroma client of the database.
+        chunk_collection (Collection): The collection holding the CV chunks.
+        batch_size (int): Number of vectors read or written per batch.
+        
+    Returns:
+        int: Number of CVs summarized
+    """
+    # Running sums keep memory flat; the normalized sum is the pooled vector
+    totals = {}
+    offset = 0
+    while True:
+        batch = chunk_collection.get(include=['embeddings', 'metadatas'], limit=batch_size, offset=offset)
+        if not batch['ids']:
+            break
+        for embedding, metadata in zip(batch['embeddings'], batch['metadatas']):
+            filename = (metadata or {}).get('filename')
+            if filename:
+                total = totals.setdefault(filename, [0.0, 0])
+                total[0] = total[0] + np.asarray(embedding, dtype=np.float32)
+                total[1] += 1
+        offset += len(batch['ids'])
+
+    summaries = get_summary_collection(client, chunk_collection)
+    filenames = list(totals)
+    for i in range(0, len(filenames), batch_size):
+        names = filenames[i:i + batch_size]
+        summaries.upsert(
+            ids=names,
+            embeddings=[pool_embeddings([totals[name][0]]) for name in names],
+            metadatas=[{'filename': name, 'chunks': totals[name][1]} for name in names]
+        )
+    print(f"Rebuilt summary vectors for {len(filenames)} CVs")
+    return len(filenames)
+
+def _store_cv_chunks(db: Chroma, cvs: list, embeddings: list) -> int:
+    """Write embedded CV chunks and summary vectors, replacing what was stored for those CVs."""
+    # A corpus indexed before summary vectors existed is summarized once, so that
+    # two-stage search never sees only the CVs written since
+    summaries = get_summary_collection(db._client, db._collection)
+    if not summaries.count() and db._collection.count():
+        rebuild_cv_summaries(db._client, db._collection)
+
+    texts, metadatas, pooled = [], [], []
+    for filename, documents in cvs:
+        start = len(texts)
+        for doc in documents:
+            texts.append(doc.page_content)
+            metadatas.append(doc.metadata)
+        if documents:
+            pooled.append((filename, pool_embeddings(embeddings[start:len(texts)]), len(documents)))
+
+    filenames = [filename for filename, _ in cvs]
+    stale_ids = db.get(where={'filename': {'$in': filenames}}, include=[])['ids']
+    db._collection.add(
+        ids=[str(uuid.uuid4()) for _ in texts],
+        embeddings=embeddings,
+        documents=texts,
+        metadatas=metadatas
+    )
+    if stale_ids:
+        db.delete(stale_ids)
+
+    if pooled:
+        summaries.upsert(
+            ids=[filename for filename, _, _ in pooled],
+            embeddings=[vector for _, vector, _ in pooled],
+            metadatas=[{'filename': filename, 'chunks': count} for filename, _, count in pooled]
+        )
+    return len(stale_ids)
+
+def delete_cv_vectors(db: Chroma, filename: str) -> int:
+    """
+    Remove every chunk of a CV, and its summary vector, from the vector database.
+    
+    Args:
+        db (Chroma): The vector store to delete from.
+        filename (str): The CV filename stored in the chunk metadata.
+        
+    Returns:
+        int: Number of chunks removed
+    """
+    ids = db.get(where={'filename': filename}, include=[])['ids']
+    if ids:
+        db.delete(ids)
+    get_summary_collection(db._client, db._collection).delete(ids=[filename])
+    return len(ids)
+
+def replace_cv_vectors(db: Chroma, filename: str, documents: list) -> int:
+    """
+    Store the new chunks of a CV, then remove the chunks previously stored for it.
+    
+    The new chunks are added first so a failed write leaves the previous version
+    of the CV searchable. The CV's summary vector is replaced as well.
+    
+    Args:
+        db (Chroma): The vector store to write to.
+        filename (str): The CV filename stored in the chunk metadata.
+        documents (list): The new document chunks of the CV.
+        
+    Returns:
+        int: Number of previous chunks removed
+    """
+    embeddings = get_embedding_model().embed_documents([doc.page_content for doc in documents])
+    return _store_cv_chunks(db, [(filename, documents)], embeddings)
+
+def index_cv_batch(cvs: list, db_path: str = "chroma_db") -> int:
+    """
+    Embed the chunks of several CVs together and store them in one write.
+    
+    Embedding many documents' chunks in one call keeps the model's batches full,
+    which is far faster than embedding each CV's handful of chunks on its own.
+    Embedding happens before the index write lock is taken; chunks previously
+    stored under the same filenames are removed once the new ones are written.
+    
+    Args:
+        cvs (list): ``(filename, documents)`` pairs.
+        db_path (str): Directory path where the database is stored.
+        
+    Returns:
+        int: Number of chunks stored
+    """
+    texts = [doc.page_content for _, documents in cvs for doc in documents]
+    if not texts:
+        return 0
+    embeddings = get_embedding_model().embed_documents(texts)
+
+    with index_write_lock(db_path):
+        _store_cv_chunks(load_db(db_path), cvs, embeddings)
+    return len(texts)
+
+def two_stage_search(db: Chroma, query: str, k: int = 5, candidates: int = 20) -> list:
+    """
+    Find the chunks most similar to a query, searching only the most similar CVs.
+    
+    The query is first matched against the compact per-CV summary vectors to select
+    ``candidates`` CVs, and chunk-level scoring then only runs inside those CVs, so
+    latency follows the number of candidates instead of the total chunk count. Falls
+    back to a search over all chunks while no summary vectors exist.
+    
+    Args:
+        db (Chroma): The vector store to search.
+        query (str): The query text.
+        k (int): Number of chunks to return.
+        candidates (int): Number of CVs selected in the first stage.
+        
+    Returns:
+        list: ``(document, distance)`` tuples, most similar first
+    """
+    summaries = get_summary_collection(db._client, db._collection)
+    summary_count = summaries.count()
+    if not summary_count:
+        return db.similarity_search_with_score(query, k=k)
+
+    query_embedding = get_embedding_model().embed_query(query)
+    shortlist = summaries.query(
+        query_embeddings=[query_embedding],
+        n_results=min(candidates, summary_count),
+        include=[]
+    )['ids'][0]
+    if not shortlist:
+        return []
+    return db.similarity_search_by_vector_with_relevance_scores(
+        query_embedding,
+        k=k,
+        filter={'filename': {'$in': shortlist}}
+    )
+
+def _group_by_cv(matches: list, k: int, chunks_per_cv: int) -> list:
+    """Group ``(document, distance)`` matches by CV, keeping each CV's closest chunks"""
+    groups = {}
+    for doc, distance in matches:
+        filename = doc.metadata.get('filename')
+        if filename:
+            groups.setdefault(filename, []).append((doc, distance))
+    ranked = []
+    for filename, chunks in groups.items():
+        chunks.sort(key=lambda match: match[1])
+        ranked.append((filename, chunks[:chunks_per_cv]))
+    ranked.sort(key=lambda group: group[1][0][1])
+    return ranked[:k]
+
+def grouped_search(db: Chroma, queries: list, k: int = 5, candidates: int = 20,
+                   chunks_per_cv: int = 3, keep: int = None) -> list:
+    """
+    Find the most similar distinct CVs for many queries, with their closest chunks.
+
+    All queries are embedded in one model call and matched against the per-CV
+    summary vectors in one batched search. Chunk-level scoring then runs per query
+    inside its shortlist, reusing the query embeddings.
+
+    Args:
+        db (Chroma): The vector store to search.
+        queries (list): The query texts.
+        k (int): Number of distinct CVs returned per query.
+        candidates (int): Number of CVs selected per query in the first stage, or
+                          None to score chunks of the whole corpus.
+        chunks_per_cv (int): Chunks fetched per CV, so each CV's best chunks are found.
+        keep (int): Chunks kept per CV, ``chunks_per_cv`` unless set.
+
+    Returns:
+        list: One list of ``(filename, [(document, distance), ...])`` per query,
+              most similar CV first and each CV's chunks most similar first
+    """
+    if not queries:
+        return []
+    keep = keep or chunks_per_cv
+    embeddings = get_embedding_model().embed_documents(queries)
+
+    summaries = get_summary_collection(db._client, db._collection)
+    summary_count = summaries.count() if candidates else 0
+    if summary_count:
+        shortlists = summaries.query(
+            query_embeddings=embeddings,
+            n_results=min(max(candidates, k), summary_count),
+            include=[]
+        )['ids']
+    else:
+        shortlists = [None] * len(queries)
+
+    results = []
+    for embedding, shortlist in zip(embeddings, shortlists):
+        if shortlist is None:
+            # No summary vectors (or no shortlisting): over-fetch chunks from the whole corpus
+            matches = db.similarity_search_by_vector_with_relevance_scores(embedding, k=k * chunks_per_cv)
+        elif shortlist:
+            matches = db.similarity_search_by_vector_with_relevance_scores(
+                embedding,
+                k=len(shortlist) * chunks_per_cv,
+                filter={'filename': {'$in': shortlist}}
+            )
+        else:
+            matches = []
+        results.append(_group_by_cv(matches, k, keep))
+    return results
+
+def batch_search(db: Chroma, queries: list, k: int = 5, candidates: int = 20, chunks_per_cv: int = 3) -> list:
+    """
+    Find the most similar distinct CVs for many queries at once.
+
+    Runs ``grouped_search`` and represents every CV by its best-matching chunk.
+
+    Args:
+        db (Chroma): The vector store to search.
+        queries (list): The query texts.
+        k (int): Number of distinct CVs returned per query.
+        candidates (int): Number of CVs selected per query in the first stage.
+        chunks_per_cv (int): Chunks fetched per CV, so each CV's best chunk is found.
+
+    Returns:
+        list: One list of ``(document, distance)`` tuples per query, one per CV,
+              most similar first
+    """
+    groups = grouped_search(db, queries, k=k, candidates=candidates, chunks_per_cv=chunks_per_cv, keep=1)
+    return [[chunks[0] for _, chunks in query_groups] for query_groups in groups]
+
+def _dir_size(path: str) -> int:
+    total = 0
+    for root, _, files in os.walk(path):
+        for name in files:
+            try:
+                total += os.path.getsize(os.path.join(root, name))
+            except OSError:
+                pass
+    return total
+
+def _index_stats(db_path: str, collection, probe_runs: int = 20) -> dict:
+    """Measure the size of a collection and the latency of a nearest-neighbour query."""
+    stats = {
+        'collection': collection.name,
+        'vectors': collection.count(),
+        'disk_bytes': _dir_size(db_path),
+        'query_ms': None
+    }
+    if stats['vectors']:
+        # Probe with a stored vector so the timing excludes query embedding
+        probe = collection.get(limit=1, include=['embeddings'])['embeddings'][0]
+        started = time.perf_counter()
+        for _ in range(probe_runs):
+            collection.query(query_embeddings=[probe], n_results=min(5, stats['vectors']), include=[])
+        stats['query_ms'] = round((time.perf_counter() - started) * 1000 / probe_runs, 3)
+    return stats
+
+def compact_db(db_path: str = "chroma_db", batch_size: int = 1000) -> dict:
+    """
+    Rebuild the active collection without the entries of deleted documents.
+    
+    Deleted vectors are only marked as removed in the HNSW index (or tombstoned in
+    the flat index) and keep taking space and search time. Compaction copies the live vectors, without re-embedding
+    them, into a fresh collection built with the configured index parameters,
+    rebuilds the per-CV summary vectors from them, atomically switches the active
+    collection and drops the old one.
+    
+    Args:
+        db_path (str): Directory path where the database is stored.
+        batch_size (int): Number of vectors copied per batch.
+        
+    Returns:
+        dict: Size and query latency of the index before and after compaction
+    """
+    with index_write_lock(db_path):
+        source = load_db(db_path)
+        client = source._client
+        old_collection = source._collection
+        before = _index_stats(db_path, old_collection)
+
+        new_name = f"cvs_{time.strftime('%Y%m%d%H%M%S')}_{os.getpid()}"
+        # The rebuilt collection picks up the currently configured index parameters
+        new_collection = client.create_collection(new_name, metadata=get_index_settings())
+        offset = 0
+        while True:
+            batch = old_collection.get(
+                include=['embeddings', 'documents', 'metadatas'],
+                limit=batch_size,
+                offset=offset
+            )
+            if not batch['ids']:
+                break
+            new_collection.add(
+                ids=batch['ids'],
+                embeddings=batch['embeddings'],
+                documents=batch['documents'],
+                metadatas=batch['metadatas']
+            )
+            offset += len(batch['ids'])
+        print(f"Copied {offset} vectors into collection {new_name}")
+        rebuild_cv_summaries(client, new_collection, batch_size)
+
+        set_active_collection(db_path, new_name)
+        client.delete_collection(old_collection.name)
+        try:
+            client.delete_collection(old_collection.name + SUMMARY_COLLECTION_SUFFIX)
+        except ValueError:
+            pass
+        after = _index_stats(db_path, new_collection)
+
+    return {'before': before, 'after': after}
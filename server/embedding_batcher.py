@@ -0,0 +1,188 @@
+"""
+Embedding Batcher Module
+
+This module merges concurrent embedding requests into shared forward passes. A chat
+query embeds a single job description and an upload a handful of chunks; run one by
+one, these small forward passes leave most of the CPU's matrix throughput unused.
+The batcher queues requests from all threads, waits a few milliseconds for more to
+arrive (or until the batch is full), embeds them in one model call and hands every
+caller its own vectors. Requests larger than a batch are embedded one batch-sized
+slice at a time, going back to the end of the queue after each slice, so a bulk
+upload does not hold up the chat queries queued behind it.
+
+Key components:
+- EmbeddingBatcher: LangChain embeddings wrapper with a single model thread, dynamic
+  micro-batching and queue, batch-size and wait-time counters
+"""
+
+import time
+import queue
+import threading
+from langchain_core.embeddings import Embeddings
+
+
+class _EmbedRequest:
+    __slots__ = ('texts', 'offset', 'enqueued', 'done', 'result', 'error')
+
+    def __init__(self, texts):
+        self.texts = texts
+        # Texts before offset are already embedded into result
+        self.offset = 0
+        self.enqueued = time.monotonic()
+        self.done = threading.Event()
+        self.result = []
+        self.error = None
+
+    @property
+    def remaining(self):
+        return len(self.texts) - self.offset
+
+
+class EmbeddingBatcher(Embeddings):
+    """
+    Run concurrent embedding requests as shared batched forward passes.
+
+    All model calls happen on one background thread, so the batcher also keeps
+    concurrent callers from oversubscribing the model's CPU thread pool. A request
+    larger than ``max_batch_size`` is split into slices of at most that size; after
+    each slice it rejoins the end of the queue, so requests queued meanwhile are
+    embedded in between rather than after the whole of it.
+
+    Args:
+        model: Embeddings with an ``embed_documents`` method.
+        max_batch_size (int): Most texts embedded in one forward pass.
+        max_wait_ms (float): How long the first request of a batch waits for others;
+            0 only merges requests that are already queued.
+    """
+
+    def __init__(self, model, max_batch_size=64, max_wait_ms=5):
+        self.model = model
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000.0
+        self._queue = queue.Queue()
+        self._carry = None
+        self._stats_lock = threading.Lock()
+        self.requests = 0
+        # Requests and slices of split requests that shared a forward pass
+        self.slices = 0
+        self.texts = 0
+        self.batches = 0
+        self.max_batch_texts = 0
+        self.wait_seconds = 0.0
+        self.max_wait_seconds = 0.0
+        self.forward_seconds = 0.0
+        self._thread = threading.Thread(target=self._run, name='embedding-batcher', daemon=True)
+        self._thread.start()
+
+    def embed_documents(self, texts):
+        if not texts:
+            return []
+        request = _EmbedRequest(list(texts))
+        self._queue.put(request)
+        request.done.wait()
+        if request.error is not None:
+            raise request.error
+        return request.result
+
+    def embed_query(self, text):
+        return self.embed_documents([text])[0]
+
+    def _next_request(self, timeout):
+        if self._carry is not None:
+            request, self._carry = self._carry, None
+            return request
+        if timeout is None:
+            return self._queue.get()
+        if timeout <= 0:
+            return self._queue.get_nowait()
+        return self._queue.get(timeout=timeout)
+
+    def _collect(self):
+        """
+        Block for the next request, then gather more until the batch is full or the wait is over.
+
+        Returns:
+            tuple: ``(batch, size)`` where ``batch`` holds ``(request, count)`` pairs,
+                   the next ``count`` texts of each request to embed
+        """
+        first = self._next_request(None)
+        size = min(first.remaining, self.max_batch_size)
+        batch = [(first, size)]
+        deadline = time.monotonic() + self.max_wait
+        while size < self.max_batch_size:
+            try:
+                request = self._next_request(deadline - time.monotonic())
+            except queue.Empty:
+                break
+            if size + request.remaining > self.max_batch_size:
+                if request.remaining <= self.max_batch_size:
+                    # Leads the next batch instead of overfilling this one
+                    self._carry = request
+                    break
+                # Too large for any batch anyway: fill this one with its first slice
+                batch.append((request, self.max_batch_size - size))
+                size = self.max_batch_size
+                break
+            batch.append((request, request.remaining))
+            size += request.remaining
+        return batch, size
+
+    def _run(self):
+        while True:
+            batch, size = self._collect()
+            started = time.monotonic()
+            texts = [text for request, count in batch
+                     for text in request.texts[request.offset:request.offset + count]]
+            try:
+                vectors = self.model.embed_documents(texts)
+            except Exception as e:
+                for request, _ in batch:
+                    request.error = e
+                    request.done.set()
+                continue
+            finished = time.monotonic()
+
+            offset = 0
+            completed = 0
+            waits = []
+            for request, count in batch:
+                request.result.extend(vectors[offset:offset + count])
+                request.offset += count
+                offset += count
+                waits.append(started - request.enqueued)
+                if request.remaining:
+                    # The rest waits its turn behind the requests queued meanwhile
+                    request.enqueued = finished
+                    self._queue.put(request)
+                else:
+                    completed += 1
+                    request.done.set()
+
+            with self._stats_lock:
+                self.requests += completed
+                self.slices += len(batch)
+                self.texts += size
+                self.batches += 1
+                self.max_batch_texts = max(self.max_batch_texts, size)
+                self.wait_seconds += sum(waits)
+                self.max_wait_seconds = max(self.max_wait_seconds, max(waits))
+                self.forward_seconds += finished - started
+
+    def stats(self):
+        """Snapshot of the batching counters for monitoring"""
+        with self._stats_lock:
+            return {
+                'queue_depth': self._queue.qsize(),
+                'max_batch_size': self.max_batch_size,
+                'max_wait_ms': round(self.max_wait * 1000, 3),
+                'requests': self.requests,
+                'slices': self.slices,
+                'texts': self.texts,
+                'batches': self.batches,
+                'avg_batch_texts': round(self.texts / self.batches, 2) if self.batches else 0.0,
+                'avg_requests_per_batch': round(self.slices / self.batches, 2) if self.batches else 0.0,
+                'max_batch_texts': self.max_batch_texts,
+                'avg_wait_ms': round(self.wait_seconds * 1000 / self.slices, 3) if self.slices else 0.0,
+                'max_observed_wait_ms': round(self.max_wait_seconds * 1000, 3),
+                'avg_forward_ms': round(self.forward_seconds * 1000 / self.batches, 3) if self.batches else 0.0
+            }
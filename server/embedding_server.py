@@ -0,0 +1,293 @@
+"""
+Embedding Server Module
+
+This module loads the embedding model once and serves embedding requests from every
+application worker process on the host. Without it, each worker loads its own copy of
+BAAI/bge-large-en-v1.5 (about 1.3 GB) and its own torch thread pool, and the pools
+compete for the same cores. Workers talk to the server over a Unix socket or a
+localhost TCP port using ``multiprocessing.connection`` for HMAC authentication and
+message framing. Messages are JSON, never pickle, so a peer cannot make either side
+run code.
+
+Run from the server directory:
+    EMBEDDING_SERVER_ADDRESS=instance/embeddings.sock python embedding_server.py
+
+with ``EMBEDDING_SERVER_AUTHKEY`` set to a random secret, and start the application
+with the same ``EMBEDDING_SERVER_ADDRESS`` and ``EMBEDDING_SERVER_AUTHKEY`` so that
+``get_embedding_model`` returns a client instead of loading the model. TCP addresses
+must be on the loopback interface, and the Unix socket is only accessible to its owner.
+
+Key components:
+- parse_address: Turn ``host:port`` or a socket path into a connection address
+- RemoteEmbeddings: LangChain embeddings client forwarding calls to the server
+- EmbeddingServer: Threaded server running the model for all connected clients
+"""
+
+import os
+import sys
+import json
+import argparse
+import ipaddress
+import threading
+from multiprocessing.connection import Client, Listener
+from langchain_core.embeddings import Embeddings
+
+# Largest request or response accepted, in bytes
+MAX_MESSAGE_BYTES = 256 * 1024 * 1024
+
+
+class EmbeddingServerError(RuntimeError):
+    """The embedding server could not embed the request, or is not configured securely"""
+
+
+def get_authkey():
+    """
+    Read the shared secret authenticating clients and server.
+
+    There is no default: a secret known from the source code would authenticate anyone.
+
+    Returns:
+        bytes: The value of ``EMBEDDING_SERVER_AUTHKEY``
+
+    Raises:
+        EmbeddingServerError: If the variable is not set.
+    """
+    authkey = os.getenv('EMBEDDING_SERVER_AUTHKEY')
+    if not authkey:
+        raise EmbeddingServerError("EMBEDDING_SERVER_AUTHKEY must be set to use the embedding server")
+    return authkey.encode()
+
+
+def parse_address(address):
+    """
+    Turn an address setting into a ``multiprocessing.connection`` address.
+
+    Args:
+        address (str): ``host:port`` for TCP, anything else is a Unix socket path.
+
+    Returns:
+        The ``(host, port)`` tuple or the socket path
+
+    Raises:
+        EmbeddingServerError: If a TCP host is not an IPv4 loopback address.
+    """
+    host, sep, port = address.rpartition(':')
+    if sep and port.isdigit() and '/' not in address:
+        host = host or 'localhost'
+        if host != 'localhost':
+            # multiprocessing.connection only speaks IPv4 for TCP addresses
+            try:
+                address_ip = ipaddress.ip_address(host)
+                loopback = address_ip.version == 4 and address_ip.is_loopback
+            except ValueError:
+                loopback = False
+            if not loopback:
+                raise EmbeddingServerError(f"Embedding server TCP host must be localhost or 127.x.x.x, got {host}")
+        return host, int(port)
+    return address
+
+
+def _send(conn, message):
+    conn.send_bytes(json.dumps(message).encode())
+
+
+def _recv(conn):
+    return json.loads(conn.recv_bytes(MAX_MESSAGE_BYTES))
+
+
+class RemoteEmbeddings(Embeddings):
+    """
+    Embeddings client for a running embedding server.
+
+    Each thread keeps its own connection, which is re-opened once if the server
+    restarted in the meantime.
+
+    Args:
+        address (str): Address of the server, ``host:port`` or a Unix socket path.
+        authkey (bytes): Shared secret of the server, ``EMBEDDING_SERVER_AUTHKEY``
+                         unless given.
+    """
+
+    def __init__(self, address, authkey=None):
+        self.address = parse_address(address)
+        self.authkey = authkey or get_authkey()
+        self._local = threading.local()
+
+    def _connection(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = self._local.conn = Client(self.address, authkey=self.authkey)
+        return conn
+
+    def _close(self):
+        conn = getattr(self._local, 'conn', None)
+        self._local.conn = None
+        if conn is not None:
+            try:
+                conn.close()
+            except OSError:
+                pass
+
+    def _call(self, method, payload):
+        for attempt in range(2):
+            try:
+                conn = self._connection()
+                _send(conn, [method, payload])
+                status, result = _recv(conn)
+                break
+            except (EOFError, OSError):
+                # A stale connection to a restarted server is retried once on a new one
+                self._close()
+                if attempt:
+                    raise
+        if status != 'ok':
+            raise EmbeddingServerError(result)
+        return result
+
+    def embed_documents(self, texts):
+        if not texts:
+            return []
+        return self._call('embed_documents', list(texts))
+
+    def embed_query(self, text):
+        return self._call('embed_query', text)
+
+    def stats(self):
+        """Counters of the server, for monitoring"""
+        return self._call('stats', None)
+
+
+class EmbeddingServer:
+    """
+    Serve an embedding model to many client processes.
+
+    Every connection is handled on its own thread. The model is expected to be an
+    EmbeddingBatcher, which merges requests from all clients into shared forward
+    passes on a single thread, so the model's thread pool is the only one using
+    the CPU cores.
+
+    Args:
+        model: Thread-safe object with ``embed_documents`` and ``embed_query`` methods.
+        address (str): Address to listen on, ``host:port`` or a Unix socket path.
+        authkey (bytes): Shared secret clients must present, ``EMBEDDING_SERVER_AUTHKEY``
+                         unless given.
+    """
+
+    def __init__(self, model, address, authkey=None):
+        self.model = model
+        self.address = parse_address(address)
+        self.authkey = authkey or get_authkey()
+        self._stats_lock = threading.Lock()
+        self.connections = 0
+        self.requests = 0
+        self.texts = 0
+        self.errors = 0
+
+    def stats(self):
+        with self._stats_lock:
+            stats = {
+                'connections': self.connections,
+                'requests': self.requests,
+                'texts': self.texts,
+                'errors': self.errors
+            }
+        if hasattr(self.model, 'stats'):
+            stats['model'] = self.model.stats()
+        return stats
+
+    def handle(self, method, payload):
+        if method == 'stats':
+            return self.stats()
+        if method not in ('embed_documents', 'embed_query'):
+            raise ValueError(f"Unknown method {method}")
+        if method == 'embed_query' and not isinstance(payload, str):
+            raise ValueError("embed_query expects a string")
+        if method == 'embed_documents' and not (isinstance(payload, list)
+                                                and all(isinstance(text, str) for text in payload)):
+            raise ValueError("embed_documents expects a list of strings")
+        with self._stats_lock:
+            self.requests += 1
+            self.texts += len(payload) if method == 'embed_documents' else 1
+        return getattr(self.model, method)(payload)
+
+    def serve_connection(self, conn):
+        with self._stats_lock:
+            self.connections += 1
+        try:
+            while True:
+                try:
+                    method, payload = _recv(conn)
+                except (EOFError, OSError):
+                    return
+                except ValueError as e:
+                    # Malformed JSON or an oversized message; the stream cannot be trusted further
+                    print(f"Dropped embedding client sending an invalid message: {str(e)}")
+                    return
+                try:
+                    result = self.handle(method, payload)
+                    # numpy-backed models return arrays; JSON needs plain lists
+                    _send(conn, ['ok', result.tolist() if hasattr(result, 'tolist') else result])
+                except Exception as e:
+                    with self._stats_lock:
+                        self.errors += 1
+                    print(f"Embedding request failed: {str(e)}")
+                    _send(conn, ['error', str(e)])
+        finally:
+            with self._stats_lock:
+                self.connections -= 1
+            conn.close()
+
+    def serve_forever(self):
+        if isinstance(self.address, str) and os.path.exists(self.address):
+            # A socket file left behind by a previous server
+            os.unlink(self.address)
+        # Create the socket file owner-only from the start, not chmod it after binding
+        previous_umask = os.umask(0o177) if isinstance(self.address, str) else None
+        try:
+            listener = Listener(self.address, authkey=self.authkey)
+        finally:
+            if previous_umask is not None:
+                os.umask(previous_umask)
+        if isinstance(self.address, str):
+            os.chmod(self.address, 0o600)
+        with listener:
+            print(f"Embedding server listening on {self.address}")
+            while True:
+                try:
+                    conn = listener.accept()
+                except Exception as e:
+                    # A client that fails authentication must not stop the server
+                    print(f"Rejected embedding client: {str(e)}")
+                    continue
+                threading.Thread(target=self.serve_connection, args=(conn,), daemon=True).start()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Serve the embedding model to all app workers")
+    parser.add_argument('--address', default=os.getenv('EMBEDDING_SERVER_ADDRESS', 'instance/embeddings.sock'),
+                        help="host:port or Unix socket path to listen on")
+    parser.add_argument('--threads', type=int, default=int(os.getenv('EMBEDDING_THREADS', '0')),
+                        help="torch CPU threads, 0 keeps torch's default")
+    args = parser.parse_args(argv)
+    try:
+        # Fail on an unsafe configuration before spending a minute loading the model
+        parse_address(args.address)
+        authkey = get_authkey()
+    except EmbeddingServerError as e:
+        parser.error(str(e))
+
+    if args.threads:
+        import torch
+        torch.set_num_threads(args.threads)
+
+    # Load the model locally even though the same variable makes workers use the server
+    os.environ.pop('EMBEDDING_SERVER_ADDRESS', None)
+    from document_processor import get_embedding_model
+    model = get_embedding_model()
+    print("Embedding model loaded")
+    EmbeddingServer(model, args.address, authkey=authkey).serve_forever()
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
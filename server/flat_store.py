@@ -0,0 +1,458 @@
+"""
+Flat Vector Store Module
+
+This module implements an exact, in-process vector index as an alternative to Chroma
+for corpora of up to a few hundred thousand chunks. Normalized embeddings are kept in
+one memory-mapped array file per collection and scored with a single matrix product,
+while ids, texts and metadata live in a SQLite side table. Because the array is mapped
+read-only, every worker process serving searches shares the same pages through the OS
+page cache instead of holding its own copy.
+
+Writes only ever append rows; replaced or deleted rows are tombstoned and reclaimed
+by compaction, which copies the live rows into a fresh collection.
+
+The classes mirror the small part of the Chroma client, collection and LangChain
+vector store API used by document_processor, so both backends are interchangeable.
+
+Key components:
+- FlatClient: Opens, creates and drops the collections of one database directory
+- FlatCollection: Append-only memory-mapped vectors with tombstones and exact search
+- FlatVectorStore: LangChain-style wrapper embedding queries and returning Documents
+"""
+
+import os
+import json
+import sqlite3
+import threading
+import numpy as np
+from langchain.docstore.document import Document
+from db_utils import configure_sqlite_connection
+
+# Side table holding collection settings and per-row ids, texts and metadata
+FLAT_INDEX_FILE = "flat_index.sqlite3"
+# float16 halves disk, memory and page-cache use; float32 skips the conversion when scoring
+FLAT_VECTOR_DTYPE = os.getenv('FLAT_VECTOR_DTYPE', 'float16')
+# Rows converted and scored per block, bounding the float32 working set of a search
+SCORE_BLOCK_ROWS = 65536
+
+
+def _normalize(vectors):
+    vectors = np.asarray(vectors, dtype=np.float32)
+    if vectors.ndim == 1:
+        vectors = vectors[np.newaxis, :]
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    return vectors / np.maximum(norms, 1e-12)
+
+
+def _similarities_to_distances(similarities, space):
+    """Convert cosine similarities into the distances Chroma reports for a metric"""
+    if space == 'l2':
+        # Squared L2 between unit vectors
+        return np.maximum(2.0 - 2.0 * similarities, 0.0)
+    return 1.0 - similarities
+
+
+class FlatClient:
+    """
+    Collections of one database directory, sharing one SQLite side table.
+
+    Args:
+        path (str): The database directory.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        os.makedirs(path, exist_ok=True)
+        self._lock = threading.RLock()
+        self._collections = {}
+        self._conn = configure_sqlite_connection(
+            sqlite3.connect(os.path.join(path, FLAT_INDEX_FILE), check_same_thread=False, timeout=30)
+        )
+        with self._conn:
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS collections ("
+                "name TEXT PRIMARY KEY, metadata TEXT, dtype TEXT NOT NULL, "
+                "dim INTEGER, rows INTEGER NOT NULL DEFAULT 0, version INTEGER NOT NULL DEFAULT 0)"
+            )
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS vectors ("
+                "collection TEXT NOT NULL, row INTEGER NOT NULL, id TEXT NOT NULL, "
+                "document TEXT, metadata TEXT, live INTEGER NOT NULL DEFAULT 1, "
+                "PRIMARY KEY (collection, row))"
+            )
+            self._conn.execute(
+                "CREATE INDEX IF NOT EXISTS vectors_live_id ON vectors (collection, id) WHERE live = 1"
+            )
+
+    def vector_path(self, name):
+        """Location of a collection's memory-mapped vector file"""
+        return os.path.join(self.path, f"flat_{name}.vectors")
+
+    def get_collection(self, name):
+        """Open an existing collection; raises ValueError if it does not exist"""
+        with self._lock:
+            row = self._conn.execute("SELECT metadata FROM collections WHERE name = ?", (name,)).fetchone()
+            if row is None:
+                self._collections.pop(name, None)
+                raise ValueError(f"Collection {name} does not exist.")
+            collection = self._collections.get(name)
+            if collection is None:
+                collection = self._collections[name] = FlatCollection(self, name, json.loads(row[0] or 'null'))
+            return collection
+
+    def create_collection(self, name, metadata=None):
+        """Create an empty collection; raises ValueError if it already exists"""
+        with self._lock:
+            try:
+                with self._conn:
+                    self._conn.execute(
+                        "INSERT INTO collections (name, metadata, dtype) VALUES (?, ?, ?)",
+                        (name, json.dumps(metadata), FLAT_VECTOR_DTYPE)
+                    )
+            except sqlite3.IntegrityError:
+                raise ValueError(f"Collection {name} already exists.")
+            # A file left behind by a crashed run must not leak into the new collection
+            open(self.vector_path(name), 'wb').close()
+            return self.get_collection(name)
+
+    def get_or_create_collection(self, name, metadata=None):
+        with self._lock:
+            try:
+                return self.get_collection(name)
+            except ValueError:
+                return self.create_collection(name, metadata)
+
+    def delete_collection(self, name):
+        """Drop a collection and its vector file; raises ValueError if it does not exist"""
+        with self._lock:
+            with self._conn:
+                deleted = self._conn.execute("DELETE FROM collections WHERE name = ?", (name,)).rowcount
+                self._conn.execute("DELETE FROM vectors WHERE collection = ?", (name,))
+            self._collections.pop(name, None)
+            if not deleted:
+                raise ValueError(f"Collection {name} does not exist.")
+            try:
+                # Processes still mapping the file keep reading it until they remap
+                os.unlink(self.vector_path(name))
+            except FileNotFoundError:
+                pass
+
+
+class FlatCollection:
+    """
+    One collection of normalized vectors in an append-only memory-mapped file.
+
+    Row ``i`` of the file belongs to row ``i`` of the side table. The committed row
+    count in the side table, not the file size, decides which rows exist, so a write
+    interrupted before its commit is simply overwritten by the next one. Other
+    processes' writes are picked up through the collection's version counter.
+
+    Args:
+        client (FlatClient): The client owning the collection.
+        name (str): The collection name.
+        metadata (dict): Collection settings; ``hnsw:space`` selects the distance metric.
+    """
+
+    def __init__(self, client, name, metadata=None):
+        self.client = client
+        self.name = name
+        self.metadata = metadata
+        self.space = (metadata or {}).get('hnsw:space', 'l2')
+        self._version = None
+        self._matrix = None
+        self._ids = []
+        self._live = np.zeros(0, dtype=bool)
+        # Live rows of every CV, so filename filters need no scan of the side table
+        self._filename_rows = {}
+
+    @property
+    def _conn(self):
+        return self.client._conn
+
+    def _refresh(self):
+        """
+        Reload the row ids, tombstones, filename map and mapping if the collection changed.
+
+        Each refresh builds new objects instead of modifying the current ones, so a
+        search may keep scoring a snapshot of them after releasing the lock.
+        """
+        row = self._conn.execute(
+            "SELECT dtype, dim, rows, version FROM collections WHERE name = ?", (self.name,)
+        ).fetchone()
+        if row is None:
+            raise ValueError(f"Collection {self.name} does not exist.")
+        dtype, dim, rows, version = row
+        if version == self._version:
+            return
+        ids = [''] * rows
+        live = np.zeros(rows, dtype=bool)
+        filename_rows = {}
+        for index, chunk_id, is_live, filename in self._conn.execute(
+            "SELECT row, id, live, json_extract(metadata, '$.filename') FROM vectors "
+            "WHERE collection = ? AND row < ?", (self.name, rows)
+        ):
+            ids[index] = chunk_id
+            live[index] = bool(is_live)
+            if is_live and filename is not None:
+                filename_rows.setdefault(filename, []).append(index)
+        if rows and (self._matrix is None or self._matrix.shape[0] != rows):
+            # Read-only mapping: pages are shared with every other process mapping the file
+            self._matrix = np.memmap(self.client.vector_path(self.name), dtype=dtype, mode='r', shape=(rows, dim))
+        elif not rows:
+            self._matrix = None
+        self.dtype, self.dim = dtype, dim
+        self._filename_rows = {
+            filename: np.array(sorted(indexes), dtype=np.int64) for filename, indexes in filename_rows.items()
+        }
+        self._ids, self._live, self._version = ids, live, version
+
+    def count(self):
+        with self.client._lock:
+            self._refresh()
+            return int(self._live.sum())
+
+    def _append(self, ids, embeddings, documents, metadatas):
+        """Tombstone live rows with the same ids and append the new rows"""
+        if not ids:
+            return
+        vectors = _normalize(embeddings)
+        documents = documents or [None] * len(ids)
+        metadatas = metadatas or [None] * len(ids)
+        with self.client._lock:
+            self._refresh()
+            dim = self.dim or vectors.shape[1]
+            if vectors.shape[1] != dim:
+                raise ValueError(f"Embedding dimension {vectors.shape[1]} does not match collection dimension {dim}")
+            start = len(self._ids)
+            with open(self.client.vector_path(self.name), 'r+b') as f:
+                # Write after the committed rows, dropping bytes of an uncommitted write
+                f.seek(start * dim * np.dtype(self.dtype).itemsize)
+                f.write(vectors.astype(self.dtype).tobytes())
+                f.truncate()
+                f.flush()
+                os.fsync(f.fileno())
+            with self._conn:
+                self._tombstone(ids)
+                self._conn.executemany(
+                    "INSERT INTO vectors (collection, row, id, document, metadata) VALUES (?, ?, ?, ?, ?)",
+                    [(self.name, start + i, chunk_id, document, json.dumps(metadata))
+                     for i, (chunk_id, document, metadata) in enumerate(zip(ids, documents, metadatas))]
+                )
+                self._conn.execute(
+                    "UPDATE collections SET dim = ?, rows = ?, version = version + 1 WHERE name = ?",
+                    (dim, start + len(ids), self.name)
+                )
+
+    def add(self, ids, embeddings, documents=None, metadatas=None):
+        """Append rows; an id that is already stored is replaced, as with upsert"""
+        self._append(list(ids), embeddings, documents, metadatas)
+
+    def upsert(self, ids, embeddings, documents=None, metadatas=None):
+        self._append(list(ids), embeddings, documents, metadatas)
+
+    def _tombstone(self, ids):
+        self._conn.executemany(
+            "UPDATE vectors SET live = 0 WHERE collection = ? AND id = ? AND live = 1",
+            [(self.name, chunk_id) for chunk_id in ids]
+        )
+
+    def _where_clause(self, where):
+        """Translate a Chroma metadata filter (equality or ``$in``) into SQL"""
+        clauses, params = [], []
+        for key, condition in (where or {}).items():
+            field = f"json_extract(metadata, '$.{key}')"
+            if isinstance(condition, dict):
+                if set(condition) != {'$in'}:
+                    raise ValueError(f"Unsupported filter on {key}: {condition}")
+                values = list(condition['$in'])
+                if not values:
+                    clauses.append("0")
+                    continue
+                clauses.append(f"{field} IN ({', '.join('?' * len(values))})")
+                params.extend(values)
+            else:
+                clauses.append(f"{field} = ?")
+                params.append(condition)
+        return ''.join(f" AND {clause}" for clause in clauses), params
+
+    def _filename_filter_rows(self, where):
+        """
+        Live rows matching a filter on ``filename`` alone, from the in-memory map.
+
+        Returns:
+            np.ndarray: Matching rows in ascending order, or None if the filter has
+                        other conditions and must go through the side table
+        """
+        if not where or set(where) != {'filename'}:
+            return None
+        condition = where['filename']
+        if isinstance(condition, dict):
+            if set(condition) != {'$in'}:
+                raise ValueError(f"Unsupported filter on filename: {condition}")
+            filenames = set(condition['$in'])
+        else:
+            filenames = {condition}
+        parts = [self._filename_rows[filename] for filename in filenames if filename in self._filename_rows]
+        return np.sort(np.concatenate(parts)) if parts else np.zeros(0, dtype=np.int64)
+
+    def _live_rows(self, where=None, ids=None, limit=None, offset=None):
+        if ids is None:
+            rows = self._filename_filter_rows(where)
+            if rows is not None:
+                start = offset or 0
+                return rows[start:None if limit is None else start + limit].tolist()
+        sql = "SELECT row FROM vectors WHERE collection = ? AND live = 1"
+        params = [self.name]
+        if ids is not None:
+            sql += f" AND id IN ({', '.join('?' * len(ids))})" if ids else " AND 0"
+            params.extend(ids)
+        clause, clause_params = self._where_clause(where)
+        sql += clause + " ORDER BY row"
+        params.extend(clause_params)
+        if limit is not None or offset:
+            sql += " LIMIT ? OFFSET ?"
+            params.extend([-1 if limit is None else limit, offset or 0])
+        return [row for row, in self._conn.execute(sql, params)]
+
+    def _rows_result(self, rows, include, ids=None, matrix=None):
+        """Build a Chroma-style result for table rows, in the given order, from a snapshot or the current state"""
+        ids = self._ids if ids is None else ids
+        matrix = self._matrix if matrix is None else matrix
+        result = {'ids': [ids[row] for row in rows]}
+        if 'embeddings' in include:
+            result['embeddings'] = [matrix[row].astype(np.float32).tolist() for row in rows]
+        if 'documents' in include or 'metadatas' in include:
+            stored = {}
+            for i in range(0, len(rows), 500):
+                part = rows[i:i + 500]
+                stored.update({
+                    row: (document, metadata) for row, document, metadata in self._conn.execute(
+                        f"SELECT row, document, metadata FROM vectors WHERE collection = ? "
+                        f"AND row IN ({', '.join('?' * len(part))})", [self.name] + part
+                    )
+                })
+            # Rows of a snapshot are gone only if a compaction dropped the collection meanwhile
+            if 'documents' in include:
+                result['documents'] = [stored.get(row, (None, None))[0] for row in rows]
+            if 'metadatas' in include:
+                result['metadatas'] = [json.loads(stored.get(row, (None, None))[1] or 'null') for row in rows]
+        return result
+
+    def get(self, ids=None, where=None, limit=None, offset=None, include=('documents', 'metadatas')):
+        with self.client._lock:
+            self._refresh()
+            rows = self._live_rows(where=where, ids=ids, limit=limit, offset=offset)
+            return self._rows_result(rows, include)
+
+    def delete(self, ids=None, where=None):
+        with self.client._lock:
+            self._refresh()
+            if where is not None:
+                rows = self._live_rows(where=where, ids=ids)
+                ids = [self._ids[row] for row in rows]
+            if not ids:
+                return
+            with self._conn:
+                self._tombstone(ids)
+                self._conn.execute("UPDATE collections SET version = version + 1 WHERE name = ?", (self.name,))
+
+    @staticmethod
+    def _score(matrix, live, queries, rows=None):
+        """Cosine similarities of a query matrix with every live row, or with the given rows"""
+        if rows is not None:
+            return queries @ matrix[rows].astype(np.float32).T
+        scores = np.empty((len(queries), matrix.shape[0]), dtype=np.float32)
+        for start in range(0, matrix.shape[0], SCORE_BLOCK_ROWS):
+            block = np.asarray(matrix[start:start + SCORE_BLOCK_ROWS], dtype=np.float32)
+            scores[:, start:start + len(block)] = queries @ block.T
+        scores[:, ~live] = -np.inf
+        return scores
+
+    def query(self, query_embeddings, n_results=10, where=None, include=('documents', 'metadatas', 'distances')):
+        """
+        Exact nearest neighbours of each query, with distances in the collection's metric.
+
+        All queries are scored together in one matrix product per block of rows. The
+        lock is only held to take a snapshot of the index and to read the stored
+        texts of the results, so concurrent searches score in parallel.
+        """
+        queries = _normalize(query_embeddings)
+        with self.client._lock:
+            self._refresh()
+            matrix, live, ids = self._matrix, self._live, self._ids
+            if where is not None:
+                rows = np.asarray(self._live_rows(where=where), dtype=np.int64)
+            else:
+                rows = np.flatnonzero(live)
+
+        k = min(n_results, len(rows))
+        if matrix is None or not k:
+            scores = np.zeros((len(queries), 0), dtype=np.float32)
+        elif where is not None:
+            scores = self._score(matrix, live, queries, rows)
+        else:
+            scores = self._score(matrix, live, queries)
+            rows = None
+
+        top_rows, top_scores = [], []
+        for row_scores in scores:
+            if k:
+                best = np.argpartition(-row_scores, k - 1)[:k]
+                best = best[np.argsort(-row_scores[best])]
+            else:
+                best = np.zeros(0, dtype=np.int64)
+            top_rows.append((best if rows is None else rows[best]).tolist())
+            top_scores.append(row_scores[best])
+
+        results = {'ids': [], 'distances': [], 'documents': [], 'metadatas': []}
+        with self.client._lock:
+            for top, best_scores in zip(top_rows, top_scores):
+                found = self._rows_result(top, include, ids=ids, matrix=matrix)
+                results['ids'].append(found['ids'])
+                results['distances'].append(_similarities_to_distances(best_scores, self.space).tolist())
+                results['documents'].append(found.get('documents'))
+                results['metadatas'].append(found.get('metadatas'))
+        return results
+
+
+class FlatVectorStore:
+    """
+    LangChain-style vector store over a FlatCollection.
+
+    Exposes the same ``_client``/``_collection`` attributes and search methods as
+    LangChain's Chroma wrapper, so callers do not depend on the backend.
+
+    Args:
+        client (FlatClient): The client of the database directory.
+        collection_name (str): Collection to open, created if missing.
+        embedding_function: Model used to embed query texts.
+        collection_metadata (dict): Settings of the collection if it is created.
+    """
+
+    def __init__(self, client, collection_name, embedding_function, collection_metadata=None):
+        self._client = client
+        self._collection = client.get_or_create_collection(collection_name, metadata=collection_metadata)
+        self._embedding_function = embedding_function
+
+    def get(self, where=None, include=('documents', 'metadatas'), limit=None, offset=None):
+        return self._collection.get(where=where, include=include, limit=limit, offset=offset)
+
+    def delete(self, ids):
+        self._collection.delete(ids=ids)
+
+    def similarity_search_by_vector_with_relevance_scores(self, embedding, k=4, filter=None):
+        """``(document, distance)`` tuples for the stored chunks closest to an embedding"""
+        results = self._collection.query(query_embeddings=[embedding], n_results=k, where=filter)
+        return [
+            (Document(page_content=document or '', metadata=metadata or {}), distance)
+            for document, metadata, distance in zip(
+                results['documents'][0], results['metadatas'][0], results['distances'][0]
+            )
+        ]
+
+    def similarity_search_with_score(self, query, k=4, filter=None):
+        embedding = self._embedding_function.embed_query(query)
+        return self.similarity_search_by_vector_with_relevance_scores(embedding, k=k, filter=filter)
+
+    def persist(self):
+        """Nothing to flush: every write is committed and fsynced before it returns"""
@@ -0,0 +1,180 @@
+"""
+Chat History Writer Module
+
+This module persists chat history off the request thread. Request handlers enqueue
+new rows and return immediately; a single background thread commits them in batches
+through the application's SQLAlchemy engine.
+
+Key components:
+- HistoryWriter: Bounded write-behind queue with batched commits, an explicit flush
+  for read-your-writes, and a drain-on-shutdown guarantee registered with atexit
+"""
+
+import time
+import queue
+import atexit
+import threading
+
+_STOP = object()
+
+
+class HistoryWriter:
+    """
+    Write-behind queue for chat history rows.
+
+    Args:
+        app (Flask): Application whose context is used for database access.
+        db (SQLAlchemy): The application's single Flask-SQLAlchemy instance.
+        batch_size (int): Maximum number of rows committed in one transaction.
+        flush_interval (float): Seconds to wait for more rows before committing a
+                                partial batch.
+        max_queue (int): Maximum number of pending rows; ``submit`` blocks when full
+                         so memory stays bounded under sustained overload.
+    """
+
+    def __init__(self, app, db, batch_size=50, flush_interval=0.5, max_queue=10000):
+        self.app = app
+        self.db = db
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self._queue = queue.Queue(maxsize=max_queue)
+        self._thread = None
+        self._lock = threading.Lock()
+        self._closed = False
+        self.written = 0
+        self.failed = 0
+        self.batches = 0
+
+    def start(self):
+        """Start the background writer thread and register the shutdown flush."""
+        with self._lock:
+            if self._thread is not None:
+                return self
+            self._thread = threading.Thread(target=self._run, name='history-writer', daemon=True)
+            self._thread.start()
+            atexit.register(self.close)
+        return self
+
+    def submit(self, record):
+        """
+        Queue a new model instance for insertion.
+
+        Args:
+            record: A transient SQLAlchemy model instance (e.g. ``Chat``).
+
+        Raises:
+            RuntimeError: If the writer has already been closed
+        """
+        if self._closed:
+            raise RuntimeError("History writer is closed")
+        self._queue.put(record)
+
+    def flush(self, timeout=None):
+        """
+        Wait until every row queued so far has been committed or has failed.
+
+        Args:
+            timeout (float): Maximum number of seconds to wait, or None to wait forever.
+
+        Returns:
+            bool: True if the queue was drained within the timeout.
+        """
+        if timeout is None:
+            self._queue.join()
+            return True
+        deadline = time.monotonic() + timeout
+        while self._queue.unfinished_tasks:
+            if time.monotonic() >= deadline:
+                return False
+            time.sleep(0.01)
+        return True
+
+    def close(self, timeout=30):
+        """Stop accepting rows, commit everything still queued and stop the thread."""
+        with self._lock:
+            if self._closed:
+                return
+            self._closed = True
+        if self._thread is None:
+            return
+        self._queue.put(_STOP)
+        self._thread.join(timeout)
+        if self._thread.is_alive():
+            print(f"Warning: history writer did not drain within {timeout}s, "
+                  f"{self._queue.qsize()} rows pending")
+
+    def stats(self):
+        return {
+            'pending': self._queue.unfinished_tasks,
+            'written': self.written,
+            'failed': self.failed,
+            'batches': self.batches
+        }
+
+    def _run(self):
+        stopping = False
+        while not stopping:
+            item = self._queue.get()
+            if item is _STOP:
+                self._queue.task_done()
+                break
+
+            batch = [item]
+            deadline = time.monotonic() + self.flush_interval
+            while len(batch) < self.batch_size:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    item = self._queue.get(timeout=remaining)
+                except queue.Empty:
+                    break
+                if item is _STOP:
+                    self._queue.task_done()
+                    stopping = True
+                    break
+                batch.append(item)
+
+            try:
+                self._commit(batch)
+            finally:
+                for _ in batch:
+                    self._queue.task_done()
+
+        # Drain whatever was queued after the stop marker
+        leftovers = []
+        while True:
+            try:
+                item = self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if item is not _STOP:
+                leftovers.append(item)
+            self._queue.task_done()
+        for start in range(0, len(leftovers), self.batch_size):
+            self._commit(leftovers[start:start + self.batch_size])
+
+    def _commit(self, batch):
+        """Commit a batch in one transaction, falling back to row-by-row on failure."""
+        with self.app.app_context():
+            session = self.db.session
+            try:
+                session.add_all(batch)
+                session.commit()
+                self.written += len(batch)
+                self.batches += 1
+                return
+            except Exception as e:
+                session.rollback()
+                print(f"Error committing chat history batch of {len(batch)}: {str(e)}")
+
+            for record in batch:
+                try:
+                    session.add(record)
+                    session.commit()
+                    self.written += 1
+                except Exception as e:
+                    session.rollback()
+                    self.failed += 1
+                    print(f"Dropping chat history row after error: {str(e)}")
+            self.batches += 1
@@ -0,0 +1,137 @@
+"""
+HNSW Parameter Sweep
+
+This module measures recall against latency for HNSW index settings on our own CV
+corpus. The chunk embeddings of the active collection are loaded once, exact nearest
+neighbours of a held-out query set are computed by brute force, and a throw-away
+in-memory collection is built for every combination of ``M``, ``construction_ef`` and
+``search_ef`` to measure build time, query latency and recall@k.
+
+Run from the server directory:
+    python hnsw_sweep.py --queries queries.json [--space cosine] [--m 16 32] \
+        [--construction-ef 100 200] [--search-ef 10 50 100] [--k 5]
+
+The query set is a JSON list of query strings (or objects with a "query" key) that
+were not used to tune anything else. Apply the chosen settings with the HNSW_*
+environment variables, then run compaction or the re-indexer to rebuild the index.
+"""
+
+import sys
+import json
+import time
+import argparse
+import itertools
+import numpy as np
+import chromadb
+
+from document_processor import load_db, get_embedding_model
+
+
+def exact_neighbours(vectors, queries, space, k):
+    """Brute-force top-k indices under Chroma's distance definitions"""
+    if space == 'l2':
+        distances = (
+            np.sum(queries ** 2, axis=1, keepdims=True)
+            - 2 * queries @ vectors.T
+            + np.sum(vectors ** 2, axis=1)
+        )
+    elif space == 'cosine':
+        normalized = vectors / np.maximum(np.linalg.norm(vectors, axis=1, keepdims=True), 1e-12)
+        normalized_queries = queries / np.maximum(np.linalg.norm(queries, axis=1, keepdims=True), 1e-12)
+        distances = 1 - normalized_queries @ normalized.T
+    else:
+        distances = 1 - queries @ vectors.T
+    return np.argsort(distances, axis=1)[:, :k]
+
+
+def load_corpus(db_path, batch_size=5000):
+    """Read every chunk id and embedding from the active collection"""
+    collection = load_db(db_path)._collection
+    ids, embeddings = [], []
+    offset = 0
+    while True:
+        batch = collection.get(include=['embeddings'], limit=batch_size, offset=offset)
+        if not batch['ids']:
+            break
+        ids.extend(batch['ids'])
+        embeddings.extend(batch['embeddings'])
+        offset += len(batch['ids'])
+    return ids, np.asarray(embeddings, dtype=np.float32)
+
+
+def measure(client, settings, ids, vectors, query_vectors, truth, k, batch_size=5000):
+    name = f"sweep_{settings['hnsw:M']}_{settings['hnsw:construction_ef']}_{settings['hnsw:search_ef']}"
+    collection = client.create_collection(name, metadata=settings)
+    try:
+        started = time.perf_counter()
+        for i in range(0, len(ids), batch_size):
+            collection.add(ids=ids[i:i + batch_size], embeddings=vectors[i:i + batch_size].tolist())
+        build_seconds = time.perf_counter() - started
+
+        index_of = {chunk_id: i for i, chunk_id in enumerate(ids)}
+        latencies, recalls = [], []
+        for query, expected in zip(query_vectors, truth):
+            started = time.perf_counter()
+            found = collection.query(query_embeddings=[query.tolist()], n_results=k, include=[])['ids'][0]
+            latencies.append((time.perf_counter() - started) * 1000)
+            recalls.append(len(set(index_of[chunk_id] for chunk_id in found) & set(expected)) / len(expected))
+    finally:
+        client.delete_collection(name)
+
+    return {
+        'M': settings['hnsw:M'],
+        'construction_ef': settings['hnsw:construction_ef'],
+        'search_ef': settings['hnsw:search_ef'],
+        'build_s': round(build_seconds, 2),
+        'p50_ms': round(float(np.percentile(latencies, 50)), 3),
+        'p95_ms': round(float(np.percentile(latencies, 95)), 3),
+        f'recall@{k}': round(float(np.mean(recalls)), 4)
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Sweep HNSW parameters for recall and latency")
+    parser.add_argument('--db', default='chroma_db', help="Vector database directory")
+    parser.add_argument('--queries', required=True, help="JSON file with held-out queries")
+    parser.add_argument('--space', default='l2', choices=['l2', 'cosine', 'ip'], help="Distance metric")
+    parser.add_argument('--m', type=int, nargs='+', default=[16, 32])
+    parser.add_argument('--construction-ef', type=int, nargs='+', default=[100, 200])
+    parser.add_argument('--search-ef', type=int, nargs='+', default=[10, 50, 100, 200])
+    parser.add_argument('--k', type=int, default=5, help="Number of neighbours retrieved per query")
+    args = parser.parse_args(argv)
+
+    with open(args.queries) as f:
+        queries = [q['query'] if isinstance(q, dict) else q for q in json.load(f)]
+
+    ids, vectors = load_corpus(args.db)
+    if not ids:
+        print("The active collection is empty")
+        return 1
+    model = get_embedding_model()
+    query_vectors = np.asarray([model.embed_query(q) for q in queries], dtype=np.float32)
+    k = min(args.k, len(ids))
+    truth = exact_neighbours(vectors, query_vectors, args.space, k)
+    print(f"Sweeping over {len(ids)} chunks and {len(queries)} queries ({args.space}, k={k})")
+
+    # Throw-away in-memory collections never touch the live database
+    client = chromadb.EphemeralClient()
+    results = []
+    for m, construction_ef, search_ef in itertools.product(args.m, args.construction_ef, args.search_ef):
+        settings = {
+            'hnsw:space': args.space,
+            'hnsw:M': m,
+            'hnsw:construction_ef': construction_ef,
+            'hnsw:search_ef': search_ef
+        }
+        results.append(measure(client, settings, ids, vectors, query_vectors, truth, k))
+        print(results[-1])
+
+    columns = list(results[0].keys())
+    print('\n' + '  '.join(f"{column:>15}" for column in columns))
+    for result in results:
+        print('  '.join(f"{result[column]:>15}" for column in columns))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,206 @@
+"""
+Job Description Cache Module
+
+This module reuses the analysis of a previously screened job description when a new
+one is a near-duplicate of it. Resubmitted job descriptions usually differ only in
+whitespace, bullet order or a salary line, so exact-match caching misses them; here
+they are compared by embedding similarity instead.
+
+A cached analysis is only reused for the user who requested it, and only when the new
+job description matches the same candidate CVs with the same content (filename and
+content hash), so an analysis never describes a shortlist or a CV that has changed since.
+
+Key components:
+- SemanticJdCache: Bounded in-process index of recently analyzed job descriptions,
+  kept in sync with the chat history and warmed in the background, with hit/miss counters
+"""
+
+import threading
+import numpy as np
+
+
+def _normalize(vector):
+    vector = np.asarray(vector, dtype=np.float32)
+    return vector / max(float(np.linalg.norm(vector)), 1e-12)
+
+
+def _candidates(cv_versions):
+    return frozenset((filename, content_hash) for filename, content_hash in cv_versions)
+
+
+def _entry_key(user_id, job_description, cv_versions):
+    return user_id, ' '.join(job_description.lower().split()), _candidates(cv_versions)
+
+
+class SemanticJdCache:
+    """
+    Near-duplicate lookup of analyzed job descriptions by cosine similarity.
+
+    The chat history is the source of truth. ``warm`` indexes the most recent rows
+    once, off the request path; after that every lookup first indexes the few rows
+    written since the last one, including those written by other worker processes.
+    Until the cache is warm, lookups only see analyses added in this process.
+
+    Args:
+        embed (callable): Embeds a list of texts, returning one vector per text.
+        load_since (callable): ``load_since(last_id, limit)`` returns up to ``limit``
+            of the newest ``(id, user_id, job_description, cv_versions, response)``
+            history rows with an id above ``last_id``, oldest first, where
+            ``cv_versions`` are the ``(filename, content_hash)`` pairs analyzed.
+        threshold (float): Smallest cosine similarity counted as a near-duplicate.
+        maxsize (int): Maximum number of indexed job descriptions; the oldest are
+            evicted first.
+    """
+
+    def __init__(self, embed, load_since, threshold=0.95, maxsize=500):
+        self.embed = embed
+        self.load_since = load_since
+        self.threshold = threshold
+        self.maxsize = maxsize
+        self._lock = threading.Lock()
+        self._sync_lock = threading.Lock()
+        self._vectors = None
+        self._users = np.empty(0, dtype=object)
+        self._entries = []
+        self.ready = False
+        self._keys = set()
+        self._last_id = 0
+        self.lookups = 0
+        self.hits = 0
+        self.misses = 0
+        self.stale = 0
+        self.last_similarity = None
+
+    def _append(self, vectors, entries):
+        """Index new entries, evicting the oldest beyond maxsize. Caller holds the lock."""
+        fresh = [(vector, entry) for vector, entry in zip(vectors, entries) if entry['key'] not in self._keys]
+        if not fresh:
+            return
+        matrix = np.stack([_normalize(vector) for vector, _ in fresh])
+        self._vectors = matrix if self._vectors is None else np.vstack([self._vectors, matrix])
+        users = np.empty(len(fresh), dtype=object)
+        users[:] = [entry['key'][0] for _, entry in fresh]
+        self._users = np.concatenate([self._users, users])
+        for _, entry in fresh:
+            self._entries.append(entry)
+            self._keys.add(entry['key'])
+        overflow = len(self._entries) - self.maxsize
+        if overflow > 0:
+            for entry in self._entries[:overflow]:
+                self._keys.discard(entry['key'])
+            self._entries = self._entries[overflow:]
+            self._vectors = self._vectors[overflow:]
+            self._users = self._users[overflow:]
+
+    def _sync(self):
+        """Index chat history rows written since the last sync"""
+        # One thread embeds new rows while concurrent lookups use the current index
+        if not self._sync_lock.acquire(blocking=False):
+            return
+        try:
+            rows = self.load_since(self._last_id, self.maxsize)
+            if not rows:
+                return
+            entries = []
+            seen = set(self._keys)
+            for row_id, user_id, job_description, cv_versions, response in rows:
+                key = _entry_key(user_id, job_description, cv_versions)
+                if key not in seen:
+                    seen.add(key)
+                    entries.append({
+                        'key': key,
+                        'job_description': job_description,
+                        'response': response
+                    })
+            vectors = self.embed([entry['job_description'] for entry in entries]) if entries else []
+            with self._lock:
+                self._append(vectors, entries)
+                self._last_id = max(self._last_id, rows[-1][0])
+        finally:
+            self._sync_lock.release()
+
+    def warm(self):
+        """Index the most recent chat history; run it on a background thread at startup"""
+        try:
+            self._sync()
+        except Exception as e:
+            print(f"Could not warm the job description cache: {str(e)}")
+        finally:
+            self.ready = True
+
+    def lookup(self, user_id, job_description, cv_versions):
+        """
+        Find the user's analysis of a near-duplicate job description with the same candidates.
+
+        Args:
+            user_id: The requesting user; only their own analyses are reused.
+            job_description (str): The incoming job description.
+            cv_versions (list): ``(filename, content_hash)`` of the CVs it matched.
+
+        Returns:
+            tuple: ``(hit, embedding)`` where ``hit`` is a dict with the cached
+                   ``response``, the ``similarity`` and the matched
+                   ``job_description``, or None; ``embedding`` can be passed on to
+                   ``add`` to avoid embedding the job description twice
+        """
+        if self.ready:
+            # The initial bulk load belongs to warm(), never to a request
+            self._sync()
+        embedding = _normalize(self.embed([job_description])[0])
+        candidates = _candidates(cv_versions)
+        with self._lock:
+            self.lookups += 1
+            own = np.flatnonzero(self._users == user_id) if self._entries else []
+            if not len(own):
+                self.misses += 1
+                return None, embedding
+            similarities = self._vectors[own] @ embedding
+            self.last_similarity = round(float(similarities.max()), 4)
+            near = [(float(similarity), int(index)) for similarity, index in zip(similarities, own)
+                    if similarity >= self.threshold]
+            if not near:
+                self.misses += 1
+                return None, embedding
+            current = [(similarity, index) for similarity, index in near
+                       if self._entries[index]['key'][2] == candidates]
+            if not current:
+                # Near-duplicates, but the corpus now ranks other candidates or their CVs changed
+                self.stale += 1
+                self.misses += 1
+                return None, embedding
+            similarity, best = max(current)
+            entry = self._entries[best]
+            self.hits += 1
+            return {
+                'response': entry['response'],
+                'similarity': similarity,
+                'job_description': entry['job_description']
+            }, embedding
+
+    def add(self, user_id, job_description, cv_versions, response, embedding=None):
+        """Index a freshly analyzed job description"""
+        if embedding is None:
+            embedding = self.embed([job_description])[0]
+        entry = {
+            'key': _entry_key(user_id, job_description, cv_versions),
+            'job_description': job_description,
+            'response': response
+        }
+        with self._lock:
+            self._append([embedding], [entry])
+
+    def stats(self):
+        """Snapshot of the cache counters for monitoring"""
+        with self._lock:
+            return {
+                'ready': self.ready,
+                'size': len(self._entries),
+                'maxsize': self.maxsize,
+                'threshold': self.threshold,
+                'lookups': self.lookups,
+                'hits': self.hits,
+                'misses': self.misses,
+                'stale': self.stale,
+                'hit_rate': round(self.hits / self.lookups, 4) if self.lookups else 0.0,
+                'last_similarity': self.last_similarity
+            }
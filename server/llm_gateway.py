@@ -0,0 +1,489 @@
+"""
+LLM Gateway Module
+
+This module provides the single entry point used by every LLM call site. It wraps the
+OpenAI-compatible Hugging Face router client with the protections a request-serving
+process needs when the upstream slows down or fails.
+
+Key components:
+- Connection pooling: One tuned httpx client with bounded keep-alive connections
+- Deadlines: Every call has an overall deadline covering retries and queueing
+- Retries: Jittered exponential backoff for timeouts, connection errors, 429s and 5xx
+- Hedging: Optional duplicate request after a delay, first successful answer wins
+- Concurrency limiter: Bounds in-flight upstream requests per process
+- CircuitBreaker: Fails fast with LLMUnavailableError while the upstream is unhealthy
+- AsyncLLMGateway: The same policies on asyncio, for the ASGI chat pipeline
+"""
+
+import time
+import random
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+import httpx
+import openai
+from openai import OpenAI
+
+# Errors worth retrying; anything else (bad request, auth) is returned to the caller as-is
+RETRYABLE_ERRORS = (
+    openai.APITimeoutError,
+    openai.APIConnectionError,
+    openai.RateLimitError,
+    openai.InternalServerError,
+)
+
+
+class LLMUnavailableError(Exception):
+    """Raised when the LLM cannot be used right now; ``retry_after`` hints when to try again."""
+
+    def __init__(self, message, retry_after=None):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class CircuitOpenError(LLMUnavailableError):
+    """Raised without contacting the upstream while the circuit breaker is open."""
+
+
+class CircuitBreaker:
+    """
+    Consecutive-failure circuit breaker.
+
+    After ``failure_threshold`` consecutive failed calls the circuit opens and calls
+    fail immediately. A call that is retried counts once, when it finally gives up;
+    attempts that are retried are not failures of their own. Once ``reset_timeout``
+    seconds have passed a single trial call is let through (half-open); its outcome
+    closes or re-opens the circuit, and a failed trial attempt re-opens it at once.
+
+    Args:
+        failure_threshold (int): Consecutive failed calls that open the circuit.
+        reset_timeout (float): Seconds the circuit stays open before a trial call.
+    """
+
+    def __init__(self, failure_threshold=5, reset_timeout=30):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self._lock = threading.Lock()
+        self._failures = 0
+        self._opened_at = None
+        self._trial_in_flight = False
+        self.times_opened = 0
+
+    @property
+    def state(self):
+        with self._lock:
+            return self._state(time.monotonic())
+
+    def _state(self, now):
+        if self._opened_at is None:
+            return 'closed'
+        if now - self._opened_at >= self.reset_timeout:
+            return 'half_open'
+        return 'open'
+
+    def allow(self):
+        """Raise CircuitOpenError unless a call may be made now."""
+        with self._lock:
+            now = time.monotonic()
+            state = self._state(now)
+            if state == 'closed':
+                return
+            if state == 'half_open' and not self._trial_in_flight:
+                self._trial_in_flight = True
+                return
+            retry_after = max(1.0, self.reset_timeout - (now - self._opened_at))
+            raise CircuitOpenError(
+                "LLM service is unhealthy; requests are paused while it recovers",
+                retry_after=retry_after
+            )
+
+    def record_success(self):
+        with self._lock:
+            self._failures = 0
+            self._opened_at = None
+            self._trial_in_flight = False
+
+    def cancel_trial(self):
+        """Give back a half-open trial slot when the call never reached the upstream."""
+        with self._lock:
+            self._trial_in_flight = False
+
+    def record_retry(self):
+        """A retryable attempt failed and its call will retry; only a half-open trial attempt counts."""
+        with self._lock:
+            trial = self._opened_at is not None
+        if trial:
+            self.record_failure()
+
+    def record_failure(self):
+        """A call failed for good: its retries are exhausted or its deadline has passed."""
+        with self._lock:
+            self._failures += 1
+            self._trial_in_flight = False
+            if self._opened_at is not None or self._failures >= self.failure_threshold:
+                if self._opened_at is None:
+                    self.times_opened += 1
+                    print(f"LLM circuit opened after {self._failures} consecutive failures")
+                self._opened_at = time.monotonic()
+
+    def stats(self):
+        with self._lock:
+            return {
+                'state': self._state(time.monotonic()),
+                'consecutive_failures': self._failures,
+                'times_opened': self.times_opened
+            }
+
+
+class LLMGateway:
+    """
+    Resilient, pooled client for chat completions.
+
+    Args:
+        base_url (str): OpenAI-compatible API base URL.
+        api_key (str): API key for the upstream.
+        model (str): Default model name.
+        timeout (float): Default overall deadline per call in seconds, retries included.
+        connect_timeout (float): TCP/TLS connect timeout in seconds.
+        max_retries (int): Retries after the first attempt for retryable errors.
+        backoff_base (float): Base delay in seconds for exponential backoff.
+        backoff_max (float): Upper bound for a single backoff delay in seconds.
+        max_concurrency (int): Maximum in-flight upstream requests in this process.
+        acquire_timeout (float): Seconds to wait for a concurrency slot before failing.
+        hedge_after (float): Seconds after which a duplicate request is sent if the first
+                             has not answered yet, or None to disable hedging.
+        max_connections (int): Size of the HTTP connection pool.
+        breaker (CircuitBreaker): Breaker to use; a default one is created if omitted.
+    """
+
+    def __init__(self, base_url, api_key, model, timeout=60, connect_timeout=5, max_retries=2,
+                 backoff_base=0.5, backoff_max=8, max_concurrency=16, acquire_timeout=10,
+                 hedge_after=None, max_connections=32, breaker=None):
+        self.model = model
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.acquire_timeout = acquire_timeout
+        self.hedge_after = hedge_after
+        self.breaker = breaker or CircuitBreaker()
+
+        self._http = httpx.Client(
+            limits=httpx.Limits(
+                max_connections=max_connections,
+                max_keepalive_connections=max_connections,
+                keepalive_expiry=30
+            ),
+            timeout=httpx.Timeout(timeout, connect=connect_timeout)
+        )
+        # Retries are handled here so backoff and deadlines see every attempt and the breaker each call
+        self.client = OpenAI(base_url=base_url, api_key=api_key, http_client=self._http, max_retries=0)
+
+        self._slots = threading.BoundedSemaphore(max_concurrency)
+        self._hedge_pool = ThreadPoolExecutor(max_workers=max_concurrency, thread_name_prefix='llm-hedge')
+        self._stats_lock = threading.Lock()
+        self._stats = {'calls': 0, 'failures': 0, 'retries': 0, 'hedges': 0, 'hedge_wins': 0,
+                       'rejected': 0, 'short_circuited': 0}
+
+    def complete(self, messages, temperature=0.7, max_tokens=1000, timeout=None, hedge_after=None, model=None):
+        """
+        Run a chat completion and return the message text.
+
+        Args:
+            messages (list): Chat messages in OpenAI format.
+            temperature (float): Sampling temperature.
+            max_tokens (int): Maximum tokens to generate.
+            timeout (float): Overall deadline in seconds; defaults to the gateway timeout.
+            hedge_after (float): Per-call hedging delay overriding the gateway default.
+            model (str): Model overriding the gateway default.
+
+        Returns:
+            str: The content of the first choice.
+
+        Raises:
+            LLMUnavailableError: If the circuit is open, no concurrency slot is free,
+                                 or retries are exhausted before the deadline
+            openai.APIError: For non-retryable upstream errors such as bad requests
+        """
+        deadline = time.monotonic() + (timeout or self.timeout)
+        hedge_after = hedge_after if hedge_after is not None else self.hedge_after
+        kwargs = {
+            'model': model or self.model,
+            'messages': messages,
+            'temperature': temperature,
+            'max_tokens': max_tokens,
+            'stream': False
+        }
+        self._count('calls')
+
+        attempt = 0
+        while True:
+            try:
+                self.breaker.allow()
+            except CircuitOpenError:
+                self._count('short_circuited')
+                raise
+            try:
+                if hedge_after:
+                    text = self._hedged_request(kwargs, deadline, hedge_after)
+                else:
+                    text = self._request(kwargs, deadline)
+            except RETRYABLE_ERRORS as e:
+                attempt += 1
+                if attempt > self.max_retries:
+                    self.breaker.record_failure()
+                    self._count('failures')
+                    raise LLMUnavailableError(f"LLM request failed after {attempt} attempts: {str(e)}") from e
+
+                # Full jitter keeps retrying workers from synchronizing against the upstream
+                delay = random.uniform(0, min(self.backoff_max, self.backoff_base * 2 ** (attempt - 1)))
+                if time.monotonic() + delay >= deadline:
+                    self.breaker.record_failure()
+                    self._count('failures')
+                    raise LLMUnavailableError(f"LLM request deadline exceeded: {str(e)}") from e
+                self.breaker.record_retry()
+                print(f"LLM request failed ({type(e).__name__}), retry {attempt}/{self.max_retries} in {delay:.2f}s")
+                self._count('retries')
+                time.sleep(delay)
+                continue
+            except LLMUnavailableError:
+                # Local rejections say nothing about upstream health
+                self.breaker.cancel_trial()
+                self._count('failures')
+                raise
+            except openai.APIStatusError:
+                # The upstream answered, so it is healthy even if it rejected this request
+                self.breaker.record_success()
+                self._count('failures')
+                raise
+            except Exception:
+                self.breaker.cancel_trial()
+                self._count('failures')
+                raise
+
+            self.breaker.record_success()
+            return text
+
+    def _request(self, kwargs, deadline, block=True):
+        """Make one upstream request while holding a concurrency slot."""
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            raise LLMUnavailableError("LLM request deadline exceeded")
+        if block:
+            acquired = self._slots.acquire(timeout=min(self.acquire_timeout, remaining))
+        else:
+            acquired = self._slots.acquire(blocking=False)
+        if not acquired:
+            self._count('rejected')
+            raise LLMUnavailableError("Too many concurrent LLM requests", retry_after=self.acquire_timeout)
+        try:
+            response = self.client.chat.completions.create(**kwargs, timeout=max(0.1, deadline - time.monotonic()))
+            return response.choices[0].message.content
+        finally:
+            self._slots.release()
+
+    def _hedged_request(self, kwargs, deadline, hedge_after):
+        """Send a backup request if the primary is slow and return whichever succeeds first."""
+        primary = self._hedge_pool.submit(self._request, kwargs, deadline)
+        done, _ = wait([primary], timeout=min(hedge_after, max(0, deadline - time.monotonic())))
+        if done:
+            return primary.result()
+
+        # Only hedge when a slot is free right away, never queue extra load on a busy upstream
+        backup = self._hedge_pool.submit(self._request, kwargs, deadline, False)
+        self._count('hedges')
+        pending = {primary, backup}
+        error = None
+        while pending:
+            done, pending = wait(pending, timeout=max(0, deadline - time.monotonic()), return_when=FIRST_COMPLETED)
+            if not done:
+                break
+            for future in done:
+                try:
+                    text = future.result()
+                except Exception as e:
+                    if future is primary or error is None:
+                        error = e
+                    continue
+                if future is backup:
+                    self._count('hedge_wins')
+                return text
+        if error is not None and not pending:
+            raise error
+        raise openai.APITimeoutError(request=httpx.Request('POST', str(self.client.base_url)))
+
+    def _count(self, key):
+        with self._stats_lock:
+            self._stats[key] += 1
+
+    def stats(self):
+        """Return gateway counters and breaker state for the metrics endpoint."""
+        with self._stats_lock:
+            stats = dict(self._stats)
+        stats['circuit'] = self.breaker.stats()
+        return stats
+
+
+class AsyncLLMGateway:
+    """
+    Asyncio counterpart of LLMGateway for the ASGI chat pipeline.
+
+    Awaiting a completion does not hold a thread, so one event loop can keep hundreds
+    of requests in flight. Pass the synchronous gateway's breaker to share upstream
+    health between both paths.
+
+    Args:
+        Same as LLMGateway.
+    """
+
+    def __init__(self, base_url, api_key, model, timeout=60, connect_timeout=5, max_retries=2,
+                 backoff_base=0.5, backoff_max=8, max_concurrency=64, acquire_timeout=10,
+                 hedge_after=None, max_connections=64, breaker=None):
+        self.model = model
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.max_concurrency = max_concurrency
+        self.acquire_timeout = acquire_timeout
+        self.hedge_after = hedge_after
+        self.breaker = breaker or CircuitBreaker()
+
+        self._http = httpx.AsyncClient(
+            limits=httpx.Limits(
+                max_connections=max_connections,
+                max_keepalive_connections=max_connections,
+                keepalive_expiry=30
+            ),
+            timeout=httpx.Timeout(timeout, connect=connect_timeout)
+        )
+        self.client = openai.AsyncOpenAI(base_url=base_url, api_key=api_key, http_client=self._http, max_retries=0)
+        # Created on first use so it binds to the serving event loop
+        self._slots = None
+        self._stats = {'calls': 0, 'failures': 0, 'retries': 0, 'hedges': 0, 'hedge_wins': 0,
+                       'rejected': 0, 'short_circuited': 0}
+
+    async def complete(self, messages, temperature=0.7, max_tokens=1000, timeout=None, hedge_after=None, model=None):
+        """Run a chat completion and return the message text; see LLMGateway.complete."""
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + (timeout or self.timeout)
+        hedge_after = hedge_after if hedge_after is not None else self.hedge_after
+        kwargs = {
+            'model': model or self.model,
+            'messages': messages,
+            'temperature': temperature,
+            'max_tokens': max_tokens,
+            'stream': False
+        }
+        self._stats['calls'] += 1
+
+        attempt = 0
+        while True:
+            try:
+                self.breaker.allow()
+            except CircuitOpenError:
+                self._stats['short_circuited'] += 1
+                raise
+            try:
+                if hedge_after:
+                    text = await self._hedged_request(kwargs, deadline, hedge_after)
+                else:
+                    text = await self._request(kwargs, deadline)
+            except RETRYABLE_ERRORS as e:
+                attempt += 1
+                if attempt > self.max_retries:
+                    self.breaker.record_failure()
+                    self._stats['failures'] += 1
+                    raise LLMUnavailableError(f"LLM request failed after {attempt} attempts: {str(e)}") from e
+
+                delay = random.uniform(0, min(self.backoff_max, self.backoff_base * 2 ** (attempt - 1)))
+                if loop.time() + delay >= deadline:
+                    self.breaker.record_failure()
+                    self._stats['failures'] += 1
+                    raise LLMUnavailableError(f"LLM request deadline exceeded: {str(e)}") from e
+                self.breaker.record_retry()
+                print(f"LLM request failed ({type(e).__name__}), retry {attempt}/{self.max_retries} in {delay:.2f}s")
+                self._stats['retries'] += 1
+                await asyncio.sleep(delay)
+                continue
+            except LLMUnavailableError:
+                self.breaker.cancel_trial()
+                self._stats['failures'] += 1
+                raise
+            except openai.APIStatusError:
+                self.breaker.record_success()
+                self._stats['failures'] += 1
+                raise
+            except BaseException:
+                # Includes cancellation of the awaiting request
+                self.breaker.cancel_trial()
+                self._stats['failures'] += 1
+                raise
+
+            self.breaker.record_success()
+            return text
+
+    async def _request(self, kwargs, deadline, block=True):
+        loop = asyncio.get_running_loop()
+        if self._slots is None:
+            self._slots = asyncio.Semaphore(self.max_concurrency)
+        remaining = deadline - loop.time()
+        if remaining <= 0:
+            raise LLMUnavailableError("LLM request deadline exceeded")
+        if block:
+            try:
+                await asyncio.wait_for(self._slots.acquire(), timeout=min(self.acquire_timeout, remaining))
+            except asyncio.TimeoutError:
+                self._stats['rejected'] += 1
+                raise LLMUnavailableError("Too many concurrent LLM requests", retry_after=self.acquire_timeout)
+        elif self._slots.locked():
+            self._stats['rejected'] += 1
+            raise LLMUnavailableError("Too many concurrent LLM requests", retry_after=self.acquire_timeout)
+        else:
+            await self._slots.acquire()
+        try:
+            response = await self.client.chat.completions.create(
+                **kwargs, timeout=max(0.1, deadline - loop.time())
+            )
+            return response.choices[0].message.content
+        finally:
+            self._slots.release()
+
+    async def _hedged_request(self, kwargs, deadline, hedge_after):
+        loop = asyncio.get_running_loop()
+        primary = asyncio.ensure_future(self._request(kwargs, deadline))
+        done, _ = await asyncio.wait({primary}, timeout=min(hedge_after, max(0, deadline - loop.time())))
+        if done:
+            return primary.result()
+
+        backup = asyncio.ensure_future(self._request(kwargs, deadline, block=False))
+        self._stats['hedges'] += 1
+        pending = {primary, backup}
+        error = None
+        try:
+            while pending:
+                done, pending = await asyncio.wait(
+                    pending, timeout=max(0, deadline - loop.time()), return_when=asyncio.FIRST_COMPLETED
+                )
+                if not done:
+                    break
+                for task in done:
+                    if task.exception() is not None:
+                        if task is primary or error is None:
+                            error = task.exception()
+                        continue
+                    if task is backup:
+                        self._stats['hedge_wins'] += 1
+                    return task.result()
+        finally:
+            # Unlike threads, the losing request can actually be cancelled
+            for task in pending:
+                task.cancel()
+        if error is not None and not pending:
+            raise error
+        raise openai.APITimeoutError(request=httpx.Request('POST', str(self.client.base_url)))
+
+    def stats(self):
+        stats = dict(self._stats)
+        stats['circuit'] = self.breaker.stats()
+        return stats
@@ -8,14 +8,20 @@ This Flask application provides an API for document processing and chat function
 import os
 import io
 import base64
+import uuid
+import json
+import hashlib
+import threading
+import multiprocessing
+from functools import wraps
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor, as_completed
 from datetime import datetime, timedelta
-from openai import OpenAI
-import tempfile
-import pdf2image
 from PyPDF2 import PdfReader
 from flask import Flask, request, jsonify, send_file, redirect, url_for, session, send_from_directory
 from flask_cors import CORS, cross_origin
 from werkzeug.utils import secure_filename
+from werkzeug.exceptions import HTTPException
 from flask_login import LoginManager, login_user, logout_user, login_required, current_user
 from google.oauth2.credentials import Credentials
 from google_auth_oauthlib.flow import Flow
@@ -24,8 +30,31 @@ from google.auth.transport import requests as google_requests
 from datetime import timedelta
 import sqlite3
 from dotenv import load_dotenv
-from document_processor import load_cv, create_db, load_db, get_processed_pdfs_stats
-from flask_session import Session
+from document_processor import (
+    load_cv, load_db, get_processed_pdfs_stats, get_corpus_version, bump_corpus_version,
+    index_write_lock, replace_cv_vectors, delete_cv_vectors, compact_db, index_cv_batch,
+    two_stage_search, get_match_threshold, batch_search, grouped_search, get_embedding_model, get_embedding_stats
+)
+from session_store import init_session_backend
+from user_cache import UserCache
+from db_utils import enable_sqlite_pragmas
+from history_writer import HistoryWriter
+from llm_gateway import LLMGateway, CircuitBreaker, LLMUnavailableError
+from singleflight import SingleFlight
+from uploads import (
+    UploadRequest, StreamingPdfWriter, StreamingZipWriter, InvalidPdfUpload, extract_zip_pdfs
+)
+from thumbnails import ThumbnailCache
+from rasterize import iter_pdf_pages, page_budget
+from jd_cache import SemanticJdCache
+from admission import AdmissionController, AdmissionRejected
+from chat_search import create_chat_fts, search_chats
+from prompts import (
+    build_analysis_messages, build_candidate_messages, build_ranking_messages,
+    build_suggestion_messages, build_advice_messages, dedupe_candidates,
+    format_candidate_sections, combine_fanout_report, RANKING_FALLBACK,
+    build_profile_messages, build_profile_analysis_messages
+)
 
 # Set OAuth 2.0 to work with http://localhost
 os.environ['OAUTHLIB_INSECURE_TRANSPORT'] = '1'
@@ -49,18 +78,37 @@ HF_TOKEN = os.getenv('HF_TOKEN')
 if not HF_TOKEN:
     raise ValueError("Missing Hugging Face API token")
 
-# Configure OpenAI client for Hugging Face Inference API
-client = OpenAI(
+# Configure the LLM gateway for the Hugging Face Inference API; every LLM call goes through it
+LLM_SETTINGS = dict(
     base_url="https://router.huggingface.co/nebius/v1",
-    api_key=HF_TOKEN
+    api_key=HF_TOKEN,
+    model="mistralai/Mistral-Small-3.1-24B-Instruct-2503",
+    timeout=float(os.getenv('LLM_TIMEOUT', '90')),  # Overall deadline per call, retries included
+    max_retries=int(os.getenv('LLM_MAX_RETRIES', '2')),
+    hedge_after=float(os.getenv('LLM_HEDGE_AFTER', '0')) or None  # Seconds before a hedged duplicate, 0 disables
+)
+# Shared by the sync and async gateways so both see the same upstream health
+llm_breaker = CircuitBreaker(
+    failure_threshold=int(os.getenv('LLM_BREAKER_THRESHOLD', '5')),  # Consecutive calls failed after all retries
+    reset_timeout=float(os.getenv('LLM_BREAKER_RESET', '30'))
+)
+llm = LLMGateway(
+    **LLM_SETTINGS,
+    max_concurrency=int(os.getenv('LLM_MAX_CONCURRENCY', '16')),  # In-flight upstream calls per process
+    max_connections=int(os.getenv('LLM_POOL_SIZE', '32')),
+    breaker=llm_breaker
 )
 
 app = Flask(__name__, static_folder='frontend/build', static_url_path='')
+app.request_class = UploadRequest
 
 # Configure Flask app first
 app.config.update(
     SECRET_KEY='dev-secret-key-change-in-production',
-    SESSION_TYPE='filesystem',
+    SESSION_BACKEND=os.getenv('SESSION_BACKEND', 'sqlite'),  # 'sqlite', 'cookie' or 'filesystem'
+    SESSION_DB_PATH=os.path.join(instance_path, 'sessions.db'),
+    SESSION_SWEEP_INTERVAL=300,  # Seconds between expired-session sweeps
+    SESSION_TYPE='filesystem',  # Only used by the legacy 'filesystem' backend
     SESSION_FILE_DIR='flask_session',
     SESSION_FILE_THRESHOLD=500,
     SESSION_COOKIE_SECURE=True,  # Required for cross-origin with SameSite=None
@@ -70,7 +118,7 @@ app.config.update(
     SESSION_COOKIE_DOMAIN=None,
     SESSION_COOKIE_PATH='/',
     PERMANENT_SESSION_LIFETIME=timedelta(days=1),
-    SESSION_REFRESH_EACH_REQUEST=True,
+    SESSION_REFRESH_EACH_REQUEST=False,  # Only write sessions that actually changed
     REMEMBER_COOKIE_NAME='remember_me',
     REMEMBER_COOKIE_DURATION=timedelta(days=7),
     REMEMBER_COOKIE_SECURE=True,  # Required for cross-origin with SameSite=None
@@ -84,9 +132,6 @@ app.config.update(
     DB_FOLDER='chroma_db'
 )
 
-# Initialize Flask-Session after config
-Session(app)
-
 # Configure CORS with specific origin
 CORS(app, 
      resources={
@@ -111,26 +156,109 @@ app.config.update(
     SESSION_COOKIE_DOMAIN=None,  # Let browser set the domain
     SESSION_COOKIE_PATH='/',
     PERMANENT_SESSION_LIFETIME=timedelta(days=1),
-    SESSION_REFRESH_EACH_REQUEST=True,
+    SESSION_REFRESH_EACH_REQUEST=False,  # Only write sessions that actually changed
     REMEMBER_COOKIE_NAME='remember_token',
     REMEMBER_COOKIE_DURATION=timedelta(days=1),
     REMEMBER_COOKIE_SECURE=False,  # Set to True in production
     REMEMBER_COOKIE_HTTPONLY=True,
     REMEMBER_COOKIE_SAMESITE='None',  # Required for cross-origin requests
-    SESSION_TYPE='filesystem',  # Use filesystem to store session data
-    SESSION_FILE_DIR='flask_session',  # Directory for session files
-    SESSION_FILE_THRESHOLD=500,  # Maximum number of sessions stored in the filesystem
+    SESSION_BACKEND=os.getenv('SESSION_BACKEND', 'sqlite'),  # 'sqlite', 'cookie' or 'filesystem'
+    SESSION_DB_PATH=os.path.join(instance_path, 'sessions.db'),  # Shared by all workers on a host
+    SESSION_SWEEP_INTERVAL=300,  # Seconds between expired-session sweeps
+    SESSION_TYPE='filesystem',  # Only used by the legacy 'filesystem' backend
+    SESSION_FILE_DIR='flask_session',
+    SESSION_FILE_THRESHOLD=500,
     SQLALCHEMY_DATABASE_URI='sqlite:///app.db',
     SQLALCHEMY_TRACK_MODIFICATIONS=False,
     UPLOAD_FOLDER='uploads',
-    DB_FOLDER='chroma_db'
+    DB_FOLDER='chroma_db',
+    USER_CACHE_SIZE=1024,  # Maximum number of cached user records
+    USER_CACHE_TTL=300,  # Seconds a cached user record stays valid
+    HISTORY_BATCH_SIZE=50,  # Maximum chat history rows committed per transaction
+    HISTORY_FLUSH_INTERVAL=0.5,  # Seconds the history writer waits to fill a batch
+    CHAT_ANALYSIS_MODE=os.getenv('CHAT_ANALYSIS_MODE', 'single'),  # 'single', 'fanout' or 'profile'
+    CHAT_FANOUT_CONCURRENCY=4,  # Maximum concurrent per-candidate LLM calls per request
+    CHAT_FANOUT_TIMEOUT=60,  # Seconds allowed for each per-candidate LLM call
+    CHAT_FANOUT_MAX_TOKENS=700,  # Token budget for each per-candidate analysis
+    # Also coalesce identical /chat requests across worker processes on this host
+    CHAT_COALESCE_ACROSS_PROCESSES=os.getenv('CHAT_COALESCE_ACROSS_PROCESSES', '0') == '1',
+    CHAT_COALESCE_DIR=os.path.join(instance_path, 'singleflight'),
+    MAX_UPLOAD_BYTES=int(os.getenv('MAX_UPLOAD_MB', '20')) * 1024 * 1024,  # Largest accepted PDF
+    MAX_PDF_PAGES=int(os.getenv('MAX_PDF_PAGES', '50')),  # Most pages accepted in one PDF
+    MAX_CONTENT_LENGTH=(int(os.getenv('MAX_UPLOAD_MB', '20')) + 1) * 1024 * 1024,  # Whole request body limit
+    MAX_BULK_UPLOAD_BYTES=int(os.getenv('MAX_BULK_UPLOAD_MB', '500')) * 1024 * 1024,  # Bulk request body limit
+    MAX_BULK_FILES=int(os.getenv('MAX_BULK_FILES', '1000')),  # Most PDFs accepted in one bulk upload
+    INGEST_WORKERS=int(os.getenv('INGEST_WORKERS', str(os.cpu_count() or 4))),  # Text extraction processes
+    INGEST_EMBED_BATCH=256,  # Chunks embedded and committed together during bulk ingestion
+    RETRIEVAL_MODE=os.getenv('RETRIEVAL_MODE', 'two_stage'),  # 'two_stage' or 'flat'
+    RETRIEVAL_CANDIDATES=int(os.getenv('RETRIEVAL_CANDIDATES', '20')),  # CVs shortlisted before chunk scoring
+    # CV pages rendered for the LLM; pdf2image's default of 200 dpi is more than vision models use
+    RENDER_DPI=int(os.getenv('RENDER_DPI', '150')),
+    RENDER_MAX_PAGES=int(os.getenv('RENDER_MAX_PAGES', '6')),  # Most pages of one CV sent to the LLM
+    RENDER_GRAYSCALE=os.getenv('RENDER_GRAYSCALE', '0') == '1',  # Send single-channel page images
+    # Build a compact text profile of every uploaded CV in the background, used by the 'profile' mode;
+    # on by default only in that mode, since every profile costs a vision LLM call per CV
+    PROFILES_ENABLED=os.getenv(
+        'PROFILES_ENABLED', '1' if os.getenv('CHAT_ANALYSIS_MODE', 'single') == 'profile' else '0'
+    ) == '1',
+    PROFILE_WORKERS=int(os.getenv('PROFILE_WORKERS', '2')),  # Concurrent profile extractions
+    PROFILE_MAX_TOKENS=600,  # Token budget of one profile
+    # Reuse the analysis of a near-duplicate job description that matched the same CVs
+    JD_CACHE_ENABLED=os.getenv('JD_CACHE_ENABLED', '1') == '1',
+    JD_CACHE_THRESHOLD=float(os.getenv('JD_CACHE_THRESHOLD', '0.95')),  # Cosine similarity of a near-duplicate
+    JD_CACHE_SIZE=int(os.getenv('JD_CACHE_SIZE', '500')),  # Recently analyzed job descriptions indexed per process
+    SCREEN_BATCH_MAX_JDS=int(os.getenv('SCREEN_BATCH_MAX_JDS', '50')),  # Most job descriptions per batch request
+    SCREEN_BATCH_MAX_CANDIDATES=20,  # Largest shortlist a batch request may ask for per job description
+    SCREEN_BATCH_ANALYSIS_WORKERS=int(os.getenv('SCREEN_BATCH_ANALYSIS_WORKERS', '2')),  # Deferred LLM analyses run at once
+    # Admission control: requests running at once (overall and per user), waiting in line,
+    # and per-user rates. Beyond these, /chat and the upload routes answer 429 or 503.
+    # Every limit applies per worker process; with N workers the server admits N times each
+    # (a user's rate and concurrency included), so divide by the worker count when sizing them.
+    CHAT_MAX_CONCURRENT=int(os.getenv('CHAT_MAX_CONCURRENT', '8')),
+    CHAT_MAX_PER_USER=int(os.getenv('CHAT_MAX_PER_USER', '2')),  # Running or queued, 0 for no limit
+    CHAT_QUEUE_SIZE=int(os.getenv('CHAT_QUEUE_SIZE', '32')),
+    CHAT_QUEUE_TIMEOUT=float(os.getenv('CHAT_QUEUE_TIMEOUT', '30')),  # Seconds before a queued request gets 503
+    CHAT_RATE_PER_MINUTE=float(os.getenv('CHAT_RATE_PER_MINUTE', '20')),  # 0 disables rate limiting
+    CHAT_RATE_BURST=int(os.getenv('CHAT_RATE_BURST', '5')),
+    UPLOAD_MAX_CONCURRENT=int(os.getenv('UPLOAD_MAX_CONCURRENT', '4')),
+    UPLOAD_MAX_PER_USER=int(os.getenv('UPLOAD_MAX_PER_USER', '2')),
+    UPLOAD_QUEUE_SIZE=int(os.getenv('UPLOAD_QUEUE_SIZE', '16')),
+    UPLOAD_QUEUE_TIMEOUT=float(os.getenv('UPLOAD_QUEUE_TIMEOUT', '60')),
+    UPLOAD_RATE_PER_MINUTE=float(os.getenv('UPLOAD_RATE_PER_MINUTE', '30')),
+    UPLOAD_RATE_BURST=int(os.getenv('UPLOAD_RATE_BURST', '10')),
+    # /screen-batch embeds up to SCREEN_BATCH_MAX_JDS job descriptions per call and may queue as many analyses
+    SCREEN_BATCH_MAX_CONCURRENT=int(os.getenv('SCREEN_BATCH_MAX_CONCURRENT', '2')),
+    SCREEN_BATCH_MAX_PER_USER=int(os.getenv('SCREEN_BATCH_MAX_PER_USER', '1')),
+    SCREEN_BATCH_QUEUE_SIZE=int(os.getenv('SCREEN_BATCH_QUEUE_SIZE', '8')),
+    SCREEN_BATCH_QUEUE_TIMEOUT=float(os.getenv('SCREEN_BATCH_QUEUE_TIMEOUT', '30')),
+    SCREEN_BATCH_RATE_PER_MINUTE=float(os.getenv('SCREEN_BATCH_RATE_PER_MINUTE', '6')),
+    SCREEN_BATCH_RATE_BURST=int(os.getenv('SCREEN_BATCH_RATE_BURST', '2')),
+    # Queued or running analyses a user may have at once; analyze requests beyond it get 429
+    SCREEN_BATCH_MAX_PENDING_JOBS=int(os.getenv('SCREEN_BATCH_MAX_PENDING_JOBS', '50')),
+    CHAT_SEARCH_MAX_PER_PAGE=50,  # Largest page of chat history search results
+    # Retrieval-only /search: CVs per page, how deep results can be paged, snippets per CV
+    SEARCH_DEFAULT_K=10,
+    SEARCH_MAX_K=50,
+    SEARCH_MAX_RESULTS=int(os.getenv('SEARCH_MAX_RESULTS', '50')),
+    SEARCH_SNIPPETS_PER_CV=3,
+    SEARCH_SNIPPET_CHARS=300,
+    SEARCH_CACHE_SIZE=int(os.getenv('SEARCH_CACHE_SIZE', '256')),  # Ranked result lists kept per process
+    THUMBNAIL_FOLDER='thumbnails',
+    THUMBNAIL_WIDTH=240,  # Pixels; the height follows the first page's aspect ratio
+    PDF_CACHE_MAX_AGE=3600,  # Seconds browsers may reuse a CV or thumbnail before revalidating
+    # Users allowed to run index maintenance, as a comma-separated list of emails
+    ADMIN_EMAILS={email.strip() for email in os.getenv('ADMIN_EMAILS', '').split(',') if email.strip()}
 )
 
+# Initialize the session backend once the final config is in place
+init_session_backend(app)
+
 # Initialize SQLAlchemy and login manager
 from flask_sqlalchemy import SQLAlchemy
 
 db = SQLAlchemy()
 login_manager = LoginManager()
+user_cache = UserCache(maxsize=app.config['USER_CACHE_SIZE'], ttl=app.config['USER_CACHE_TTL'])
 
 # Define models
 class User(db.Model):
@@ -159,25 +287,170 @@ class Chat(db.Model):
     cv_filename = db.Column(db.String(255))
     ai_response = db.Column(db.Text)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    cv_versions = db.relationship('ChatCvVersion', lazy=True, cascade='all, delete-orphan')
+
+class ChatCvVersion(db.Model):
+    """Content hash of a CV as it was when a chat analyzed it"""
+    id = db.Column(db.Integer, primary_key=True)
+    chat_id = db.Column(db.Integer, db.ForeignKey('chat.id'), nullable=False, index=True)
+    filename = db.Column(db.String(255), nullable=False)
+    content_hash = db.Column(db.String(64))
+
+class CvDocument(db.Model):
+    """Catalog entry of an uploaded CV, so serving it needs no filesystem lookups"""
+    id = db.Column(db.Integer, primary_key=True)
+    filename = db.Column(db.String(255), unique=True, nullable=False)
+    content_hash = db.Column(db.String(64), nullable=False)
+    size = db.Column(db.Integer, nullable=False)
+    page_count = db.Column(db.Integer)
+    uploaded_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+class CandidateProfile(db.Model):
+    """Compact text profile of a CV, extracted once after upload"""
+    id = db.Column(db.Integer, primary_key=True)
+    filename = db.Column(db.String(255), unique=True, nullable=False)
+    content_hash = db.Column(db.String(64), nullable=False)  # Version of the CV the profile describes
+    status = db.Column(db.String(16), nullable=False, default='pending')  # pending, ready or failed
+    profile = db.Column(db.Text)
+    error = db.Column(db.Text)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+class ScreeningJob(db.Model):
+    """Deferred LLM analysis of one job description from a batch screening request"""
+    id = db.Column(db.String(36), primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
+    job_description = db.Column(db.Text, nullable=False)
+    cv_filename = db.Column(db.Text)
+    status = db.Column(db.String(16), nullable=False, default='queued')  # queued, running, done or failed
+    ai_response = db.Column(db.Text)
+    error = db.Column(db.Text)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    finished_at = db.Column(db.DateTime)
 
 # Initialize the application
 db.init_app(app)
 login_manager.init_app(app)
 login_manager.login_view = 'login'
 
-# Create all database tables
+# Create all database tables, with every engine connection in WAL mode
 with app.app_context():
+    enable_sqlite_pragmas(db.engine)
     db.create_all()
+    create_chat_fts(db.engine)
+
+# Identical concurrent job descriptions share one screening pipeline execution
+chat_coalescer = SingleFlight(
+    result_dir=app.config['CHAT_COALESCE_DIR'] if app.config['CHAT_COALESCE_ACROSS_PROCESSES'] else None
+)
+
+def build_admission_controller(name, prefix):
+    """Create an admission controller from the ``<prefix>_*`` settings"""
+    return AdmissionController(
+        name,
+        max_concurrent=app.config[f'{prefix}_MAX_CONCURRENT'],
+        max_per_user=app.config[f'{prefix}_MAX_PER_USER'],
+        max_queue=app.config[f'{prefix}_QUEUE_SIZE'],
+        queue_timeout=app.config[f'{prefix}_QUEUE_TIMEOUT'],
+        rate_per_minute=app.config[f'{prefix}_RATE_PER_MINUTE'],
+        burst=app.config[f'{prefix}_RATE_BURST']
+    )
+
+# Screening chats, PDF ingestion and batch screening are limited separately, so a
+# burst of one does not starve the others
+chat_admission = build_admission_controller('chat', 'CHAT')
+upload_admission = build_admission_controller('upload', 'UPLOAD')
+screen_batch_admission = build_admission_controller('screen-batch', 'SCREEN_BATCH')
+
+def admission_user_key():
+    """Key requests are limited by: the user id, or the client address when anonymous"""
+    if current_user.is_authenticated:
+        return f"user:{current_user.id}"
+    return f"addr:{request.remote_addr}"
+
+def admission_rejected_response(error):
+    """JSON error response with Retry-After for a rejected request"""
+    print(f"Request rejected by admission control ({error.reason}): {str(error)}")
+    response = jsonify({'error': str(error), 'reason': error.reason})
+    response.headers['Retry-After'] = str(error.retry_after)
+    return response, error.status
+
+def admission_controlled(controller):
+    """Run the decorated view only once ``controller`` admits the request"""
+    def decorator(view):
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            if request.method == 'OPTIONS':
+                return view(*args, **kwargs)
+            try:
+                with controller.admit(admission_user_key()):
+                    return view(*args, **kwargs)
+            except AdmissionRejected as e:
+                return admission_rejected_response(e)
+        return wrapper
+    return decorator
+
+# First-page previews of uploaded CVs
+thumbnail_cache = ThumbnailCache(app.config['THUMBNAIL_FOLDER'], width=app.config['THUMBNAIL_WIDTH'])
+
+def load_analyzed_job_descriptions(last_id, limit):
+    """
+    Newest analyzed job descriptions in the chat history after a row id, oldest first.
+
+    Chats saved without the content hashes of their CVs are skipped, since it cannot
+    be told whether those CVs changed since.
+    """
+    with app.app_context():
+        rows = (
+            Chat.query
+            .filter(Chat.id > last_id, Chat.ai_response.isnot(None), Chat.cv_versions.any())
+            .order_by(Chat.id.desc())
+            .limit(limit)
+            .all()
+        )
+        versions = {}
+        for version in ChatCvVersion.query.filter(ChatCvVersion.chat_id.in_([row.id for row in rows])):
+            versions.setdefault(version.chat_id, []).append((version.filename, version.content_hash))
+        return [(row.id, row.user_id, row.job_description, versions[row.id], row.ai_response)
+                for row in reversed(rows)]
+
+# Near-duplicate job descriptions reuse earlier analyses of the same candidates
+jd_cache = SemanticJdCache(
+    embed=lambda texts: get_embedding_model().embed_documents(texts),
+    load_since=load_analyzed_job_descriptions,
+    threshold=app.config['JD_CACHE_THRESHOLD'],
+    maxsize=app.config['JD_CACHE_SIZE']
+) if app.config['JD_CACHE_ENABLED'] else None
+if jd_cache is not None:
+    # Embedding the recent history takes seconds; keep it out of the first /chat request
+    threading.Thread(target=jd_cache.warm, name='jd-cache-warm', daemon=True).start()
+
+# Chat history is committed in batches off the request thread
+history_writer = HistoryWriter(
+    app,
+    db,
+    batch_size=app.config['HISTORY_BATCH_SIZE'],
+    flush_interval=app.config['HISTORY_FLUSH_INTERVAL']
+).start()
 
 @login_manager.user_loader
 def load_user(user_id):
+    """Resolve a user id to a cached user record, querying the database on a miss."""
     if not user_id:
         return None
     try:
-        return User.query.get(int(user_id))
+        user_id = int(user_id)
     except (ValueError, TypeError):
         return None
 
+    cached = user_cache.get(user_id)
+    if cached is not None:
+        return cached
+
+    user = User.query.get(user_id)
+    if not user:
+        return None
+    return user_cache.put(user)
+
 # Create required folders and database
 with app.app_context():
     print("Initializing database and required folders...")
@@ -254,15 +527,6 @@ ALLOWED_EXTENSIONS = {'pdf'}
 def serve():
     return send_from_directory(app.static_folder, 'index.html')
 
-@login_manager.user_loader
-def load_user(user_id):
-    if not user_id:
-        return None
-    try:
-        return User.query.get(int(user_id))
-    except (ValueError, TypeError):
-        return None
-
 # Google OAuth routes
 @app.route('/login')
 @cross_origin(supports_credentials=True)
@@ -410,6 +674,9 @@ def callback():
                 print("10. New user created with ID:", user.id)
             else:
                 print("9. Found existing user:", user.email)
+
+            # Drop any stale cached copy so the fresh row is used from now on
+            user_cache.invalidate(user.id)
             
             # Set up session first
             session.clear()  # Clear any existing session data
@@ -434,20 +701,8 @@ def callback():
             # Create response with proper session handling
             response = redirect('http://localhost:3000')
             
-            # Set session cookie explicitly
-            session_lifetime = app.config['PERMANENT_SESSION_LIFETIME'].total_seconds()
-            response.set_cookie(
-                'session',
-                session.sid if hasattr(session, 'sid') else session.get('_id', ''),
-                max_age=int(session_lifetime),
-                path='/',
-                domain=None,
-                secure=False,  # Set to True in production
-                httponly=True,
-                samesite='None'  # Required for cross-origin
-            )
-            
-            print("13. Response cookies being set:", response.headers.getlist('Set-Cookie'))
+            # The session cookie itself is issued by the session backend when the
+            # response is finalized, so it is not set explicitly here
             return response
             
         except Exception as e:
@@ -466,6 +721,7 @@ def callback():
 @login_required
 def logout():
     try:
+        user_cache.invalidate(current_user.id)
         logout_user()
         session.clear()  # Clear the session
         return redirect('http://localhost:3000')
@@ -487,30 +743,463 @@ def extract_text_from_pdf(file_path):
         print(f"Error extracting text from PDF: {str(e)}")
         return None
 
-def query(messages, max_retries=2):
-    for attempt in range(max_retries):
-        try:
-            print(f"Making API request (attempt {attempt + 1}/{max_retries})")
-            
-            response = client.chat.completions.create(
-                model="mistralai/Mistral-Small-3.1-24B-Instruct-2503",
-                messages=messages,
-                temperature=0.5,
-                max_tokens=600
+def record_cv_document(filename, content_hash, size, page_count, commit=True):
+    """Create or update the catalog entry of an uploaded CV"""
+    entry = CvDocument.query.filter_by(filename=filename).first()
+    if entry is None:
+        entry = CvDocument(filename=filename)
+        db.session.add(entry)
+    entry.content_hash = content_hash
+    entry.size = size
+    entry.page_count = page_count
+    entry.uploaded_at = datetime.utcnow()
+    if commit:
+        db.session.commit()
+    return entry
+
+def catalog_existing_cv(filename):
+    """Catalog a CV uploaded before the catalog existed, or return None if it is gone"""
+    file_path = os.path.join(app.config['UPLOAD_FOLDER'], filename)
+    if not os.path.exists(file_path):
+        return None
+    digest = hashlib.sha256()
+    with open(file_path, 'rb') as f:
+        for block in iter(lambda: f.read(1024 * 1024), b''):
+            digest.update(block)
+    try:
+        page_count = len(PdfReader(file_path).pages)
+    except Exception:
+        page_count = None
+    return record_cv_document(filename, digest.hexdigest(), os.path.getsize(file_path), page_count)
+
+def private_cache(response):
+    """CVs are personal data: allow browser caching but never shared caches"""
+    response.cache_control.public = False
+    response.cache_control.private = True
+    return response
+
+JOB_KEYWORDS = ['job', 'position', 'hiring', 'looking for', 'requirements', 'qualifications',
+                'experience', 'skills', 'salary', 'role', 'responsibilities']
+
+def is_job_description_message(message):
+    """Detect whether a chat message is a job description to screen CVs against"""
+    return any(keyword in message.lower() for keyword in JOB_KEYWORDS)
+
+def matched_cv_entry(doc, score):
+    """Describe a matched CV chunk the way the analysis prompts and the frontend expect"""
+    cv_content = doc.page_content.strip()
+    if len(cv_content) > 1000:
+        cv_content = cv_content[:1000] + "..."
+    return {
+        'filename': doc.metadata.get('filename'),
+        'relevance_score': float(score),
+        'content': cv_content,
+        'source': doc.metadata.get('source', 'pdf'),
+        'page': doc.metadata.get('page', 1),
+        'content_hash': doc.metadata.get('content_hash')
+    }
+
+def analyzed_cv_versions(matched_cvs):
+    """Distinct ``[filename, content_hash]`` pairs of matched CVs, in a JSON-friendly form"""
+    return sorted({(cv['filename'], cv.get('content_hash')) for cv in matched_cvs},
+                  key=lambda version: (version[0], version[1] or ''))
+
+def chat_record(user_id, job_description, cv_filenames, response_text, cv_versions):
+    """Chat history row of an analysis, with the versions of the CVs it was made from"""
+    return Chat(
+        user_id=user_id,
+        job_description=job_description,
+        cv_filename=','.join(cv_filenames),
+        ai_response=response_text,
+        cv_versions=[ChatCvVersion(filename=filename, content_hash=content_hash)
+                     for filename, content_hash in cv_versions]
+    )
+
+def search_matched_cvs(job_description):
+    """Run the semantic search for a job description and return the relevant CV chunks"""
+    # Load the vector database
+    print("Loading vector database...")
+    db = load_db(app.config['DB_FOLDER'])
+    print("Vector database loaded successfully")
+    
+    # Perform semantic search
+    print("Performing semantic search...")
+    if app.config['RETRIEVAL_MODE'] == 'two_stage':
+        # Shortlist CVs by their summary vectors, then score chunks only within them
+        search_results = two_stage_search(
+            db,
+            job_description,
+            k=5,
+            candidates=app.config['RETRIEVAL_CANDIDATES']
+        )
+    else:
+        search_results = db.similarity_search_with_score(
+            job_description,
+            k=5
+        )
+    print(f"Found {len(search_results)} matching documents")
+
+    # The distance cut-off depends on the collection's distance metric
+    max_distance = get_match_threshold(db)
+    
+    # Process matched CVs
+    matched_cvs = []
+    for i, (doc, score) in enumerate(search_results):
+        print(f"\nProcessing match {i+1}:")
+        print(f"Score: {score}")
+        print(f"Filename: {doc.metadata.get('filename', 'unknown')}")
+        
+        if score < max_distance:
+            # Get filename with fallback for missing metadata
+            if not doc.metadata.get('filename'):
+                print(f"Warning: Document missing filename metadata. Full metadata: {doc.metadata}")
+                continue
+
+            matched_cvs.append(matched_cv_entry(doc, score))
+            print(f"Added to matched CVs. Total matches: {len(matched_cvs)}")
+        else:
+            print(f"Skipped due to low relevance score: {score}")
+
+    return matched_cvs
+
+_search_cache = OrderedDict()
+_search_cache_lock = threading.Lock()
+
+def ranked_cv_search(query, max_distance, corpus_version):
+    """
+    Rank CVs for a query without any LLM call, with each CV's closest chunks.
+
+    The ranked list is computed once per query, threshold and corpus version, up to
+    ``SEARCH_MAX_RESULTS`` CVs, so paging through it costs no further embedding or
+    vector search.
+
+    Args:
+        query (str): Normalized query text.
+        max_distance (float): Largest chunk distance kept, or None for the metric's default.
+        corpus_version (int): Corpus version the results belong to.
+
+    Returns:
+        list: ``(filename, [(document, distance), ...])`` tuples, best CV first
+    """
+    key = (corpus_version, query, max_distance, app.config['RETRIEVAL_MODE'])
+    with _search_cache_lock:
+        if key in _search_cache:
+            _search_cache.move_to_end(key)
+            return _search_cache[key]
+
+    db = load_db(app.config['DB_FOLDER'])
+    if max_distance is None:
+        max_distance = get_match_threshold(db)
+    two_stage = app.config['RETRIEVAL_MODE'] == 'two_stage'
+    groups = grouped_search(
+        db,
+        [query],
+        k=app.config['SEARCH_MAX_RESULTS'],
+        candidates=app.config['RETRIEVAL_CANDIDATES'] if two_stage else None,
+        chunks_per_cv=app.config['SEARCH_SNIPPETS_PER_CV']
+    )[0]
+    ranked = []
+    for filename, chunks in groups:
+        chunks = [(doc, distance) for doc, distance in chunks if distance < max_distance]
+        if chunks:
+            ranked.append((filename, chunks))
+
+    with _search_cache_lock:
+        _search_cache[key] = ranked
+        while len(_search_cache) > app.config['SEARCH_CACHE_SIZE']:
+            _search_cache.popitem(last=False)
+    return ranked
+
+def search_fingerprint(query, max_distance):
+    """Short digest tying a pagination cursor to the query it was issued for"""
+    return hashlib.sha256(f"{query}|{max_distance}".encode()).hexdigest()[:16]
+
+def encode_search_cursor(corpus_version, offset, fingerprint):
+    payload = json.dumps({'v': corpus_version, 'o': offset, 'f': fingerprint}, separators=(',', ':'))
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip('=')
+
+def decode_search_cursor(cursor):
+    """Decode a cursor into ``(corpus_version, offset, fingerprint)``; ValueError if malformed"""
+    try:
+        payload = json.loads(base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)))
+        version, offset, fingerprint = int(payload['v']), int(payload['o']), str(payload['f'])
+    except Exception:
+        raise ValueError("Invalid cursor")
+    # A negative offset would slice the ranking from its end
+    if offset < 0:
+        raise ValueError("Invalid cursor")
+    return version, offset, fingerprint
+
+_profile_executor = None
+_profile_executor_lock = threading.Lock()
+_profiles_in_flight = set()
+
+def get_profile_executor():
+    """Thread pool extracting candidate profiles, started on first use"""
+    global _profile_executor
+    with _profile_executor_lock:
+        if _profile_executor is None:
+            _profile_executor = ThreadPoolExecutor(
+                max_workers=app.config['PROFILE_WORKERS'],
+                thread_name_prefix='profiles'
             )
-            
-            return response
-                
-        except Exception as e:
-            print(f"API request failed on attempt {attempt + 1}:", str(e))
-            if attempt + 1 < max_retries:
-                print("Retrying...")
+        return _profile_executor
+
+def schedule_profile(filename, content_hash):
+    """Queue the extraction of a CV's profile unless it is already queued for this version"""
+    if not app.config['PROFILES_ENABLED']:
+        return
+    key = (filename, content_hash)
+    with _profile_executor_lock:
+        if key in _profiles_in_flight:
+            return
+        _profiles_in_flight.add(key)
+    try:
+        get_profile_executor().submit(build_candidate_profile, filename, content_hash)
+    except Exception as e:
+        print(f"Could not queue profile of {filename}: {str(e)}")
+        with _profile_executor_lock:
+            _profiles_in_flight.discard(key)
+
+def save_candidate_profile(filename, content_hash, status, profile=None, error=None):
+    entry = CandidateProfile.query.filter_by(filename=filename).first()
+    if entry is None:
+        entry = CandidateProfile(filename=filename)
+        db.session.add(entry)
+    entry.content_hash = content_hash
+    entry.status = status
+    entry.profile = profile
+    entry.error = error
+    db.session.commit()
+
+def build_candidate_profile(filename, content_hash):
+    """Read a CV once with the vision model and store its compact text profile"""
+    try:
+        with app.app_context():
+            current = CandidateProfile.query.filter_by(filename=filename).first()
+            if current is not None and current.content_hash == content_hash and current.status == 'ready':
+                return
+            save_candidate_profile(filename, content_hash, 'pending')
+
+            pdf_path = os.path.join(app.config['UPLOAD_FOLDER'], filename)
+            try:
+                base64_images = convert_pdf_to_base64_images(pdf_path)
+                if not base64_images:
+                    raise ValueError(f"No images generated from {filename}")
+                profile = llm.complete(
+                    messages=build_profile_messages(filename, base64_images),
+                    temperature=0.2,
+                    max_tokens=app.config['PROFILE_MAX_TOKENS']
+                )
+            except Exception as e:
+                print(f"Profile extraction failed for {filename}: {str(e)}")
+                save_candidate_profile(filename, content_hash, 'failed', error=str(e))
+                return
+
+            # The CV may have been replaced or deleted while the profile was generated
+            entry = CvDocument.query.filter_by(filename=filename).first()
+            if entry is None or entry.content_hash != content_hash:
+                print(f"Discarding profile of outdated version of {filename}")
+                return
+            save_candidate_profile(filename, content_hash, 'ready', profile=profile.strip())
+            print(f"Stored profile of {filename} ({len(profile)} characters)")
+    finally:
+        with _profile_executor_lock:
+            _profiles_in_flight.discard((filename, content_hash))
+
+def load_candidate_profiles(filenames):
+    """Profiles of the current version of each CV, keyed by filename"""
+    if not filenames:
+        return {}
+    with app.app_context():
+        hashes = dict(
+            db.session.query(CvDocument.filename, CvDocument.content_hash)
+            .filter(CvDocument.filename.in_(filenames)).all()
+        )
+        return {
+            entry.filename: entry.profile
+            for entry in CandidateProfile.query.filter(
+                CandidateProfile.filename.in_(filenames), CandidateProfile.status == 'ready'
+            ).all()
+            if hashes.get(entry.filename) == entry.content_hash
+        }
+
+def split_profiled_candidates(matched_cvs):
+    """
+    Pair each matched CV with its stored profile.
+
+    CVs without a profile of their current version are returned separately, to be
+    sent as page images, and their profiles are queued for the next request.
+
+    Returns:
+        tuple: ``(index, cv, profile)`` tuples and ``(index, cv)`` tuples of CVs without a profile
+    """
+    candidates = dedupe_candidates(matched_cvs)
+    profiles = load_candidate_profiles([cv['filename'] for cv in candidates])
+    profiled, missing = [], []
+    for i, cv in enumerate(candidates):
+        profile = profiles.get(cv['filename'])
+        if profile:
+            profiled.append((i + 1, cv, profile))
+        else:
+            missing.append((i + 1, cv))
+
+    if missing and app.config['PROFILES_ENABLED']:
+        with app.app_context():
+            for _, cv in missing:
+                entry = CvDocument.query.filter_by(filename=cv['filename']).first() or catalog_existing_cv(cv['filename'])
+                if entry is not None:
+                    schedule_profile(cv['filename'], entry.content_hash)
+    print(f"{len(profiled)} of {len(candidates)} candidates have a profile")
+    return profiled, missing
+
+def analyze_with_profiles(job_description, matched_cvs):
+    """Analyze the matched CVs from their compact profiles, rendering only those without one"""
+    profiled, missing = split_profiled_candidates(matched_cvs)
+    rendered_cvs = []
+    for index, cv in missing:
+        pdf_path = os.path.join(app.config['UPLOAD_FOLDER'], cv['filename'])
+        if not os.path.exists(pdf_path):
+            print(f"Warning: PDF file not found at {pdf_path}")
+            continue
+        base64_images = convert_pdf_to_base64_images(pdf_path)
+        if base64_images:
+            rendered_cvs.append((index, cv, base64_images))
+        else:
+            print(f"Warning: No images generated for {cv['filename']}")
+
+    print("\nCalling LLM API...")
+    response_text = llm.complete(
+        messages=build_profile_analysis_messages(job_description, profiled, rendered_cvs),
+        temperature=0.7,
+        max_tokens=2000
+    )
+    print("LLM API call successful")
+    return response_text
+
+def analyze_matched_cvs(job_description, matched_cvs):
+    """Ask the LLM to analyze the matched CVs against the job description"""
+    print(f"\nProcessing {len(matched_cvs)} matched CVs...")
+    if app.config['CHAT_ANALYSIS_MODE'] == 'fanout':
+        # One concurrent LLM call per candidate, then a text-only ranking pass
+        return analyze_candidates_fanout(job_description, matched_cvs)
+    if app.config['CHAT_ANALYSIS_MODE'] == 'profile':
+        # Small precomputed text profiles instead of every page of every CV
+        return analyze_with_profiles(job_description, matched_cvs)
+
+    print("Processing CV images...")
+    rendered_cvs = []
+    for i, cv in enumerate(matched_cvs):
+        pdf_path = os.path.join(app.config['UPLOAD_FOLDER'], cv['filename'])
+        print(f"\nProcessing CV {i+1}: {cv['filename']}")
+
+        if os.path.exists(pdf_path):
+            print(f"Converting PDF to images: {pdf_path}")
+            try:
+                base64_images = convert_pdf_to_base64_images(pdf_path)
+                if base64_images:
+                    print(f"Successfully converted PDF to {len(base64_images)} images")
+                    rendered_cvs.append((i + 1, cv, base64_images))
+                else:
+                    print("Warning: No images generated from PDF")
+            except Exception as e:
+                print(f"Error converting PDF to images: {str(e)}")
                 continue
-            raise
+        else:
+            print(f"Warning: PDF file not found at {pdf_path}")
+
+    print("\nCalling LLM API...")
+    response_text = llm.complete(
+        messages=build_analysis_messages(job_description, rendered_cvs),
+        temperature=0.7,
+        max_tokens=2000
+    )
+    print("LLM API call successful")
+
+    return response_text
+
+def suggest_candidate_profile(job_description):
+    """Ask the LLM what kind of candidates to look for when no CV matched"""
+    print("\nNo matching CVs found, generating suggestions...")
+    response_text = llm.complete(
+        messages=build_suggestion_messages(job_description),
+        temperature=0.7,
+        max_tokens=1000
+    )
+    print("Generated suggestions for no matches")
+
+    return response_text
+
+def lookup_similar_analysis(user_id, job_description, cv_versions):
+    """Find the user's cached analysis of a near-duplicate job description with the same candidates"""
+    if jd_cache is None:
+        return None, None
+    try:
+        cached, embedding = jd_cache.lookup(user_id, job_description, cv_versions)
+    except Exception as e:
+        # The cache only saves work; screening goes on without it
+        print(f"Job description cache lookup failed: {str(e)}")
+        return None, None
+    if cached:
+        print(f"Reusing the analysis of a near-duplicate job description "
+              f"(similarity {cached['similarity']:.3f})")
+    return cached, embedding
+
+def remember_analysis(user_id, job_description, cv_versions, response_text, embedding=None):
+    """Index a new analysis for near-duplicate reuse by the same user"""
+    if jd_cache is None:
+        return
+    try:
+        jd_cache.add(user_id, job_description, cv_versions, response_text, embedding)
+    except Exception as e:
+        print(f"Error caching job description analysis: {str(e)}")
+
+def screen_job_description(job_description, user_id):
+    """
+    Run the full screening pipeline for a job description.
+
+    The user's own near-duplicate analyses are checked first and stay private to
+    them. On a miss, the analysis only depends on the job description and the
+    indexed corpus, so it is shared between concurrent identical requests of all
+    users through ``chat_coalescer``.
+
+    Returns:
+        dict: ``response``, the matched ``cv_filenames`` and ``cv_versions``, and
+              whether it was a ``cache_hit`` or ``coalesced`` with another request
+    """
+    matched_cvs = search_matched_cvs(job_description)
+    cv_filenames = [cv['filename'] for cv in matched_cvs]
+    cv_versions = analyzed_cv_versions(matched_cvs)
+    embedding = None
+    if matched_cvs:
+        cached, embedding = lookup_similar_analysis(user_id, job_description, cv_versions)
+        if cached:
+            return {'response': cached['response'], 'cv_filenames': cv_filenames,
+                    'cv_versions': cv_versions, 'cache_hit': True, 'coalesced': False}
+
+    result, coalesced = chat_coalescer.do(
+        chat_coalescing_key(job_description),
+        lambda: {'response': analyze_matched_cvs(job_description, matched_cvs) if matched_cvs
+                 else suggest_candidate_profile(job_description)}
+    )
+    if matched_cvs:
+        remember_analysis(user_id, job_description, cv_versions, result['response'], embedding)
+    return {'response': result['response'], 'cv_filenames': cv_filenames,
+            'cv_versions': cv_versions, 'cache_hit': False, 'coalesced': coalesced}
+
+def chat_coalescing_key(job_description):
+    """Key identical job descriptions against the same corpus to one analysis, whoever sends them"""
+    normalized = ' '.join(job_description.lower().split())
+    return '|'.join([
+        normalized,
+        str(get_corpus_version(app.config['DB_FOLDER'])),
+        app.config['CHAT_ANALYSIS_MODE']
+    ])
 
 @app.route('/chat', methods=['POST'])
 @login_required
 @cross_origin(supports_credentials=True)
+@admission_controlled(chat_admission)
 def chat():
     try:
         print("\n=== Starting chat request processing ===")
@@ -534,159 +1223,34 @@ def chat():
             return jsonify({'error': 'Message is required'}), 400
 
         # Detect if message is a job description
-        job_keywords = ['job', 'position', 'hiring', 'looking for', 'requirements', 'qualifications', 
-                       'experience', 'skills', 'salary', 'role', 'responsibilities']
-        is_job_description = any(keyword in user_message.lower() for keyword in job_keywords)
+        is_job_description = is_job_description_message(user_message)
         print(f"Message classified as job description: {is_job_description}")
 
         if is_job_description:
             print("Processing as job description...")
             try:
-                # Load the vector database
-                print("Loading vector database...")
-                db = load_db(app.config['DB_FOLDER'])
-                print("Vector database loaded successfully")
-                
-                # Perform semantic search
-                print("Performing semantic search...")
-                search_results = db.similarity_search_with_score(
-                    user_message,
-                    k=5
-                )
-                print(f"Found {len(search_results)} matching documents")
-                
-                # Process matched CVs
-                matched_cvs = []
-                for i, (doc, score) in enumerate(search_results):
-                    print(f"\nProcessing match {i+1}:")
-                    print(f"Score: {score}")
-                    print(f"Filename: {doc.metadata.get('filename', 'unknown')}")
-                    
-                    if score < 0.8:
-                        cv_content = doc.page_content.strip()
-                        if len(cv_content) > 1000:
-                            cv_content = cv_content[:1000] + "..."
-                        
-                        # Get filename with fallback for missing metadata
-                        filename = doc.metadata.get('filename')
-                        if not filename:
-                            print(f"Warning: Document missing filename metadata. Full metadata: {doc.metadata}")
-                            continue
-                            
-                        matched_cv = {
-                            'filename': filename,
-                            'relevance_score': float(score),
-                            'content': cv_content,
-                            'source': doc.metadata.get('source', 'pdf'),
-                            'page': doc.metadata.get('page', 1)
-                        }
-                        matched_cvs.append(matched_cv)
-                        print(f"Added to matched CVs. Total matches: {len(matched_cvs)}")
-                    else:
-                        print(f"Skipped due to low relevance score: {score}")
-
-                if matched_cvs:
-                    print(f"\nProcessing {len(matched_cvs)} matched CVs...")
-                    # Continue with existing matched CV processing...
-                    
-                    # Add CV images to messages
-                    messages = [
-                        {"role": "system", "content": """You are an expert HR assistant specializing in CV analysis and job matching. 
-                        Analyze the provided CV images along with the job description, and provide:
-                        1. Overall Match Score (1-10)
-                        2. Key Strengths that align with the job requirements
-                        3. Potential Gaps or areas for improvement
-                        4. Specific skills and experiences that make the candidate suitable
-                        5. Brief hiring recommendation
-
-                        Format your response clearly for each CV, and conclude with a ranked comparison of all candidates."""},
-                        {"role": "user", "content": [
-                            {
-                                "type": "text",
-                                "text": f"Job Description:\n{user_message}\n\nPlease analyze the following CVs:"
-                            }
-                        ]}
-                    ]
-
-                    print("Processing CV images...")
-                    for i, cv in enumerate(matched_cvs):
-                        pdf_path = os.path.join(app.config['UPLOAD_FOLDER'], cv['filename'])
-                        print(f"\nProcessing CV {i+1}: {cv['filename']}")
-                        
-                        if os.path.exists(pdf_path):
-                            print(f"Converting PDF to images: {pdf_path}")
-                            try:
-                                base64_images = convert_pdf_to_base64_images(pdf_path)
-                                if base64_images:
-                                    print(f"Successfully converted PDF to {len(base64_images)} images")
-                                    messages[1]["content"].extend([
-                                        {
-                                            "type": "text",
-                                            "text": f"\nCV {i+1}: {cv['filename']} (Relevance Score: {cv['relevance_score']:.2f})"
-                                        },
-                                        *[{
-                                            "type": "image_url",
-                                            "image_url": {"url": img_url}
-                                        } for img_url in base64_images]
-                                    ])
-                                else:
-                                    print("Warning: No images generated from PDF")
-                            except Exception as e:
-                                print(f"Error converting PDF to images: {str(e)}")
-                                continue
-                        else:
-                            print(f"Warning: PDF file not found at {pdf_path}")
-
-                    print("\nCalling LLM API...")
-                    response = client.chat.completions.create(
-                        model="mistralai/Mistral-Small-3.1-24B-Instruct-2503",
-                        messages=messages,
-                        temperature=0.7,
-                        max_tokens=2000,
-                        stream=False
-                    )
-                    print("LLM API call successful")
-
+                # Concurrent identical requests share one analysis
+                result = screen_job_description(user_message, current_user.id)
+                response_text = result['response']
+                cache_hit = result['cache_hit']
+                if result['coalesced']:
+                    print("Reused the result of an identical in-flight request")
+
+                if result['cv_filenames']:
                     try:
-                        print("\nSaving chat history...")
-                        from flask_sqlalchemy import SQLAlchemy
-                        db_sql = SQLAlchemy(app)
-                        
-                        cv_filenames = [cv['filename'] for cv in matched_cvs]
-                        chat = Chat(
-                            user_id=current_user.id,
-                            job_description=user_message,
-                            cv_filename=','.join(cv_filenames),
-                            ai_response=response.choices[0].message.content
-                        )
-                        db_sql.session.add(chat)
-                        db_sql.session.commit()
-                        print("Chat history saved successfully")
+                        print("\nQueueing chat history...")
+                        history_writer.submit(chat_record(
+                            current_user.id, user_message, result['cv_filenames'],
+                            response_text, result.get('cv_versions', [])
+                        ))
+                        print("Chat history queued for saving")
                     except Exception as e:
                         print(f"Error saving chat history: {str(e)}")
                         # Continue even if saving fails
                         pass
 
-                else:
-                    print("\nNo matching CVs found, generating suggestions...")
-                    response = client.chat.completions.create(
-                        model="mistralai/Mistral-Small-3.1-24B-Instruct-2503",
-                        messages=[
-                            {"role": "system", "content": "You are an expert HR assistant."},
-                            {"role": "user", "content": [
-                                {
-                                    "type": "text",
-                                    "text": f"I could not find any CVs that match the following job description. "
-                                           f"Please suggest what kind of candidates I should look for:\n\n{user_message}"
-                                }
-                            ]}
-                        ],
-                        temperature=0.7,
-                        max_tokens=1000,
-                        stream=False
-                    )
-                    print("Generated suggestions for no matches")
-
+            except LLMUnavailableError:
+                raise
             except Exception as e:
                 print(f"\nError in job description processing:")
                 print(f"Error type: {type(e).__name__}")
@@ -698,26 +1262,30 @@ def chat():
                     'details': str(e) if app.debug else None
                 }), 500
         else:
+            cache_hit = False
             print("\nProcessing as regular chat message...")
-            response = client.chat.completions.create(
-                model="mistralai/Mistral-Small-3.1-24B-Instruct-2503",
-                messages=[
-                    {"role": "system", "content": "You are an expert HR assistant who specializes in career advice, "
-                                                 "resume writing, interview preparation, and professional development. "
-                                                 "Provide clear, practical, and actionable advice."},
-                    {"role": "user", "content": [{"type": "text", "text": user_message}]}
-                ],
+            response_text = llm.complete(
+                messages=build_advice_messages(user_message),
                 temperature=0.7,
-                max_tokens=1000,
-                stream=False
+                max_tokens=1000
             )
             print("Regular chat processing successful")
 
         print("\nSending response to client")
         return jsonify({
-            'response': response.choices[0].message.content
+            'response': response_text,
+            'cache_hit': cache_hit
         })
 
+    except LLMUnavailableError as e:
+        print(f"\nLLM unavailable: {str(e)}")
+        response = jsonify({
+            'error': 'The analysis service is temporarily unavailable. Please try again shortly.',
+            'details': str(e)
+        })
+        response.headers['Retry-After'] = str(int(e.retry_after or 30))
+        return response, 503
+
     except Exception as e:
         print(f"\n=== Error in chat endpoint ===")
         print(f"Error type: {type(e).__name__}")
@@ -731,19 +1299,308 @@ def chat():
             'details': str(e) if app.debug else None
         }), 500
 
-@app.route('/upload-pdf', methods=['POST', 'OPTIONS'])
-def upload_pdf():
-    """Handle PDF file upload and processing"""
-    if request.method == 'OPTIONS':
-        return handle_preflight()
-        
+_screening_executor = None
+_screening_executor_lock = threading.Lock()
+
+def get_screening_executor():
+    """Thread pool running deferred batch screening analyses, started on first use"""
+    global _screening_executor
+    with _screening_executor_lock:
+        if _screening_executor is None:
+            _screening_executor = ThreadPoolExecutor(
+                max_workers=app.config['SCREEN_BATCH_ANALYSIS_WORKERS'],
+                thread_name_prefix='screening'
+            )
+        return _screening_executor
+
+def run_screening_job(job_id, job_description, matched_cvs):
+    """Run the LLM analysis of one batch-screened job description in the background"""
+    with app.app_context():
+        job = ScreeningJob.query.get(job_id)
+        job.status = 'running'
+        db.session.commit()
+        try:
+            response_text = analyze_matched_cvs(job_description, matched_cvs)
+        except Exception as e:
+            print(f"Screening job {job_id} failed: {str(e)}")
+            job.status = 'failed'
+            job.error = str(e)
+            job.finished_at = datetime.utcnow()
+            db.session.commit()
+            return
+
+        job.status = 'done'
+        job.ai_response = response_text
+        job.finished_at = datetime.utcnow()
+        db.session.commit()
+        # Finished analyses show up in the chat history like interactive ones
+        history_writer.submit(chat_record(
+            job.user_id, job_description, job.cv_filename.split(','),
+            response_text, analyzed_cv_versions(matched_cvs)
+        ))
+        print(f"Screening job {job_id} finished")
+
+def screening_job_status(job):
+    return {
+        'job_id': job.id,
+        'status': job.status,
+        'cv_filenames': job.cv_filename.split(',') if job.cv_filename else [],
+        'response': job.ai_response,
+        'error': job.error,
+        'created_at': job.created_at.isoformat() if job.created_at else None,
+        'finished_at': job.finished_at.isoformat() if job.finished_at else None
+    }
+
+def pending_screening_jobs(user_id):
+    """Number of the user's batch analyses that are queued or running"""
+    return ScreeningJob.query.filter(
+        ScreeningJob.user_id == user_id,
+        ScreeningJob.status.in_(('queued', 'running'))
+    ).count()
+
+def too_many_pending_jobs(pending, requested=0):
+    """429 response for an analyze request that would exceed the user's pending job limit"""
+    limit = app.config['SCREEN_BATCH_MAX_PENDING_JOBS']
+    print(f"Rejected batch analysis: {pending} pending, {requested} requested, limit {limit}")
+    response = jsonify({
+        'error': f"You have {pending} screening analyses in progress; at most {limit} may be queued at once",
+        'reason': 'too_many_pending_jobs',
+        'pending': pending,
+        'requested': requested,
+        'limit': limit
+    })
+    response.headers['Retry-After'] = '60'
+    return response, 429
+
+@app.route('/screen-batch', methods=['POST'])
+@login_required
+@cross_origin(supports_credentials=True)
+@admission_controlled(screen_batch_admission)
+def screen_batch():
+    """
+    Shortlist candidates for many job descriptions in one pass.
+
+    Accepts ``{"job_descriptions": [...], "k": 5, "analyze": false}``. All job
+    descriptions are embedded in one model call and searched together, and each
+    gets a ranked list of distinct CVs. With ``analyze`` set, the LLM analysis of
+    every job description with matches is queued as a job to poll at
+    ``/screen-batch/jobs/<job_id>`` instead of delaying the response; a user may
+    have at most ``SCREEN_BATCH_MAX_PENDING_JOBS`` analyses queued or running.
+    """
     try:
-        print("Received upload request")
-        if 'file' not in request.files:
+        data = request.get_json(silent=True) or {}
+        job_descriptions = data.get('job_descriptions')
+        if not isinstance(job_descriptions, list) or not job_descriptions:
+            return jsonify({"error": "job_descriptions must be a non-empty list"}), 400
+        if len(job_descriptions) > app.config['SCREEN_BATCH_MAX_JDS']:
+            return jsonify({"error": f"At most {app.config['SCREEN_BATCH_MAX_JDS']} job descriptions per request"}), 400
+        job_descriptions = [str(text).strip() for text in job_descriptions]
+        if not all(job_descriptions):
+            return jsonify({"error": "Job descriptions must not be empty"}), 400
+        try:
+            k = int(data.get('k', 5))
+        except (TypeError, ValueError):
+            return jsonify({"error": "k must be an integer"}), 400
+        k = max(1, min(k, app.config['SCREEN_BATCH_MAX_CANDIDATES']))
+        analyze = bool(data.get('analyze', False))
+        pending = pending_screening_jobs(current_user.id) if analyze else 0
+        if pending >= app.config['SCREEN_BATCH_MAX_PENDING_JOBS']:
+            return too_many_pending_jobs(pending)
+
+        print(f"Batch screening {len(job_descriptions)} job descriptions (k={k}, analyze={analyze})")
+        vector_db = load_db(app.config['DB_FOLDER'])
+        shortlists = batch_search(
+            vector_db,
+            job_descriptions,
+            k=k,
+            candidates=max(k, app.config['RETRIEVAL_CANDIDATES'])
+        )
+        max_distance = get_match_threshold(vector_db)
+
+        results, jobs = [], []
+        for index, (job_description, matches) in enumerate(zip(job_descriptions, shortlists)):
+            candidates = [matched_cv_entry(doc, score) for doc, score in matches if score < max_distance]
+            result = {'index': index, 'candidates': candidates}
+            if analyze and candidates:
+                job = ScreeningJob(
+                    id=str(uuid.uuid4()),
+                    user_id=current_user.id,
+                    job_description=job_description,
+                    cv_filename=','.join(cv['filename'] for cv in candidates)
+                )
+                db.session.add(job)
+                jobs.append((job.id, job_description, candidates))
+                result['job_id'] = job.id
+            results.append(result)
+
+        if jobs and pending + len(jobs) > app.config['SCREEN_BATCH_MAX_PENDING_JOBS']:
+            db.session.rollback()
+            return too_many_pending_jobs(pending, len(jobs))
+        if jobs:
+            # Jobs are committed before they start so the runner always finds its row
+            db.session.commit()
+            for job_id, job_description, candidates in jobs:
+                get_screening_executor().submit(run_screening_job, job_id, job_description, candidates)
+            print(f"Queued {len(jobs)} screening analyses")
+
+        return jsonify({'results': results})
+
+    except Exception as e:
+        print(f"Error in batch screening: {str(e)}")
+        import traceback
+        traceback.print_exc()
+        return jsonify({
+            'error': 'An error occurred processing your request',
+            'details': str(e) if app.debug else None
+        }), 500
+
+@app.route('/screen-batch/jobs/<job_id>', methods=['GET'])
+@login_required
+@cross_origin(supports_credentials=True)
+def get_screening_job(job_id):
+    """Status, and once finished the analysis, of a deferred batch screening job"""
+    job = ScreeningJob.query.filter_by(id=job_id, user_id=current_user.id).first()
+    if not job:
+        return jsonify({"error": "Job not found"}), 404
+    return jsonify(screening_job_status(job))
+
+@app.route('/search', methods=['GET', 'POST'])
+@login_required
+@cross_origin(supports_credentials=True)
+def search_cvs():
+    """
+    Rank CVs for a query without calling the LLM.
+
+    Parameters (query string for GET, JSON body for POST, for long job descriptions):
+    ``q`` the query, ``k`` CVs per page, ``threshold`` the largest distance kept
+    (the metric's default if omitted) and ``cursor`` from a previous page.
+
+    Responses carry an ETag derived from the corpus version and the parameters, so an
+    unchanged search is answered with 304 before any embedding or vector search.
+    """
+    try:
+        if request.method == 'POST':
+            params = request.get_json(silent=True) or {}
+        else:
+            params = request.args
+        query = ' '.join(str(params.get('q') or '').split())
+        if not query:
+            return jsonify({"error": "Parameter 'q' is required"}), 400
+        try:
+            k = int(params.get('k') or app.config['SEARCH_DEFAULT_K'])
+            threshold = params.get('threshold')
+            max_distance = float(threshold) if threshold not in (None, '') else None
+        except (TypeError, ValueError):
+            return jsonify({"error": "k and threshold must be numbers"}), 400
+        k = min(max(1, k), app.config['SEARCH_MAX_K'])
+
+        corpus_version = get_corpus_version(app.config['DB_FOLDER'])
+        fingerprint = search_fingerprint(query, max_distance)
+        offset = 0
+        cursor = params.get('cursor')
+        if cursor:
+            try:
+                cursor_version, offset, cursor_fingerprint = decode_search_cursor(cursor)
+            except ValueError as e:
+                return jsonify({"error": str(e)}), 400
+            if cursor_fingerprint != fingerprint:
+                return jsonify({"error": "Cursor belongs to a different search"}), 400
+            if cursor_version != corpus_version:
+                return jsonify({"error": "The CV collection changed since this search; start again without a cursor"}), 409
+
+        etag = hashlib.sha256('|'.join([
+            str(corpus_version), app.config['RETRIEVAL_MODE'], fingerprint, str(k), str(offset)
+        ]).encode()).hexdigest()[:32]
+        if request.if_none_match.contains(etag):
+            response = app.response_class(status=304)
+        else:
+            ranked = ranked_cv_search(query, max_distance, corpus_version)
+            page = ranked[offset:offset + k]
+            next_offset = offset + len(page)
+            snippet_chars = app.config['SEARCH_SNIPPET_CHARS']
+            results = [{
+                'rank': offset + i + 1,
+                'filename': filename,
+                'relevance_score': float(chunks[0][1]),
+                'snippets': [{
+                    'content': doc.page_content.strip()[:snippet_chars],
+                    'page': doc.metadata.get('page', 1),
+                    'relevance_score': float(distance)
+                } for doc, distance in chunks]
+            } for i, (filename, chunks) in enumerate(page)]
+            response = jsonify({
+                'query': query,
+                'corpus_version': corpus_version,
+                'results': results,
+                'next_cursor': encode_search_cursor(corpus_version, next_offset, fingerprint)
+                               if next_offset < len(ranked) else None
+            })
+        response.set_etag(etag)
+        # Results follow the corpus, so browsers keep them but revalidate every time
+        response.cache_control.no_cache = True
+        return private_cache(response)
+    except Exception as e:
+        print(f"Error in search: {str(e)}")
+        import traceback
+        traceback.print_exc()
+        return jsonify({"error": str(e)}), 500
+
+def index_cv(filename, documents):
+    """Index a CV's chunks, replacing any chunks previously indexed under its filename"""
+    with index_write_lock(app.config['DB_FOLDER']):
+        # load_db creates the collection on first use; any other failure is the caller's to report
+        print("Loading vector database...")
+        db = load_db(app.config['DB_FOLDER'])
+        print("Adding documents to the database...")
+        removed = replace_cv_vectors(db, filename, documents)
+        db.persist()
+        print(f"Documents added successfully, {removed} previous chunks replaced")
+
+    # Results computed against the previous corpus are no longer shareable
+    bump_corpus_version(app.config['DB_FOLDER'])
+
+def cv_exists(filename):
+    """Whether a CV is stored under this (sanitized) filename"""
+    return (os.path.exists(os.path.join(app.config['UPLOAD_FOLDER'], filename))
+            or CvDocument.query.filter_by(filename=filename).first() is not None)
+
+def receive_pdf(target_filename=None):
+    """
+    Stream an uploaded PDF to disk, index it and store it under its final name.
+
+    Args:
+        target_filename (str): Name of the CV being replaced, or None to store the
+                               upload under its own (sanitized) filename, which
+                               must not be taken yet.
+
+    Returns:
+        tuple: JSON response and HTTP status code
+    """
+    writers = []
+    try:
+        os.makedirs(app.config['UPLOAD_FOLDER'], exist_ok=True)
+        os.makedirs(app.config['DB_FOLDER'], exist_ok=True)
+
+        # Stream each file part straight into the uploads folder while hashing it
+        def upload_target(client_filename):
+            if not allowed_file(client_filename):
+                raise InvalidPdfUpload(f"Invalid file type. Only PDF files are allowed. Received: {client_filename}")
+            writer = StreamingPdfWriter(app.config['UPLOAD_FOLDER'], app.config['MAX_UPLOAD_BYTES'])
+            writers.append(writer)
+            return writer
+
+        request.upload_target_factory = upload_target
+        try:
+            files = request.files
+        except HTTPException as e:
+            print(f"Upload rejected: {e.description}")
+            return jsonify({"error": e.description}), e.code
+
+        if 'file' not in files:
             print("No file part in request")
             return jsonify({"error": "No file part"}), 400
             
-        file = request.files['file']
+        file = files['file']
         if file.filename == '':
             print("No selected file")
             return jsonify({"error": "No selected file"}), 400
@@ -751,76 +1608,398 @@ def upload_pdf():
         print(f"Received file: {file.filename}")
         print(f"File content type: {file.content_type}")
 
-        if not allowed_file(file.filename):
-            print(f"Invalid file type: {file.filename}")
-            return jsonify({"error": f"Invalid file type. Only PDF files are allowed. Received: {file.content_type}"}), 400
+        writer = file.stream
+        writer.validate()
+        print(f"Streamed {writer.size} bytes, sha256 {writer.content_hash}")
+
+        try:
+            page_count = len(PdfReader(writer.path).pages)
+        except Exception as e:
+            print(f"Unreadable PDF: {str(e)}")
+            return jsonify({"error": f"Could not read PDF: {str(e)}"}), 400
+        if page_count > app.config['MAX_PDF_PAGES']:
+            print(f"Rejected PDF with {page_count} pages")
+            return jsonify({"error": f"PDF has {page_count} pages, the limit is {app.config['MAX_PDF_PAGES']}"}), 400
+
+        filename = target_filename or secure_filename(file.filename)
+        if not target_filename and cv_exists(filename):
+            # Replacing a CV is an admin operation with its own route
+            print(f"Rejected upload over existing CV {filename}")
+            return jsonify({
+                "error": f"A CV named {filename} already exists; use PUT /cv/{filename} to replace it",
+                "filename": filename
+            }), 409
+        try:
+            # Extract from the received file so a failure leaves any previous version intact
+            print("Loading and splitting document...")
+            documents = load_cv(writer.path)
+            for doc in documents:
+                doc.metadata['filename'] = filename
+                doc.metadata['content_hash'] = writer.content_hash
+            print(f"Document loaded and split into {len(documents)} chunks")
+
+            index_cv(filename, documents)
+
+        except ValueError as ve:
+            print(f"Error processing PDF: {str(ve)}")
+            return jsonify({"error": f"Could not extract text from PDF: {str(ve)}"}), 400
+            
+        except Exception as e:
+            print(f"Error processing file: {str(e)}")
+            return jsonify({"error": f"Error processing file: {str(e)}"}), 500
+
+        # Atomically move the received file into place under its final name
+        upload_path = writer.commit(os.path.join(app.config['UPLOAD_FOLDER'], filename))
+        print(f"File saved to uploads folder: {upload_path}")
+
+        record_cv_document(filename, writer.content_hash, writer.size, page_count)
+        thumbnail_cache.render(upload_path, filename)
+        schedule_profile(filename, writer.content_hash)
+        
+        return jsonify({
+            "message": "File uploaded and processed successfully",
+            "filename": filename if target_filename else file.filename,
+            "chunks": len(documents),
+            "size": writer.size,
+            "pages": page_count,
+            "content_hash": writer.content_hash
+        }), 200
+
+    except InvalidPdfUpload as e:
+        print(f"Upload rejected: {e.description}")
+        return jsonify({"error": e.description}), 400
+
+    finally:
+        # Partial files of rejected or unused parts never reach the uploads folder
+        for writer in writers:
+            writer.discard()
+
+_ingest_executor = None
+_ingest_executor_lock = threading.Lock()
+
+def get_ingest_executor():
+    """Process pool extracting text for bulk uploads, started on first use"""
+    global _ingest_executor
+    with _ingest_executor_lock:
+        if _ingest_executor is None:
+            # Workers unpickle load_cv from document_processor. Spawn also re-runs the
+            # parent's __main__ script in each worker, which is why the development server
+            # starts from serve.py (a no-op there) rather than from this module
+            _ingest_executor = ProcessPoolExecutor(
+                max_workers=app.config['INGEST_WORKERS'],
+                mp_context=multiprocessing.get_context('spawn')
+            )
+        return _ingest_executor
+
+def upload_error(name, error):
+    """Manifest entry for a file that could not be ingested"""
+    message = error.description if isinstance(error, HTTPException) else str(error)
+    return {'filename': name, 'status': 'failed', 'error': message}
+
+def receive_bulk_files(writers):
+    """
+    Stream every uploaded PDF or ZIP archive to disk.
+
+    Returns:
+        tuple: ``(received, manifest)`` with ``(client_name, writer)`` pairs for every
+               received PDF and manifest entries for rejected files
+    """
+    def upload_target(client_filename):
+        if client_filename.lower().endswith('.zip'):
+            writer = StreamingZipWriter(app.config['UPLOAD_FOLDER'], app.config['MAX_BULK_UPLOAD_BYTES'])
+        elif allowed_file(client_filename):
+            writer = StreamingPdfWriter(app.config['UPLOAD_FOLDER'], app.config['MAX_UPLOAD_BYTES'])
+        else:
+            raise InvalidPdfUpload(f"Invalid file type. Only PDF and ZIP files are allowed. Received: {client_filename}")
+        writers.append(writer)
+        return writer
+
+    request.upload_target_factory = upload_target
+    request.max_content_length = app.config['MAX_BULK_UPLOAD_BYTES']
+    parts = request.files.getlist('files') + request.files.getlist('file')
+
+    received, manifest = [], []
+    for part in parts:
+        writer = part.stream
+        try:
+            writer.validate()
+        except HTTPException as e:
+            manifest.append(upload_error(part.filename, e))
+            continue
+
+        if not isinstance(writer, StreamingZipWriter):
+            received.append((part.filename, writer))
+            continue
+
+        try:
+            members = extract_zip_pdfs(
+                writer.path,
+                app.config['UPLOAD_FOLDER'],
+                max_files=app.config['MAX_BULK_FILES'],
+                max_file_bytes=app.config['MAX_UPLOAD_BYTES'],
+                max_total_bytes=app.config['MAX_BULK_UPLOAD_BYTES']
+            )
+        except HTTPException as e:
+            manifest.append(upload_error(part.filename, e))
+            continue
+        finally:
+            writer.discard()
+        for member, result in members:
+            if isinstance(result, StreamingPdfWriter):
+                writers.append(result)
+                received.append((member, result))
+            else:
+                manifest.append(upload_error(member, result))
+
+    return received, manifest
 
-        # Create uploads directory if it doesn't exist
+def commit_bulk_group(group, manifest):
+    """Embed, index and store a group of extracted CVs together"""
+    try:
+        index_cv_batch([(filename, documents) for filename, _, _, documents in group], app.config['DB_FOLDER'])
+    except Exception as e:
+        print(f"Error indexing bulk group: {str(e)}")
+        manifest.extend(upload_error(filename, e) for filename, _, _, _ in group)
+        return
+
+    for filename, writer, page_count, documents in group:
+        upload_path = writer.commit(os.path.join(app.config['UPLOAD_FOLDER'], filename))
+        record_cv_document(filename, writer.content_hash, writer.size, page_count, commit=False)
+        # A thumbnail left over from a deleted CV of the same name is re-rendered on its next request
+        thumbnail_cache.invalidate(filename)
+        manifest.append({
+            'filename': filename,
+            'status': 'indexed',
+            'chunks': len(documents),
+            'size': writer.size,
+            'pages': page_count,
+            'content_hash': writer.content_hash
+        })
+    db.session.commit()
+    bump_corpus_version(app.config['DB_FOLDER'])
+    for filename, writer, _, _ in group:
+        schedule_profile(filename, writer.content_hash)
+    print(f"Committed {len(group)} CVs")
+
+@app.route('/upload-pdfs', methods=['POST', 'OPTIONS'])
+@login_required
+@admission_controlled(upload_admission)
+def upload_pdfs():
+    """
+    Ingest many PDFs, or ZIP archives of PDFs, in one request.
+
+    Text is extracted from all files in parallel worker processes, chunks of many CVs
+    are embedded together and written to the vector database in groups, and the
+    response lists the outcome of every file. Existing CVs are never replaced here;
+    files with their names are reported as failed.
+    """
+    if request.method == 'OPTIONS':
+        return handle_preflight()
+
+    writers = []
+    try:
+        print("Received bulk upload request")
         os.makedirs(app.config['UPLOAD_FOLDER'], exist_ok=True)
         os.makedirs(app.config['DB_FOLDER'], exist_ok=True)
 
-        print("Creating temporary file...")
-        with tempfile.NamedTemporaryFile(delete=False, suffix='.pdf') as temp_file:
-            print(f"Temporary file created at: {temp_file.name}")
-            file.save(temp_file.name)
-            print("File saved to temporary location")
-            
-            # Save the file to uploads folder
-            filename = secure_filename(file.filename)
-            upload_path = os.path.join(app.config['UPLOAD_FOLDER'], filename)
-            with open(upload_path, 'wb') as upload_file:
-                with open(temp_file.name, 'rb') as tmp:
-                    upload_file.write(tmp.read())
-            print(f"File saved to uploads folder: {upload_path}")
+        try:
+            received, manifest = receive_bulk_files(writers)
+        except HTTPException as e:
+            print(f"Bulk upload rejected: {e.description}")
+            return jsonify({"error": e.description}), e.code
+
+        if not received and not manifest:
+            return jsonify({"error": "No files in request"}), 400
+        if len(received) > app.config['MAX_BULK_FILES']:
+            return jsonify({"error": f"Upload contains {len(received)} PDFs, the limit is {app.config['MAX_BULK_FILES']}"}), 400
+        print(f"Received {len(received)} PDFs, {len(manifest)} files rejected")
+
+        # Validate page counts and names, then extract text in parallel
+        futures = {}
+        seen = set()
+        for name, writer in received:
+            filename = secure_filename(os.path.basename(name))
+            if not filename:
+                manifest.append(upload_error(name, "Invalid filename"))
+                continue
+            if filename in seen:
+                manifest.append(upload_error(name, "Duplicate filename in this upload"))
+                continue
+            seen.add(filename)
+            if cv_exists(filename):
+                manifest.append(upload_error(name, f"{filename} already exists, use PUT /cv/{filename} to replace it"))
+                continue
+            try:
+                page_count = len(PdfReader(writer.path).pages)
+            except Exception as e:
+                manifest.append(upload_error(name, f"Could not read PDF: {str(e)}"))
+                continue
+            if page_count > app.config['MAX_PDF_PAGES']:
+                manifest.append(upload_error(name, f"PDF has {page_count} pages, the limit is {app.config['MAX_PDF_PAGES']}"))
+                continue
+            futures[get_ingest_executor().submit(load_cv, writer.path)] = (filename, writer, page_count)
 
+        group, group_chunks = [], 0
+        for future in as_completed(futures):
+            filename, writer, page_count = futures[future]
             try:
-                # Load and split the document
-                print("Loading and splitting document...")
-                documents = load_cv(temp_file.name)
-                print(f"Document loaded and split into {len(documents)} chunks")
-                
-                try:
-                    # Try to load existing database
-                    print("Loading existing database...")
-                    db = load_db(app.config['DB_FOLDER'])
-                    print("Adding documents to existing database...")
-                    db.add_documents(documents)
-                    db.persist()
-                    print("Documents added successfully")
-                except Exception as e:
-                    print(f"Error loading existing database: {str(e)}")
-                    print("Creating new database...")
-                    db = create_db(documents, app.config['DB_FOLDER'])
-                    db.persist()
-                    print("New database created successfully")
-                
-            except ValueError as ve:
-                print(f"Error processing PDF: {str(ve)}")
-                os.unlink(temp_file.name)
-                return jsonify({"error": f"Could not extract text from PDF: {str(ve)}"}), 400
-                
+                documents = future.result()
             except Exception as e:
-                print(f"Error processing file: {str(e)}")
-                os.unlink(temp_file.name)
-                return jsonify({"error": f"Error processing file: {str(e)}"}), 500
-            
-            # Clean up the temporary file
-            print("Cleaning up temporary file...")
-            os.unlink(temp_file.name)
-            print("Temporary file deleted")
-            
-            return jsonify({
-                "message": "File uploaded and processed successfully",
-                "filename": file.filename,
-                "chunks": len(documents)
-            })
+                print(f"Error processing {filename}: {str(e)}")
+                manifest.append(upload_error(filename, f"Could not extract text from PDF: {str(e)}"))
+                continue
+            for doc in documents:
+                doc.metadata['filename'] = filename
+                doc.metadata['content_hash'] = writer.content_hash
+            group.append((filename, writer, page_count, documents))
+            group_chunks += len(documents)
+
+            if group_chunks >= app.config['INGEST_EMBED_BATCH']:
+                commit_bulk_group(group, manifest)
+                group, group_chunks = [], 0
+        if group:
+            commit_bulk_group(group, manifest)
+
+        indexed = sum(1 for entry in manifest if entry['status'] == 'indexed')
+        result = {
+            "message": f"Indexed {indexed} of {len(manifest)} files",
+            "indexed": indexed,
+            "failed": len(manifest) - indexed,
+            "files": manifest
+        }
+        if not indexed:
+            result["error"] = "None of the uploaded files could be processed"
+            return jsonify(result), 400
+        return jsonify(result)
+
+    except Exception as e:
+        print(f"Error in upload_pdfs: {str(e)}")
+        import traceback
+        traceback.print_exc()
+        return jsonify({"error": str(e)}), 500
 
+    finally:
+        # Partial files of rejected or failed CVs never reach the uploads folder
+        for writer in writers:
+            writer.discard()
+
+def remove_cv(filename):
+    """
+    Remove a CV's vectors, file, thumbnail and catalog entry.
+
+    The vectors go first, so a CV stops being matched before its file disappears.
+
+    Returns:
+        int: Number of chunks removed from the vector database
+    """
+    with index_write_lock(app.config['DB_FOLDER']):
+        vector_db = load_db(app.config['DB_FOLDER'])
+        removed = delete_cv_vectors(vector_db, filename)
+        vector_db.persist()
+    bump_corpus_version(app.config['DB_FOLDER'])
+
+    file_path = os.path.join(app.config['UPLOAD_FOLDER'], filename)
+    if os.path.exists(file_path):
+        os.unlink(file_path)
+    thumbnail_cache.invalidate(filename)
+    CvDocument.query.filter_by(filename=filename).delete()
+    CandidateProfile.query.filter_by(filename=filename).delete()
+    db.session.commit()
+    return removed
+
+@app.route('/upload-pdf', methods=['POST', 'OPTIONS'])
+@login_required
+@admission_controlled(upload_admission)
+def upload_pdf():
+    """Handle PDF file upload and processing"""
+    if request.method == 'OPTIONS':
+        return handle_preflight()
+        
+    try:
+        print("Received upload request")
+        return receive_pdf()
     except Exception as e:
         print(f"Error in upload_pdf: {str(e)}")
         import traceback
         traceback.print_exc()
         return jsonify({"error": str(e)}), 500
 
+@app.route('/cv/<filename>', methods=['PUT', 'DELETE'])
+@login_required
+def manage_cv(filename):
+    """Replace (PUT) or delete (DELETE) an uploaded CV"""
+    # CVs are shared by every recruiter and have no owner, so only admins may change them
+    if not is_admin(current_user):
+        return jsonify({"error": "Admin access required"}), 403
+    filename = secure_filename(filename)
+    if not cv_exists(filename):
+        return jsonify({"error": "File not found"}), 404
+
+    try:
+        if request.method == 'PUT':
+            print(f"Replacing CV {filename}")
+            return receive_pdf(target_filename=filename)
+
+        print(f"Deleting CV {filename}")
+        removed = remove_cv(filename)
+        return jsonify({
+            "message": "File deleted successfully",
+            "filename": filename,
+            "chunks_removed": removed
+        })
+    except Exception as e:
+        print(f"Error managing CV {filename}: {str(e)}")
+        import traceback
+        traceback.print_exc()
+        return jsonify({"error": str(e)}), 500
+
+def is_admin(user):
+    return user.is_authenticated and user.email in app.config['ADMIN_EMAILS']
+
+@app.route('/admin/compact-index', methods=['POST'])
+@login_required
+def compact_index():
+    """Rebuild the vector index without the entries of deleted CVs"""
+    if not is_admin(current_user):
+        return jsonify({"error": "Admin access required"}), 403
+    try:
+        started = datetime.utcnow()
+        report = compact_db(app.config['DB_FOLDER'])
+        report['duration_seconds'] = (datetime.utcnow() - started).total_seconds()
+        print(f"Index compacted: {report}")
+        return jsonify(report)
+    except Exception as e:
+        print(f"Error compacting index: {str(e)}")
+        import traceback
+        traceback.print_exc()
+        return jsonify({"error": str(e)}), 500
+
+@app.route('/admin/build-profiles', methods=['POST'])
+@login_required
+def build_profiles():
+    """Queue profile extraction for every catalogued CV without a current profile"""
+    if not is_admin(current_user):
+        return jsonify({"error": "Admin access required"}), 403
+    if not app.config['PROFILES_ENABLED']:
+        return jsonify({"error": "Candidate profiles are disabled"}), 400
+
+    # CVs uploaded before the catalog existed are catalogued first
+    catalogued = {entry.filename for entry in CvDocument.query.all()}
+    for pdf in get_processed_pdfs_stats(app.config['UPLOAD_FOLDER'])['files']:
+        if pdf['name'] not in catalogued:
+            catalog_existing_cv(pdf['name'])
+    profiles = {
+        entry.filename: entry for entry in CandidateProfile.query.filter_by(status='ready').all()
+    }
+    queued = 0
+    for entry in CvDocument.query.all():
+        profile = profiles.get(entry.filename)
+        if profile is None or profile.content_hash != entry.content_hash:
+            schedule_profile(entry.filename, entry.content_hash)
+            queued += 1
+    print(f"Queued {queued} candidate profiles")
+    return jsonify({"queued": queued}), 202
+
 @app.route('/get-pdf/<filename>', methods=['GET'])
 def get_pdf(filename):
     try:
@@ -832,13 +2011,40 @@ def get_pdf(filename):
         if not os.path.exists(file_path):
             return jsonify({"error": "File not found"}), 404
             
-        # Send the file with proper headers
-        return send_file(
+        # The content hash is a strong validator that survives copies between hosts
+        entry = CvDocument.query.filter_by(filename=filename).first()
+
+        # Conditional requests get 304 and Range requests 206 partial content
+        response = send_file(
             file_path,
             mimetype='application/pdf',
-            as_attachment=True,
-            download_name=filename
+            as_attachment=request.args.get('inline') != '1',
+            download_name=filename,
+            conditional=True,
+            etag=entry.content_hash if entry else True,
+            max_age=app.config['PDF_CACHE_MAX_AGE']
         )
+        return private_cache(response)
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+@app.route('/get-pdf-thumbnail/<filename>', methods=['GET'])
+def get_pdf_thumbnail(filename):
+    """Serve the cached first-page preview of a CV"""
+    try:
+        filename = secure_filename(filename)
+        pdf_path = os.path.join(app.config['UPLOAD_FOLDER'], filename)
+        thumb_path = thumbnail_cache.get(pdf_path, filename)
+        if not thumb_path:
+            return jsonify({"error": "File not found"}), 404
+
+        response = send_file(
+            thumb_path,
+            mimetype='image/png',
+            conditional=True,
+            max_age=app.config['PDF_CACHE_MAX_AGE']
+        )
+        return private_cache(response)
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
@@ -846,6 +2052,9 @@ def get_pdf(filename):
 @login_required
 def get_chat_history():
     try:
+        # Make sure this user's latest chats have been written before reading
+        history_writer.flush(timeout=2)
+
         # Get user's chat history
         chats = Chat.query.filter_by(user_id=current_user.id).order_by(Chat.created_at.desc()).all()
         
@@ -869,6 +2078,45 @@ def get_chat_history():
         traceback.print_exc()
         return jsonify({"error": str(e)}), 500
 
+@app.route('/chat-history/search', methods=['GET'])
+@login_required
+def search_chat_history():
+    """
+    Full-text search over the current user's chat history.
+
+    Query parameters: ``q`` (search text), ``page`` (1-based) and ``per_page``.
+    Results are ranked by relevance and carry HTML snippets of the job description
+    and the analysis with the matched terms in ``<mark>`` tags.
+    """
+    try:
+        query = request.args.get('q', '').strip()
+        if not query:
+            return jsonify({"error": "Query parameter 'q' is required"}), 400
+        try:
+            page = max(1, int(request.args.get('page', 1)))
+            per_page = int(request.args.get('per_page', 20))
+        except ValueError:
+            return jsonify({"error": "page and per_page must be integers"}), 400
+        per_page = min(max(1, per_page), app.config['CHAT_SEARCH_MAX_PER_PAGE'])
+
+        # Make sure this user's latest chats have been written before searching
+        history_writer.flush(timeout=2)
+
+        found = search_chats(db.session, current_user.id, query,
+                             limit=per_page, offset=(page - 1) * per_page)
+        return jsonify({
+            "query": query,
+            "page": page,
+            "per_page": per_page,
+            "total": found['total'],
+            "results": found['results']
+        })
+    except Exception as e:
+        print(f"Error searching chat history: {str(e)}")
+        import traceback
+        traceback.print_exc()
+        return jsonify({"error": str(e)}), 500
+
 @app.route('/api/check-auth')
 @cross_origin(supports_credentials=True)
 def check_auth():
@@ -894,7 +2142,7 @@ def check_auth():
         # Try to restore session from stored user_id
         user_id = session.get('_user_id') or session.get('user_id')
         if user_id:
-            user = User.query.get(int(user_id))
+            user = load_user(user_id)
             if user:
                 login_user(user, remember=True)
                 session.permanent = True
@@ -957,6 +2205,29 @@ def debug_users():
         'google_id': user.google_id
     } for user in users])
 
+@app.route('/debug/metrics')
+def debug_metrics():
+    """Debug endpoint exposing in-process cache and pipeline counters"""
+    return jsonify({
+        'user_cache': user_cache.stats(),
+        'history_writer': history_writer.stats(),
+        'llm': llm.stats(),
+        'chat_coalescing': chat_coalescer.stats(),
+        'thumbnails': thumbnail_cache.stats(),
+        'jd_cache': jd_cache.stats() if jd_cache is not None else None,
+        'embeddings': get_embedding_stats(),
+        'rasterizer': page_budget.stats(),
+        'admission': {
+            'chat': chat_admission.stats(),
+            'upload': upload_admission.stats(),
+            'screen_batch': screen_batch_admission.stats()
+        },
+        'profiles': dict(
+            db.session.query(CandidateProfile.status, db.func.count(CandidateProfile.id))
+            .group_by(CandidateProfile.status).all()
+        )
+    })
+
 @app.errorhandler(Exception)
 def handle_error(error):
     print(f"Error occurred: {str(error)}")
@@ -988,7 +2259,7 @@ def before_request():
         
     # Restore user session if needed
     if 'user_id' in session and not current_user.is_authenticated:
-        user = User.query.get(session['user_id'])
+        user = load_user(session['user_id'])
         if user:
             login_user(user)
             session.permanent = True
@@ -1105,14 +2376,25 @@ def get_matched_pdfs(chat_id):
         # Get filenames from the chat history
         cv_filenames = chat.cv_filename.split(',') if chat.cv_filename else []
         
+        # One catalog query instead of a filesystem lookup per CV
+        catalog = {
+            entry.filename: entry
+            for entry in CvDocument.query.filter(CvDocument.filename.in_(cv_filenames)).all()
+        } if cv_filenames else {}
+
         pdf_data = []
-        for filename in cv_filenames:
-            file_path = os.path.join(app.config['UPLOAD_FOLDER'], filename)
-            if os.path.exists(file_path):
-                pdf_data.append({
-                    'filename': filename,
-                    'url': url_for('get_pdf', filename=filename, _external=True)
-                })
+        for filename in dict.fromkeys(cv_filenames):
+            entry = catalog.get(filename) or catalog_existing_cv(filename)
+            if entry is None:
+                continue
+            pdf_data.append({
+                'filename': filename,
+                'url': url_for('get_pdf', filename=filename, _external=True),
+                'thumbnail_url': url_for('get_pdf_thumbnail', filename=filename, _external=True),
+                'size': entry.size,
+                'size_formatted': f"{entry.size / 1024:.1f} KB",
+                'pages': entry.page_count
+            })
                 
         return jsonify({
             'pdfs': pdf_data
@@ -1125,12 +2407,11 @@ def get_matched_pdfs(chat_id):
 def convert_pdf_to_base64_images(pdf_path):
     """Convert PDF pages to base64 encoded images"""
     try:
-        # Convert PDF to images
-        images = pdf2image.convert_from_path(pdf_path)
-        
-        # Convert each image to base64
+        # Render and encode one page at a time, so only one decoded page is held
         base64_images = []
-        for img in images:
+        for _, img in iter_pdf_pages(pdf_path, dpi=app.config['RENDER_DPI'],
+                                     grayscale=app.config['RENDER_GRAYSCALE'],
+                                     max_pages=app.config['RENDER_MAX_PAGES']):
             # Convert PIL image to bytes
             img_byte_arr = io.BytesIO()
             img.save(img_byte_arr, format='PNG')
@@ -1145,6 +2426,75 @@ def convert_pdf_to_base64_images(pdf_path):
         print(f"Error converting PDF to images: {str(e)}")
         return None
 
+def analyze_candidate(job_description, cv, index):
+    """Analyze a single matched CV against the job description in its own LLM call"""
+    pdf_path = os.path.join(app.config['UPLOAD_FOLDER'], cv['filename'])
+    if not os.path.exists(pdf_path):
+        raise FileNotFoundError(f"PDF file not found at {pdf_path}")
+
+    base64_images = convert_pdf_to_base64_images(pdf_path)
+    if not base64_images:
+        raise ValueError(f"No images generated from {cv['filename']}")
+
+    print(f"Analyzing candidate {index}: {cv['filename']} ({len(base64_images)} pages)")
+    return llm.complete(
+        messages=build_candidate_messages(job_description, cv, index, base64_images),
+        temperature=0.7,
+        max_tokens=app.config['CHAT_FANOUT_MAX_TOKENS'],
+        timeout=app.config['CHAT_FANOUT_TIMEOUT']
+    )
+
+def analyze_candidates_fanout(job_description, matched_cvs):
+    """
+    Analyze each matched candidate in a concurrent LLM request, then rank them.
+
+    Wall-clock latency is roughly that of the slowest single CV plus a short
+    text-only ranking call, instead of one call carrying every CV's pages.
+    """
+    # Several chunks of the same CV can match; analyze each candidate once
+    candidates = dedupe_candidates(matched_cvs)
+
+    workers = max(1, min(app.config['CHAT_FANOUT_CONCURRENCY'], len(candidates)))
+    print(f"Fanning out analysis of {len(candidates)} candidates over {workers} workers")
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        futures = [
+            executor.submit(analyze_candidate, job_description, cv, i + 1)
+            for i, cv in enumerate(candidates)
+        ]
+
+        analyses = []
+        unavailable = []
+        for cv, future in zip(candidates, futures):
+            try:
+                analyses.append((cv, future.result()))
+            except LLMUnavailableError as e:
+                print(f"Analysis unavailable for {cv['filename']}: {str(e)}")
+                unavailable.append(e)
+                analyses.append((cv, f"Analysis unavailable: {str(e)}"))
+            except Exception as e:
+                print(f"Analysis failed for {cv['filename']}: {str(e)}")
+                analyses.append((cv, f"Analysis unavailable: {str(e)}"))
+
+    # Nothing useful to rank if the LLM could not be reached for any candidate
+    if len(unavailable) == len(candidates):
+        raise unavailable[0]
+
+    sections = format_candidate_sections(analyses)
+
+    print("Ranking candidates...")
+    try:
+        ranking = llm.complete(
+            messages=build_ranking_messages(job_description, sections),
+            temperature=0.3,
+            max_tokens=600,
+            timeout=app.config['CHAT_FANOUT_TIMEOUT']
+        )
+    except Exception as e:
+        print(f"Ranking call failed: {str(e)}")
+        ranking = RANKING_FALLBACK
+
+    return combine_fanout_report(sections, ranking)
+
 @app.route('/check-session', methods=['GET', 'OPTIONS'])
 @cross_origin(supports_credentials=True)
 def check_session():
@@ -1177,7 +2527,3 @@ def check_session():
     except Exception as e:
         print(f"Error checking session: {str(e)}")
         return jsonify({"error": str(e)}), 500
-
-if __name__ == '__main__':
-    print("\nStarting Flask application...")
-    app.run(host='0.0.0.0', port=5000, debug=True)
\ No newline at end of file
@@ -0,0 +1,218 @@
+"""
+Prompt Construction Module
+
+This module builds the chat messages sent to the LLM for every screening and chat
+flow. Keeping the prompts in one place lets the synchronous Flask handlers and the
+asynchronous ASGI pipeline send exactly the same requests.
+
+Key components:
+- Prompts: System prompts for combined, per-candidate, ranking, suggestion and advice calls,
+  and for extracting and analyzing compact candidate profiles
+- Message builders: Functions returning OpenAI-format message lists
+- Fan-out helpers: Candidate de-duplication and report assembly for per-candidate analysis
+"""
+
+CV_ANALYSIS_PROMPT = """You are an expert HR assistant specializing in CV analysis and job matching.
+Analyze the provided CV images along with the job description, and provide:
+1. Overall Match Score (1-10)
+2. Key Strengths that align with the job requirements
+3. Potential Gaps or areas for improvement
+4. Specific skills and experiences that make the candidate suitable
+5. Brief hiring recommendation
+
+Format your response clearly for each CV, and conclude with a ranked comparison of all candidates."""
+
+CANDIDATE_ANALYSIS_PROMPT = """You are an expert HR assistant specializing in CV analysis and job matching.
+Analyze the provided CV images of a single candidate against the job description, and provide:
+1. Overall Match Score (1-10)
+2. Key Strengths that align with the job requirements
+3. Potential Gaps or areas for improvement
+4. Specific skills and experiences that make the candidate suitable
+5. Brief hiring recommendation
+
+Be concise and start your answer with the line "Match Score: <score>/10"."""
+
+CANDIDATE_PROFILE_PROMPT = """You are an expert HR assistant. Read the provided CV images and write a
+compact, factual profile of the candidate in plain text with exactly these lines:
+Name:
+Current Role:
+Years of Experience:
+Skills: (comma-separated)
+Experience: (one line per role: title, company, dates, one key achievement)
+Education:
+Certifications:
+Languages:
+Location:
+Write "Unknown" for missing information. Do not evaluate the candidate and keep the profile under 250 words."""
+
+PROFILE_ANALYSIS_PROMPT = """You are an expert HR assistant specializing in CV analysis and job matching.
+Analyze the provided candidate profiles (and CV images for candidates without a profile) along with
+the job description, and provide:
+1. Overall Match Score (1-10)
+2. Key Strengths that align with the job requirements
+3. Potential Gaps or areas for improvement
+4. Specific skills and experiences that make the candidate suitable
+5. Brief hiring recommendation
+
+Format your response clearly for each CV, and conclude with a ranked comparison of all candidates."""
+
+CANDIDATE_RANKING_PROMPT = """You are an expert HR assistant. You are given a job description and
+independent analyses of several candidates. Produce a ranked comparison of all candidates,
+best first, with one or two sentences justifying each position. Do not repeat the full analyses."""
+
+SUGGESTION_PROMPT = "You are an expert HR assistant."
+
+CAREER_ADVICE_PROMPT = ("You are an expert HR assistant who specializes in career advice, "
+                        "resume writing, interview preparation, and professional development. "
+                        "Provide clear, practical, and actionable advice.")
+
+RANKING_FALLBACK = "Ranking unavailable; candidates are listed by relevance score."
+
+
+def image_parts(base64_images):
+    """Turn base64 data URLs into image content parts"""
+    return [{
+        "type": "image_url",
+        "image_url": {"url": img_url}
+    } for img_url in base64_images]
+
+
+def build_analysis_messages(job_description, rendered_cvs):
+    """
+    Build the combined multimodal request analyzing every matched CV at once.
+
+    Args:
+        job_description (str): The job description text.
+        rendered_cvs (list): ``(index, cv, base64_images)`` tuples for each CV that
+                             could be rendered.
+
+    Returns:
+        list: Chat messages in OpenAI format.
+    """
+    content = [{
+        "type": "text",
+        "text": f"Job Description:\n{job_description}\n\nPlease analyze the following CVs:"
+    }]
+    for index, cv, base64_images in rendered_cvs:
+        content.append({
+            "type": "text",
+            "text": f"\nCV {index}: {cv['filename']} (Relevance Score: {cv['relevance_score']:.2f})"
+        })
+        content.extend(image_parts(base64_images))
+    return [
+        {"role": "system", "content": CV_ANALYSIS_PROMPT},
+        {"role": "user", "content": content}
+    ]
+
+
+def build_candidate_messages(job_description, cv, index, base64_images):
+    """Build the request analyzing a single candidate in fan-out mode"""
+    return [
+        {"role": "system", "content": CANDIDATE_ANALYSIS_PROMPT},
+        {"role": "user", "content": [
+            {
+                "type": "text",
+                "text": f"Job Description:\n{job_description}\n\n"
+                        f"CV {index}: {cv['filename']} (Relevance Score: {cv['relevance_score']:.2f})"
+            },
+            *image_parts(base64_images)
+        ]}
+    ]
+
+
+def build_profile_messages(filename, base64_images):
+    """Build the ingestion-time request turning a CV's page images into a text profile"""
+    return [
+        {"role": "system", "content": CANDIDATE_PROFILE_PROMPT},
+        {"role": "user", "content": [
+            {"type": "text", "text": f"CV: {filename}"},
+            *image_parts(base64_images)
+        ]}
+    ]
+
+
+def build_profile_analysis_messages(job_description, profiled_cvs, rendered_cvs):
+    """
+    Build the combined request analyzing matched CVs from their stored profiles.
+
+    Args:
+        job_description (str): The job description text.
+        profiled_cvs (list): ``(index, cv, profile)`` tuples for CVs with a profile.
+        rendered_cvs (list): ``(index, cv, base64_images)`` tuples for CVs without
+                             one, sent as page images instead.
+
+    Returns:
+        list: Chat messages in OpenAI format.
+    """
+    content = [{
+        "type": "text",
+        "text": f"Job Description:\n{job_description}\n\nPlease analyze the following CVs:"
+    }]
+    for index, cv, profile in profiled_cvs:
+        content.append({
+            "type": "text",
+            "text": f"\nCV {index}: {cv['filename']} (Relevance Score: {cv['relevance_score']:.2f})\n{profile}"
+        })
+    for index, cv, base64_images in rendered_cvs:
+        content.append({
+            "type": "text",
+            "text": f"\nCV {index}: {cv['filename']} (Relevance Score: {cv['relevance_score']:.2f})"
+        })
+        content.extend(image_parts(base64_images))
+    return [
+        {"role": "system", "content": PROFILE_ANALYSIS_PROMPT},
+        {"role": "user", "content": content}
+    ]
+
+
+def build_ranking_messages(job_description, sections):
+    """Build the text-only request ranking independently analyzed candidates"""
+    return [
+        {"role": "system", "content": CANDIDATE_RANKING_PROMPT},
+        {"role": "user", "content": f"Job Description:\n{job_description}\n\n" + "\n\n".join(sections)}
+    ]
+
+
+def build_suggestion_messages(job_description):
+    """Build the request suggesting candidate profiles when no CV matched"""
+    return [
+        {"role": "system", "content": SUGGESTION_PROMPT},
+        {"role": "user", "content": [
+            {
+                "type": "text",
+                "text": f"I could not find any CVs that match the following job description. "
+                       f"Please suggest what kind of candidates I should look for:\n\n{job_description}"
+            }
+        ]}
+    ]
+
+
+def build_advice_messages(message):
+    """Build the request for a regular (non job description) chat message"""
+    return [
+        {"role": "system", "content": CAREER_ADVICE_PROMPT},
+        {"role": "user", "content": [{"type": "text", "text": message}]}
+    ]
+
+
+def dedupe_candidates(matched_cvs):
+    """Keep the best-scoring chunk per CV, ordered from most to least relevant"""
+    candidates = {}
+    for cv in matched_cvs:
+        best = candidates.get(cv['filename'])
+        if best is None or cv['relevance_score'] < best['relevance_score']:
+            candidates[cv['filename']] = cv
+    return sorted(candidates.values(), key=lambda cv: cv['relevance_score'])
+
+
+def format_candidate_sections(analyses):
+    """Format ``(cv, analysis)`` pairs as numbered report sections"""
+    return [
+        f"### CV {i + 1}: {cv['filename']} (Relevance Score: {cv['relevance_score']:.2f})\n\n{analysis}"
+        for i, (cv, analysis) in enumerate(analyses)
+    ]
+
+
+def combine_fanout_report(sections, ranking):
+    """Join per-candidate sections and the final ranking into one response"""
+    return "\n\n".join(sections) + "\n\n### Ranked Comparison\n\n" + ranking
@@ -0,0 +1,157 @@
+"""
+PDF Rasterization Module
+
+This module renders PDF pages to images one page at a time. Converting a whole PDF
+at once materializes every page as a full-resolution image, so a 30-page portfolio
+can add hundreds of MB to a worker for a single request. Here, each page is rendered
+by its own poppler call at the requested resolution and color mode, handed to the
+caller and released before the next one is rendered.
+
+Rendering is capped per document by ``max_pages`` and per process by a memory
+budget. Every page reserves its estimated decoded size before it is rendered, so
+concurrent requests wait instead of exhausting memory together.
+
+Key components:
+- MemoryBudget: Process-wide cap on the decoded page images held at once
+- estimate_page_bytes: Decoded size of a page at a resolution and color mode
+- iter_pdf_pages: Generator yielding ``(page_number, image)`` one page at a time
+"""
+
+import os
+import re
+import threading
+from contextlib import contextmanager
+import pdf2image
+
+# Decoded page images all threads of this process may hold at the same time
+RASTER_MEMORY_BUDGET = int(os.getenv('RASTER_MEMORY_MB', '256')) * 1024 * 1024
+# Page size assumed when poppler does not report one (US letter, in points)
+DEFAULT_PAGE_SIZE = (612.0, 792.0)
+
+_PAGE_SIZE_PATTERN = re.compile(r'([\d.]+)\s*x\s*([\d.]+)')
+
+
+class MemoryBudget:
+    """
+    Byte budget shared by all threads rendering pages in a process.
+
+    Args:
+        limit (int): Bytes of decoded page images allowed at once.
+    """
+
+    def __init__(self, limit):
+        self.limit = limit
+        self.used = 0
+        self.peak = 0
+        self.waits = 0
+        self._condition = threading.Condition()
+
+    @contextmanager
+    def reserve(self, nbytes):
+        """Hold ``nbytes`` of the budget, waiting until they are available"""
+        # A page larger than the whole budget still renders, but only on its own
+        nbytes = min(nbytes, self.limit)
+        with self._condition:
+            if self.used + nbytes > self.limit:
+                self.waits += 1
+            while self.used + nbytes > self.limit:
+                self._condition.wait()
+            self.used += nbytes
+            self.peak = max(self.peak, self.used)
+        try:
+            yield
+        finally:
+            with self._condition:
+                self.used -= nbytes
+                self._condition.notify_all()
+
+    def stats(self):
+        with self._condition:
+            return {
+                'limit_bytes': self.limit,
+                'used_bytes': self.used,
+                'peak_bytes': self.peak,
+                'waits': self.waits
+            }
+
+
+page_budget = MemoryBudget(RASTER_MEMORY_BUDGET)
+
+
+def estimate_page_bytes(page_size, dpi, grayscale=False, size=None):
+    """
+    Estimate the decoded size of a rendered page.
+
+    Args:
+        page_size (tuple): Page width and height in points.
+        dpi (int): Rendering resolution.
+        grayscale (bool): One channel instead of three.
+        size (tuple): Target ``(width, height)`` in pixels, either may be None,
+                      overriding ``dpi`` as in ``pdf2image``.
+
+    Returns:
+        int: Estimated bytes of the decoded image
+    """
+    width_pts, height_pts = page_size
+    if size and size[0]:
+        width = size[0]
+        height = size[1] or width * height_pts / width_pts
+    elif size and size[1]:
+        height = size[1]
+        width = height * width_pts / height_pts
+    else:
+        width = width_pts * dpi / 72.0
+        height = height_pts * dpi / 72.0
+    return int(width * height * (1 if grayscale else 3))
+
+
+def _page_size(info):
+    match = _PAGE_SIZE_PATTERN.search(str(info.get('Page size', '')))
+    if not match:
+        return DEFAULT_PAGE_SIZE
+    return float(match.group(1)), float(match.group(2))
+
+
+def iter_pdf_pages(pdf_path, dpi=150, grayscale=False, max_pages=None, size=None, budget=None):
+    """
+    Render a PDF one page at a time.
+
+    Each page is closed once the caller asks for the next one, so at most one page
+    of the document is held in memory.
+
+    Args:
+        pdf_path (str): Path to the PDF.
+        dpi (int): Rendering resolution.
+        grayscale (bool): Render single-channel images.
+        max_pages (int): Render at most this many leading pages; None renders all.
+        size (tuple): Target ``(width, height)`` in pixels, passed to ``pdf2image``.
+        budget (MemoryBudget): Budget to reserve page memory from. Defaults to the
+                               process-wide budget.
+
+    Yields:
+        tuple: ``(page_number, image)`` with 1-based page numbers
+    """
+    budget = budget or page_budget
+    info = pdf2image.pdfinfo_from_path(pdf_path)
+    page_count = int(info.get('Pages', 0))
+    last_page = min(page_count, max_pages) if max_pages else page_count
+    if last_page < page_count:
+        print(f"Rasterizing the first {last_page} of {page_count} pages of {os.path.basename(pdf_path)}")
+    estimate = estimate_page_bytes(_page_size(info), dpi, grayscale, size)
+
+    for page_number in range(1, last_page + 1):
+        with budget.reserve(estimate):
+            images = pdf2image.convert_from_path(
+                pdf_path,
+                dpi=dpi,
+                first_page=page_number,
+                last_page=page_number,
+                grayscale=grayscale,
+                size=size
+            )
+            if not images:
+                continue
+            try:
+                yield page_number, images[0]
+            finally:
+                images[0].close()
@@ -0,0 +1,265 @@
+"""
+Bulk Re-indexing Tool
+
+This module rebuilds the CV vector database from the PDFs in the uploads folder, for
+example after a chunking change or a restore from backup. Text extraction runs across
+a process pool, chunks from many CVs are embedded together in large batches, and the
+result is written to a fresh collection that only replaces the active one once the
+rebuild is complete. Progress is checkpointed, so an interrupted run resumes where it
+stopped.
+
+Run from the server directory:
+    python reindex.py [--workers 8] [--batch-size 512] [--restart]
+
+Key components:
+- extract_cv: Worker function turning one PDF into chunk texts and metadata
+- Reindexer: Drives extraction, batched embedding, checkpointing and the final swap
+"""
+
+import os
+import sys
+import json
+import time
+import hashlib
+import argparse
+from concurrent.futures import ProcessPoolExecutor
+
+from document_processor import (
+    load_cv, get_client, get_embedding_model, get_active_collection, set_active_collection,
+    get_summary_collection, get_index_settings, pool_embeddings, index_write_lock, bump_corpus_version,
+    SUMMARY_COLLECTION_SUFFIX
+)
+
+CHECKPOINT_FILE = "reindex.checkpoint.json"
+
+
+def file_signature(path):
+    """Size and modification time identifying one version of a file"""
+    stat = os.stat(path)
+    return [stat.st_size, stat.st_mtime_ns]
+
+
+def extract_cv(path):
+    """
+    Extract the chunks of one CV in a worker process.
+
+    Returns:
+        tuple: ``(filename, signature, chunks, error)`` where ``chunks`` is a list of
+               ``(id, text, metadata)`` tuples with ids derived from the filename and
+               content hash
+    """
+    filename = os.path.basename(path)
+    try:
+        signature = file_signature(path)
+        digest = hashlib.sha256()
+        with open(path, 'rb') as f:
+            for block in iter(lambda: f.read(1024 * 1024), b''):
+                digest.update(block)
+        content_hash = digest.hexdigest()
+
+        chunks = []
+        for i, doc in enumerate(load_cv(path)):
+            doc.metadata['content_hash'] = content_hash
+            # Deterministic ids make re-adding a CV after a crash an idempotent upsert; the
+            # filename keeps identical files stored under different names apart
+            chunks.append((f"{filename}:{content_hash}:{i}", doc.page_content, doc.metadata))
+        return filename, signature, chunks, None
+    except Exception as e:
+        return filename, None, [], str(e)
+
+
+class Reindexer:
+    """
+    Rebuild the vector database into a fresh collection.
+
+    Args:
+        uploads_dir (str): Folder holding the CV PDFs.
+        db_path (str): Directory of the vector database.
+        workers (int): Number of text extraction processes.
+        batch_size (int): Number of chunks embedded and written per batch.
+    """
+
+    def __init__(self, uploads_dir, db_path, workers, batch_size):
+        self.uploads_dir = uploads_dir
+        self.db_path = db_path
+        self.workers = workers
+        self.batch_size = batch_size
+        self.checkpoint_path = os.path.join(db_path, CHECKPOINT_FILE)
+        self.checkpoint = None
+        self.collection = None
+        self.summaries = None
+        self.failed = {}
+
+    def list_pdfs(self):
+        return sorted(
+            name for name in os.listdir(self.uploads_dir)
+            if name.lower().endswith('.pdf') and not name.startswith('.')
+        )
+
+    def load_checkpoint(self, restart):
+        """Resume the previous unfinished run unless a restart was requested"""
+        client = get_client(self.db_path)
+        previous = None
+        if os.path.exists(self.checkpoint_path):
+            with open(self.checkpoint_path) as f:
+                previous = json.load(f)
+
+        if previous and not restart:
+            self.checkpoint = previous
+            print(f"Resuming into collection {self.checkpoint['collection']} "
+                  f"with {len(self.checkpoint['files'])} CVs already indexed")
+        else:
+            if previous:
+                # Drop the half-built collections of the abandoned run
+                for name in (previous['collection'], previous['collection'] + SUMMARY_COLLECTION_SUFFIX):
+                    try:
+                        client.delete_collection(name)
+                    except ValueError:
+                        pass
+            self.checkpoint = {
+                'collection': f"reindex_{time.strftime('%Y%m%d%H%M%S')}",
+                'started_at': time.time(),
+                'files': {}
+            }
+
+        try:
+            self.collection = client.get_collection(self.checkpoint['collection'])
+        except ValueError:
+            # The rebuilt collection is created with the configured index parameters
+            self.collection = client.create_collection(
+                self.checkpoint['collection'], metadata=get_index_settings()
+            )
+        self.summaries = get_summary_collection(client, self.collection)
+        self.save_checkpoint()
+
+    def save_checkpoint(self):
+        tmp_path = f"{self.checkpoint_path}.tmp"
+        with open(tmp_path, 'w') as f:
+            json.dump(self.checkpoint, f)
+        os.replace(tmp_path, self.checkpoint_path)
+
+    def pending_files(self):
+        """PDFs that are new or changed since they were checkpointed"""
+        pending = []
+        for name in self.list_pdfs():
+            done = self.checkpoint['files'].get(name)
+            if done is None or done != file_signature(os.path.join(self.uploads_dir, name)):
+                pending.append(name)
+        return pending
+
+    def write_batch(self, batch):
+        """Embed the chunks of several CVs in one call and store them"""
+        ids, texts, metadatas = [], [], []
+        for _, _, chunks in batch:
+            for chunk_id, text, metadata in chunks:
+                ids.append(chunk_id)
+                texts.append(text)
+                metadatas.append(metadata)
+
+        if ids:
+            embeddings = get_embedding_model().embed_documents(texts)
+            for filename, _, _ in batch:
+                # A changed CV's chunks from a previous run must not survive
+                self.collection.delete(where={'filename': filename})
+            self.collection.upsert(ids=ids, embeddings=embeddings, documents=texts, metadatas=metadatas)
+
+            # One pooled summary vector per CV for two-stage retrieval
+            summary_ids, summary_vectors, summary_metadatas = [], [], []
+            start = 0
+            for filename, _, chunks in batch:
+                if chunks:
+                    summary_ids.append(filename)
+                    summary_vectors.append(pool_embeddings(embeddings[start:start + len(chunks)]))
+                    summary_metadatas.append({'filename': filename, 'chunks': len(chunks)})
+                start += len(chunks)
+            self.summaries.upsert(ids=summary_ids, embeddings=summary_vectors, metadatas=summary_metadatas)
+
+        for filename, signature, _ in batch:
+            self.checkpoint['files'][filename] = signature
+        self.save_checkpoint()
+        return len(ids)
+
+    def index_files(self, names):
+        """Extract, embed and store the given CVs, reporting throughput"""
+        total = len(names)
+        if not total:
+            return
+        started = time.monotonic()
+        done = chunks_written = 0
+        batch, batch_chunks = [], 0
+
+        paths = [os.path.join(self.uploads_dir, name) for name in names]
+        with ProcessPoolExecutor(max_workers=self.workers) as executor:
+            for filename, signature, chunks, error in executor.map(extract_cv, paths, chunksize=4):
+                done += 1
+                if error:
+                    print(f"Skipping {filename}: {error}")
+                    self.failed[filename] = error
+                else:
+                    batch.append((filename, signature, chunks))
+                    batch_chunks += len(chunks)
+
+                if batch_chunks >= self.batch_size or done == total:
+                    chunks_written += self.write_batch(batch)
+                    batch, batch_chunks = [], 0
+
+                    elapsed = time.monotonic() - started
+                    rate = done / elapsed if elapsed else 0.0
+                    eta = (total - done) / rate if rate else 0.0
+                    print(f"[{done}/{total}] {rate:.1f} docs/s, {chunks_written} chunks, "
+                          f"ETA {time.strftime('%H:%M:%S', time.gmtime(eta))}")
+
+    def swap(self):
+        """Catch up with uploads and deletions made during the run, then activate the new collection"""
+        with index_write_lock(self.db_path):
+            present = set(self.list_pdfs())
+            for filename in list(self.checkpoint['files']):
+                if filename not in present:
+                    self.collection.delete(where={'filename': filename})
+                    self.summaries.delete(ids=[filename])
+                    del self.checkpoint['files'][filename]
+            self.index_files([name for name in self.pending_files() if name not in self.failed])
+
+            client = get_client(self.db_path)
+            old_name = get_active_collection(self.db_path)
+            set_active_collection(self.db_path, self.collection.name)
+            if old_name != self.collection.name:
+                for name in (old_name, old_name + SUMMARY_COLLECTION_SUFFIX):
+                    try:
+                        client.delete_collection(name)
+                    except ValueError:
+                        pass
+        bump_corpus_version(self.db_path)
+        os.unlink(self.checkpoint_path)
+        print(f"Activated collection {self.collection.name} with {self.collection.count()} chunks")
+
+    def run(self, restart=False):
+        os.makedirs(self.db_path, exist_ok=True)
+        self.load_checkpoint(restart)
+        pending = self.pending_files()
+        print(f"{len(pending)} of {len(self.list_pdfs())} CVs to index with {self.workers} workers")
+        self.index_files(pending)
+        self.swap()
+        if self.failed:
+            print(f"{len(self.failed)} CVs could not be indexed: {', '.join(sorted(self.failed))}")
+        return not self.failed
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Rebuild the CV vector database from the uploads folder")
+    parser.add_argument('--uploads', default='uploads', help="Folder holding the CV PDFs")
+    parser.add_argument('--db', default='chroma_db', help="Vector database directory")
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 4,
+                        help="Number of text extraction processes")
+    parser.add_argument('--batch-size', type=int, default=512,
+                        help="Number of chunks embedded per batch")
+    parser.add_argument('--restart', action='store_true',
+                        help="Discard the checkpoint of an interrupted run and start over")
+    args = parser.parse_args(argv)
+
+    reindexer = Reindexer(args.uploads, args.db, args.workers, args.batch_size)
+    return 0 if reindexer.run(restart=args.restart) else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
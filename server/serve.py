@@ -0,0 +1,26 @@
+"""
+Development Server
+
+This module runs the Flask application on its built-in development server. The
+application is imported rather than executed as the ``__main__`` script: the spawned
+worker processes of the bulk ingestion pool re-run the parent's ``__main__`` script
+before their first task, and this one does nothing when it is not the main program,
+so the workers never set up the application (database tables, session backend,
+background writers) again.
+
+Run from the server directory:
+    python serve.py
+
+Key components:
+- main: Import the application and serve it on port 5000
+"""
+
+
+def main():
+    from main import app
+    print("\nStarting Flask application...")
+    app.run(host='0.0.0.0', port=5000, debug=True)
+
+
+if __name__ == '__main__':
+    main()
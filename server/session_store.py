@@ -0,0 +1,245 @@
+"""
+Session Storage Module
+
+This module provides pluggable server-side session backends for the Flask application.
+It replaces the filesystem Flask-Session store, which reads and rewrites one file per
+request and evicts sessions in bulk once its file threshold is reached.
+
+Key components:
+- SqliteSessionInterface: Sessions stored in a single SQLite database in WAL mode.
+  A row is only written when the session payload actually changes (or when its expiry
+  is due for a refresh), and expired rows are removed in batched background sweeps.
+  The database file can be shared by every worker process on a host.
+- Cookie mode: Flask's signed-cookie sessions, for multi-node deployments where the
+  small authentication payload can travel with the client.
+- Filesystem mode: The legacy Flask-Session store, kept for backwards compatibility.
+"""
+
+import os
+import time
+import secrets
+import sqlite3
+import threading
+from flask.sessions import SessionInterface, SessionMixin, SecureCookieSessionInterface
+from flask.json.tag import TaggedJSONSerializer
+from itsdangerous import Signer, BadSignature
+from werkzeug.datastructures import CallbackDict
+from db_utils import configure_sqlite_connection
+
+SESSION_BACKENDS = ('sqlite', 'cookie', 'filesystem')
+
+
+class SqliteSession(CallbackDict, SessionMixin):
+    """Server-side session whose payload lives in SQLite under a random session id."""
+
+    def __init__(self, initial=None, sid=None, new=False, expiry=None, payload=None):
+        def on_update(self):
+            self.modified = True
+
+        CallbackDict.__init__(self, initial, on_update)
+        self.sid = sid
+        self.new = new
+        self.expiry = expiry
+        # Serialized payload as loaded from the store, used to skip no-op writes
+        self.payload = payload
+        self.modified = False
+
+
+class SqliteSessionInterface(SessionInterface):
+    """
+    Store sessions in a SQLite database shared by all worker processes.
+
+    The cookie only carries a signed session id. Writes happen when the serialized
+    session differs from what was loaded, or when less than ``refresh_fraction`` of the
+    session lifetime remains, so read-only requests never touch the database file.
+
+    Args:
+        db_path (str): Path to the SQLite session database.
+        sweep_interval (int): Minimum number of seconds between expiry sweeps.
+        sweep_batch (int): Maximum number of expired rows deleted per sweep statement.
+        refresh_fraction (float): Remaining-lifetime fraction below which the expiry
+                                  of an unchanged session is extended.
+    """
+
+    serializer = TaggedJSONSerializer()
+    session_class = SqliteSession
+    salt = 'sqlite-session'
+
+    def __init__(self, db_path, sweep_interval=300, sweep_batch=500, refresh_fraction=0.5):
+        self.db_path = db_path
+        self.sweep_interval = sweep_interval
+        self.sweep_batch = sweep_batch
+        self.refresh_fraction = refresh_fraction
+        self._local = threading.local()
+        self._sweep_lock = threading.Lock()
+        self._last_sweep = 0.0
+
+        directory = os.path.dirname(os.path.abspath(db_path))
+        os.makedirs(directory, exist_ok=True)
+        conn = self._connect()
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS sessions ("
+            " sid TEXT PRIMARY KEY,"
+            " data TEXT NOT NULL,"
+            " expiry REAL NOT NULL)"
+        )
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_sessions_expiry ON sessions (expiry)")
+        conn.commit()
+
+    def _connect(self):
+        """Return this thread's connection, opening it in WAL mode on first use."""
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = configure_sqlite_connection(sqlite3.connect(self.db_path, timeout=10))
+            self._local.conn = conn
+        return conn
+
+    def _get_signer(self, app):
+        if not app.secret_key:
+            return None
+        return Signer(app.secret_key, salt=self.salt, key_derivation='hmac')
+
+    def _new_session(self):
+        return self.session_class(sid=secrets.token_urlsafe(32), new=True)
+
+    def open_session(self, app, request):
+        signer = self._get_signer(app)
+        if signer is None:
+            return None
+
+        cookie = request.cookies.get(self.get_cookie_name(app))
+        if not cookie:
+            return self._new_session()
+
+        try:
+            sid = signer.unsign(cookie).decode('utf-8')
+        except BadSignature:
+            return self._new_session()
+
+        row = self._connect().execute(
+            "SELECT data, expiry FROM sessions WHERE sid = ?", (sid,)
+        ).fetchone()
+        if row is None or row[1] < time.time():
+            return self._new_session()
+
+        try:
+            data = self.serializer.loads(row[0])
+        except Exception as e:
+            print(f"Discarding unreadable session {sid[:8]}...: {str(e)}")
+            return self._new_session()
+        return self.session_class(data, sid=sid, expiry=row[1], payload=row[0])
+
+    def save_session(self, app, session, response):
+        name = self.get_cookie_name(app)
+        domain = self.get_cookie_domain(app)
+        path = self.get_cookie_path(app)
+        secure = self.get_cookie_secure(app)
+        samesite = self.get_cookie_samesite(app)
+        httponly = self.get_cookie_httponly(app)
+
+        conn = self._connect()
+        now = time.time()
+
+        # Emptied sessions are removed from the store and the client
+        if not session:
+            if not session.new and session.modified:
+                conn.execute("DELETE FROM sessions WHERE sid = ?", (session.sid,))
+                conn.commit()
+                response.delete_cookie(
+                    name, domain=domain, path=path, secure=secure, samesite=samesite, httponly=httponly
+                )
+            return
+
+        payload = self.serializer.dumps(dict(session))
+        lifetime = app.permanent_session_lifetime.total_seconds()
+        changed = payload != session.payload
+        refresh_due = (
+            session.expiry is not None
+            and session.expiry - now < lifetime * self.refresh_fraction
+        )
+        if not changed and not refresh_due:
+            return
+
+        expiry = now + lifetime
+        if changed:
+            conn.execute(
+                "INSERT INTO sessions (sid, data, expiry) VALUES (?, ?, ?) "
+                "ON CONFLICT(sid) DO UPDATE SET data = excluded.data, expiry = excluded.expiry",
+                (session.sid, payload, expiry)
+            )
+        else:
+            conn.execute("UPDATE sessions SET expiry = ? WHERE sid = ?", (expiry, session.sid))
+        conn.commit()
+
+        response.set_cookie(
+            name,
+            self._get_signer(app).sign(session.sid.encode('utf-8')).decode('utf-8'),
+            expires=self.get_expiration_time(app, session),
+            httponly=httponly,
+            domain=domain,
+            path=path,
+            secure=secure,
+            samesite=samesite
+        )
+        self._maybe_sweep(now)
+
+    def _maybe_sweep(self, now):
+        """Delete expired sessions in batches, at most once per sweep interval per process."""
+        if now - self._last_sweep < self.sweep_interval:
+            return
+        if not self._sweep_lock.acquire(blocking=False):
+            return
+        try:
+            self._last_sweep = now
+            conn = self._connect()
+            removed = 0
+            while True:
+                cursor = conn.execute(
+                    "DELETE FROM sessions WHERE rowid IN "
+                    "(SELECT rowid FROM sessions WHERE expiry < ? LIMIT ?)",
+                    (now, self.sweep_batch)
+                )
+                conn.commit()
+                removed += cursor.rowcount
+                if cursor.rowcount < self.sweep_batch:
+                    break
+            if removed:
+                print(f"Session sweep removed {removed} expired sessions")
+        except sqlite3.Error as e:
+            print(f"Session sweep failed: {str(e)}")
+        finally:
+            self._sweep_lock.release()
+
+
+def init_session_backend(app):
+    """
+    Install the session backend selected by ``SESSION_BACKEND`` on the application.
+
+    Args:
+        app (Flask): The application to configure. Reads ``SESSION_BACKEND``
+                     (one of 'sqlite', 'cookie' or 'filesystem'), ``SESSION_DB_PATH``
+                     and ``SESSION_SWEEP_INTERVAL`` from its config.
+
+    Returns:
+        SessionInterface: The installed session interface.
+
+    Raises:
+        ValueError: If the configured backend is unknown
+    """
+    backend = app.config.get('SESSION_BACKEND', 'sqlite')
+    if backend not in SESSION_BACKENDS:
+        raise ValueError(f"Unknown SESSION_BACKEND '{backend}', expected one of {SESSION_BACKENDS}")
+
+    if backend == 'sqlite':
+        app.session_interface = SqliteSessionInterface(
+            app.config['SESSION_DB_PATH'],
+            sweep_interval=app.config.get('SESSION_SWEEP_INTERVAL', 300)
+        )
+    elif backend == 'cookie':
+        app.session_interface = SecureCookieSessionInterface()
+    else:
+        from flask_session import Session
+        Session(app)
+
+    print(f"Session backend: {backend}")
+    return app.session_interface
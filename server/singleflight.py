@@ -0,0 +1,227 @@
+"""
+Single-Flight Module
+
+This module coalesces concurrent identical requests so that only one of them runs an
+expensive pipeline while the others wait for, and share, its result.
+
+Key components:
+- SingleFlight: In-process coalescing keyed by an arbitrary string. With a result
+  directory configured it also coalesces across worker processes on the same host,
+  using a per-key file lock and a small on-disk result store.
+- AsyncSingleFlight: The in-process variant for coroutines on one event loop
+"""
+
+import os
+import json
+import time
+import fcntl
+import asyncio
+import hashlib
+import threading
+
+
+class _Call:
+    """A pipeline execution that other requests with the same key can wait on."""
+
+    def __init__(self):
+        self.event = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class SingleFlight:
+    """
+    Coalesce concurrent calls that share a key into one execution.
+
+    Results are only shared with requests that were waiting while the execution was
+    in flight; this is request coalescing, not a result cache.
+
+    Args:
+        result_dir (str): Directory for cross-process locks and results, or None to
+                          coalesce within this process only. Results must be
+                          JSON-serializable when set.
+        lock_timeout (float): Seconds a process waits for another process's execution
+                              before running the pipeline itself.
+        retention (float): Seconds stale lock and result files are kept on disk.
+    """
+
+    def __init__(self, result_dir=None, lock_timeout=300, retention=3600):
+        self.result_dir = result_dir
+        self.lock_timeout = lock_timeout
+        self.retention = retention
+        self._calls = {}
+        self._lock = threading.Lock()
+        self._last_prune = 0.0
+        self.executions = 0
+        self.coalesced = 0
+        self.coalesced_cross_process = 0
+        if result_dir:
+            os.makedirs(result_dir, exist_ok=True)
+
+    def do(self, key, fn):
+        """
+        Run ``fn`` once for all concurrent callers using ``key``.
+
+        Args:
+            key (str): Identity of the work, e.g. a normalized request.
+            fn (callable): Zero-argument function producing the result.
+
+        Returns:
+            tuple: ``(result, shared)`` where ``shared`` is True if the result came
+                   from another caller's execution.
+
+        Raises:
+            Exception: Whatever ``fn`` raised, re-raised in every waiting caller
+        """
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+
+        if not leader:
+            call.event.wait()
+            with self._lock:
+                self.coalesced += 1
+            if call.error is not None:
+                raise call.error
+            return call.result, True
+
+        try:
+            if self.result_dir:
+                call.result, shared = self._do_shared(key, fn)
+            else:
+                with self._lock:
+                    self.executions += 1
+                call.result, shared = fn(), False
+            return call.result, shared
+        except Exception as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                self._calls.pop(key, None)
+            call.event.set()
+
+    def _do_shared(self, key, fn):
+        """Coalesce with other processes through a per-key file lock and result file."""
+        digest = hashlib.sha256(key.encode('utf-8')).hexdigest()
+        lock_path = os.path.join(self.result_dir, f"{digest}.lock")
+        result_path = os.path.join(self.result_dir, f"{digest}.json")
+        arrived_at = time.time()
+
+        with open(lock_path, 'a') as lock_file:
+            locked = self._acquire(lock_file)
+            try:
+                # A result finished after we arrived was in flight while we waited
+                shared = self._read_result(result_path, arrived_at)
+                if shared is not None:
+                    with self._lock:
+                        self.coalesced_cross_process += 1
+                    return shared, True
+
+                with self._lock:
+                    self.executions += 1
+                result = fn()
+                self._write_result(result_path, result)
+                return result, False
+            finally:
+                if locked:
+                    fcntl.flock(lock_file, fcntl.LOCK_UN)
+                self._maybe_prune()
+
+    def _acquire(self, lock_file):
+        deadline = time.monotonic() + self.lock_timeout
+        while True:
+            try:
+                fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                return True
+            except BlockingIOError:
+                if time.monotonic() >= deadline:
+                    print("Single-flight lock wait timed out, running pipeline without coalescing")
+                    return False
+                time.sleep(0.05)
+
+    def _read_result(self, path, not_before):
+        try:
+            with open(path) as f:
+                entry = json.load(f)
+        except (FileNotFoundError, ValueError):
+            return None
+        if entry.get('finished_at', 0) < not_before:
+            return None
+        return entry.get('result')
+
+    def _write_result(self, path, result):
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        try:
+            with open(tmp_path, 'w') as f:
+                json.dump({'finished_at': time.time(), 'result': result}, f)
+            os.replace(tmp_path, path)
+        except (TypeError, OSError) as e:
+            print(f"Could not store single-flight result: {str(e)}")
+            if os.path.exists(tmp_path):
+                os.unlink(tmp_path)
+
+    def _maybe_prune(self):
+        """Remove lock and result files untouched for longer than the retention period."""
+        now = time.time()
+        if now - self._last_prune < self.retention:
+            return
+        self._last_prune = now
+        for name in os.listdir(self.result_dir):
+            path = os.path.join(self.result_dir, name)
+            try:
+                if now - os.path.getmtime(path) > self.retention:
+                    os.unlink(path)
+            except OSError:
+                pass
+
+    def stats(self):
+        with self._lock:
+            return {
+                'in_flight': len(self._calls),
+                'executions': self.executions,
+                'coalesced': self.coalesced,
+                'coalesced_cross_process': self.coalesced_cross_process,
+                'cross_process': bool(self.result_dir)
+            }
+
+
+class AsyncSingleFlight:
+    """
+    Coalesce concurrent coroutine calls that share a key into one task.
+
+    The shared work runs as its own task, so a caller that disconnects and is
+    cancelled does not cancel the execution the other callers are waiting on.
+    """
+
+    def __init__(self):
+        self._tasks = {}
+        self.executions = 0
+        self.coalesced = 0
+
+    async def do(self, key, coro_fn):
+        """
+        Await ``coro_fn()`` once for all concurrent callers using ``key``.
+
+        Returns:
+            tuple: ``(result, shared)`` as for SingleFlight.do
+        """
+        task = self._tasks.get(key)
+        if task is not None:
+            self.coalesced += 1
+            return await asyncio.shield(task), True
+
+        task = asyncio.ensure_future(coro_fn())
+        self._tasks[key] = task
+        self.executions += 1
+        task.add_done_callback(lambda _: self._tasks.pop(key, None))
+        return await asyncio.shield(task), False
+
+    def stats(self):
+        return {
+            'in_flight': len(self._tasks),
+            'executions': self.executions,
+            'coalesced': self.coalesced
+        }
@@ -0,0 +1,101 @@
+"""
+Thumbnail Cache Module
+
+This module keeps small first-page previews of uploaded CVs on disk so that the
+frontend can show a candidate without downloading the whole PDF. Thumbnails are
+rendered once, when a CV is uploaded, and lazily for CVs uploaded before the cache
+existed.
+
+Key components:
+- ThumbnailCache: On-disk PNG cache keyed by CV filename with atomic writes and
+  hit/miss counters
+"""
+
+import os
+import threading
+from rasterize import iter_pdf_pages
+
+
+class ThumbnailCache:
+    """
+    Render and store first-page thumbnails of uploaded PDFs.
+
+    Args:
+        directory (str): Folder holding the rendered PNG files.
+        width (int): Thumbnail width in pixels; the height follows the page aspect ratio.
+    """
+
+    def __init__(self, directory, width=240):
+        self.directory = directory
+        self.width = width
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.renders = 0
+        self.failures = 0
+        os.makedirs(directory, exist_ok=True)
+
+    def path_for(self, filename):
+        """Location of the cached thumbnail for a CV filename"""
+        return os.path.join(self.directory, f"{filename}.png")
+
+    def render(self, pdf_path, filename):
+        """
+        Render the first page of a PDF and atomically replace its cached thumbnail.
+
+        Args:
+            pdf_path (str): Path to the source PDF.
+            filename (str): CV filename the thumbnail is stored under.
+
+        Returns:
+            str: Path to the thumbnail, or None if the page could not be rendered
+        """
+        thumb_path = self.path_for(filename)
+        tmp_path = f"{thumb_path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        try:
+            pages = iter_pdf_pages(pdf_path, max_pages=1, size=(self.width, None))
+            page = next(pages, None)
+            if page is None:
+                raise ValueError("No page rendered")
+            page[1].save(tmp_path, format='PNG', optimize=True)
+            pages.close()
+            os.replace(tmp_path, thumb_path)
+        except Exception as e:
+            print(f"Could not render thumbnail for {filename}: {str(e)}")
+            if os.path.exists(tmp_path):
+                os.unlink(tmp_path)
+            with self._lock:
+                self.failures += 1
+            return None
+        with self._lock:
+            self.renders += 1
+        return thumb_path
+
+    def get(self, pdf_path, filename):
+        """Return the cached thumbnail path, rendering it on a miss"""
+        thumb_path = self.path_for(filename)
+        if os.path.exists(thumb_path):
+            with self._lock:
+                self.hits += 1
+            return thumb_path
+        with self._lock:
+            self.misses += 1
+        if not os.path.exists(pdf_path):
+            return None
+        return self.render(pdf_path, filename)
+
+    def invalidate(self, filename):
+        """Remove the cached thumbnail of a CV, if any"""
+        try:
+            os.unlink(self.path_for(filename))
+        except FileNotFoundError:
+            pass
+
+    def stats(self):
+        with self._lock:
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'renders': self.renders,
+                'failures': self.failures
+            }
@@ -0,0 +1,206 @@
+"""
+Upload Streaming Module
+
+This module lets file uploads be written once, in chunks, straight to their final
+directory. Werkzeug's multipart parser normally spools each file to an anonymous
+temporary file; here the parser writes into a hashing, validating writer instead, and
+the finished file is atomically renamed into place.
+
+Key components:
+- UploadRequest: Flask request class with a per-request hook for the upload target
+- StreamingPdfWriter: File-like target that enforces a size limit, checks the PDF
+  header and computes the SHA-256 content hash while the body streams in
+- StreamingZipWriter: The same target for ZIP archives of PDFs
+- extract_zip_pdfs: Stream the PDFs of an archive into writers with zip-bomb limits
+- InvalidPdfUpload / InvalidZipUpload: 400 errors raised for bodies of the wrong type
+"""
+
+import os
+import hashlib
+import zipfile
+import tempfile
+from flask import Request
+from werkzeug.exceptions import BadRequest, RequestEntityTooLarge
+
+PDF_MAGIC = b'%PDF-'
+ZIP_MAGIC = b'PK\x03\x04'
+
+
+class InvalidPdfUpload(BadRequest):
+    """The uploaded body is not a PDF document."""
+
+    description = 'Uploaded file is not a valid PDF document'
+
+
+class InvalidZipUpload(BadRequest):
+    """The uploaded body is not a usable ZIP archive."""
+
+    description = 'Uploaded file is not a valid ZIP archive'
+
+
+class UploadRequest(Request):
+    """
+    Request that streams uploaded files to a target chosen by the view.
+
+    A view sets ``upload_target_factory`` to a callable taking the client filename and
+    returning a writable file object before it first touches ``request.files``.
+    """
+
+    upload_target_factory = None
+
+    def _get_file_stream(self, total_content_length, content_type, filename=None, content_length=None):
+        if self.upload_target_factory is not None and filename:
+            return self.upload_target_factory(filename)
+        return super()._get_file_stream(total_content_length, content_type, filename, content_length)
+
+
+class StreamingPdfWriter:
+    """
+    Write an uploaded PDF to a partial file next to its final location.
+
+    Args:
+        directory (str): Final upload directory; the partial file is created here so the
+                         closing rename never crosses filesystems.
+        max_bytes (int): Maximum accepted file size in bytes.
+    """
+
+    magic = PDF_MAGIC
+    invalid_error = InvalidPdfUpload
+
+    def __init__(self, directory, max_bytes):
+        os.makedirs(directory, exist_ok=True)
+        self.max_bytes = max_bytes
+        fd, self.path = tempfile.mkstemp(prefix='.upload-', suffix='.part', dir=directory)
+        self._file = os.fdopen(fd, 'w+b')
+        self._hash = hashlib.sha256()
+        self._header = b''
+        self.size = 0
+
+    def write(self, data):
+        self.size += len(data)
+        if self.size > self.max_bytes:
+            raise RequestEntityTooLarge(f"File exceeds the {self.max_bytes // (1024 * 1024)} MB upload limit")
+        if len(self._header) < len(self.magic):
+            self._header += bytes(data[:len(self.magic) - len(self._header)])
+            if not self.magic.startswith(self._header):
+                raise self.invalid_error()
+        self._hash.update(data)
+        return self._file.write(data)
+
+    # The multipart parser rewinds the target once the part is complete
+    def seek(self, *args):
+        return self._file.seek(*args)
+
+    def tell(self):
+        return self._file.tell()
+
+    def read(self, *args):
+        return self._file.read(*args)
+
+    def flush(self):
+        return self._file.flush()
+
+    def close(self):
+        if not self._file.closed:
+            self._file.close()
+
+    @property
+    def content_hash(self):
+        return self._hash.hexdigest()
+
+    def validate(self):
+        """Check the fully received file is non-empty and of the expected type."""
+        if self._header != self.magic:
+            raise self.invalid_error()
+
+    def commit(self, final_path):
+        """Durably move the received file to ``final_path``, replacing any previous file."""
+        self._file.flush()
+        os.fsync(self._file.fileno())
+        self.close()
+        os.replace(self.path, final_path)
+        self.path = final_path
+        return final_path
+
+    def discard(self):
+        """Remove the partial file after a failed or rejected upload."""
+        self.close()
+        if os.path.basename(self.path).startswith('.upload-') and os.path.exists(self.path):
+            os.unlink(self.path)
+
+
+class StreamingZipWriter(StreamingPdfWriter):
+    """Write an uploaded ZIP archive of PDFs to a partial file in the upload directory."""
+
+    magic = ZIP_MAGIC
+    invalid_error = InvalidZipUpload
+
+
+def extract_zip_pdfs(archive_path, directory, max_files, max_file_bytes, max_total_bytes):
+    """
+    Stream the PDFs contained in a ZIP archive into partial upload files.
+
+    Member sizes declared in the archive are checked up front, and the bytes actually
+    inflated are counted while copying, so a forged header cannot bypass the limits.
+
+    Args:
+        archive_path (str): Path to the received archive.
+        directory (str): Upload directory the partial files are created in.
+        max_files (int): Most PDF members accepted.
+        max_file_bytes (int): Largest accepted uncompressed PDF.
+        max_total_bytes (int): Largest accepted total of uncompressed PDFs.
+
+    Returns:
+        list: ``(member_name, writer)`` pairs, or ``(member_name, error)`` for members
+              that were rejected individually
+
+    Raises:
+        InvalidZipUpload: If the archive is unreadable or exceeds the file count or
+                          total size limits
+    """
+    try:
+        archive = zipfile.ZipFile(archive_path)
+    except (zipfile.BadZipFile, OSError):
+        raise InvalidZipUpload()
+
+    with archive:
+        members = [
+            info for info in archive.infolist()
+            if not info.is_dir()
+            and info.filename.lower().endswith('.pdf')
+            and not os.path.basename(info.filename).startswith('.')
+            and not info.filename.startswith('__MACOSX/')
+        ]
+        if len(members) > max_files:
+            raise InvalidZipUpload(f"Archive contains {len(members)} PDFs, the limit is {max_files}")
+        if sum(info.file_size for info in members) > max_total_bytes:
+            raise InvalidZipUpload("Archive exceeds the total uncompressed size limit")
+
+        results = []
+        inflated = 0
+        for info in members:
+            if info.file_size > max_file_bytes:
+                results.append((info.filename, RequestEntityTooLarge(
+                    f"File exceeds the {max_file_bytes // (1024 * 1024)} MB upload limit")))
+                continue
+            writer = StreamingPdfWriter(directory, max_file_bytes)
+            try:
+                with archive.open(info) as member:
+                    for block in iter(lambda: member.read(1024 * 1024), b''):
+                        inflated += len(block)
+                        if inflated > max_total_bytes:
+                            raise InvalidZipUpload("Archive exceeds the total uncompressed size limit")
+                        writer.write(block)
+                writer.flush()
+                writer.validate()
+                results.append((info.filename, writer))
+            except InvalidZipUpload:
+                writer.discard()
+                for _, result in results:
+                    if isinstance(result, StreamingPdfWriter):
+                        result.discard()
+                raise
+            except Exception as e:
+                writer.discard()
+                results.append((info.filename, e))
+        return results
@@ -0,0 +1,101 @@
+"""
+User Cache Module
+
+This module provides a bounded, in-process TTL cache for authenticated user lookups.
+Flask-Login resolves the current user on every request, so caching a lightweight copy
+of the user row avoids repeated SQLite round-trips for the same record.
+
+Key components:
+- CachedUser: Detached, read-only user record usable as Flask-Login's current_user
+- UserCache: Thread-safe LRU cache with per-entry expiry and hit/miss counters
+"""
+
+import time
+import threading
+from collections import OrderedDict
+from flask_login import UserMixin
+
+
+class CachedUser(UserMixin):
+    """Lightweight copy of a ``User`` row that is safe to share between requests."""
+
+    def __init__(self, id, google_id, email, name):
+        self.id = id
+        self.google_id = google_id
+        self.email = email
+        self.name = name
+
+    @classmethod
+    def from_model(cls, user):
+        return cls(user.id, user.google_id, user.email, user.name)
+
+    def __repr__(self):
+        return f"<CachedUser {self.id} {self.email}>"
+
+
+class UserCache:
+    """
+    Bounded TTL cache of user records keyed by user id.
+
+    Args:
+        maxsize (int): Maximum number of cached users; the least recently used
+                       entry is evicted when the cache is full.
+        ttl (float): Seconds an entry stays valid after it was stored.
+    """
+
+    def __init__(self, maxsize=1024, ttl=300):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, user_id):
+        """Return the cached user for ``user_id``, or None on a miss or expired entry."""
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(user_id)
+            if entry is not None and entry[0] > now:
+                self._entries.move_to_end(user_id)
+                self.hits += 1
+                return entry[1]
+            if entry is not None:
+                del self._entries[user_id]
+            self.misses += 1
+            return None
+
+    def put(self, user):
+        """Cache a lightweight copy of ``user`` and return it."""
+        record = user if isinstance(user, CachedUser) else CachedUser.from_model(user)
+        with self._lock:
+            self._entries[record.id] = (time.monotonic() + self.ttl, record)
+            self._entries.move_to_end(record.id)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+        return record
+
+    def invalidate(self, user_id):
+        """Drop ``user_id`` from the cache, e.g. after the user was updated or logged out."""
+        with self._lock:
+            self._entries.pop(user_id, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        """Return cache counters for the metrics endpoint."""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'size': len(self._entries),
+                'maxsize': self.maxsize,
+                'ttl': self.ttl,
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'hit_rate': round(self.hits / lookups, 4) if lookups else 0.0
+            }